@@ -2,6 +2,8 @@ import streamlit as st
 from datetime import datetime
 import pytz
 import os
+import metrics
+from scheduler import last_run
 
 # إعدادات عامة للتطبيق
 st.set_page_config(
@@ -10,6 +12,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# نقطة مقاييس Prometheus (/metrics) عند ضبط METRICS_PORT؛ تُشغَّل مرة واحدة لكل عملية
+metrics.start_server()
+
 # عنوان التطبيق الرئيسي
 st.markdown("""
 <div style="text-align: center; margin-bottom: 30px;">
@@ -23,12 +28,17 @@ st.sidebar.title("🔍 القائمة الرئيسية")
 st.sidebar.markdown("---")
 
 # قسم معلومات التطبيق
-last_update = datetime.now(pytz.timezone('America/New_York')).strftime("%Y-%m-%d %H:%M")
+# آخر تحديث هو آخر تشغيل لمهام scheduler.py، وإلا فالتحديث يدوي من الصفحات
+last_job = last_run()
+if last_job:
+    last_update = datetime.fromtimestamp(last_job["finished_at"], pytz.timezone('America/New_York')).strftime("%Y-%m-%d %H:%M")
+    update_info = f"- آخر تحديث مجدول: {last_update} (توقيت نيويورك)"
+else:
+    update_info = "- تحديث البيانات: يدوي (شغّل scheduler.py للتحديث التلقائي)"
 st.sidebar.info(f"""
 **معلومات التطبيق:**
 - الإصدار: 2.0
-- تحديث البيانات: كل 30 دقيقة
-- آخر تحديث: {last_update} (توقيت نيويورك)
+{update_info}
 """)
 
 # طريقة تشغيل الصفحة الرئيسية
@@ -0,0 +1,111 @@
+# batch_quotes.py
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from price_store import OHLCV_COLUMNS, append_bars, period_start
+from rate_limiter import acquire
+
+# عدد الرموز في كل طلب مجمّع
+GROUP_SIZE = 100
+
+
+def _split_download(raw: pd.DataFrame, group: List[str]) -> Dict[str, pd.DataFrame]:
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        tickers = raw.columns.get_level_values(0).unique()
+        for symbol in tickers:
+            frame = raw[symbol]
+            if set(OHLCV_COLUMNS) - set(frame.columns):
+                continue
+            frame = frame[OHLCV_COLUMNS].dropna(how="all")
+            if not frame.empty:
+                frames[symbol] = frame
+    elif len(group) == 1:
+        frame = raw[OHLCV_COLUMNS].dropna(how="all")
+        if not frame.empty:
+            frames[group[0]] = frame
+    return frames
+
+
+def download_histories(symbols: Iterable[str], period: str = "1mo", group_size: int = GROUP_SIZE) -> Dict[str, pd.DataFrame]:
+    """
+    Download daily bars for many symbols in a few grouped Yahoo Finance requests
+
+    Each downloaded frame is also written to the local price store so the
+    single-symbol views can reuse it.
+
+    Returns:
+        dict: symbol -> OHLCV DataFrame (symbols without data are omitted)
+    """
+    import yfinance as yf
+
+    symbols = list(dict.fromkeys(str(s).strip() for s in symbols if pd.notna(s) and str(s).strip()))
+    frames: Dict[str, pd.DataFrame] = {}
+    for i in range(0, len(symbols), group_size):
+        group = symbols[i:i + group_size]
+        acquire("yahoo")
+        # yfinance يرسل طلباً لكل رمز في المجموعة
+        with metrics.track("yahoo", requests=len(group)):
+            raw = yf.download(
+                group,
+                period=period,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=True,
+                progress=False
+            )
+        frames.update(_split_download(raw, group))
+
+    start = period_start(period)
+    for symbol, frame in frames.items():
+        try:
+            append_bars(symbol, "yahoo", "1d", frame, covered_from=start, full_range=start is None)
+        except Exception:
+            pass  # التخزين المحلي اختياري ولا يجب أن يوقف الفحص
+    return frames
+
+
+def summarize_changes(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Compute last close, % change and volume for every symbol in one vectorized pass
+
+    The per-symbol frames are aligned into a dates x symbols panel; the last
+    and previous valid rows are located per column with NumPy so symbols with
+    different trading calendars (e.g. Tadawul vs NASDAQ) are handled correctly.
+
+    Returns:
+        pd.DataFrame: columns Symbol, Last Close, % Change, Volume sorted by % Change
+    """
+    columns = ["Symbol", "Last Close", "% Change", "Volume"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    close = pd.DataFrame({symbol: frame["Close"] for symbol, frame in frames.items()})
+    volume = pd.DataFrame({symbol: frame["Volume"] for symbol, frame in frames.items()}).reindex(close.index)
+
+    values = close.to_numpy(dtype=float)
+    rows = np.arange(len(close))[:, None]
+    positions = np.where(~np.isnan(values), rows, -1)
+    last_pos = positions.max(axis=0)
+    positions[last_pos, np.arange(values.shape[1])] = -1
+    prev_pos = positions.max(axis=0)
+
+    keep = prev_pos >= 0
+    cols = np.arange(values.shape[1])[keep]
+    last_close = values[last_pos[keep], cols]
+    prev_close = values[prev_pos[keep], cols]
+    last_volume = volume.to_numpy(dtype=float)[last_pos[keep], cols]
+
+    result = pd.DataFrame({
+        "Symbol": close.columns[keep],
+        "Last Close": last_close,
+        "% Change": (last_close - prev_close) / prev_close * 100,
+        "Volume": last_volume,
+    })
+    return result.sort_values("% Change", ascending=False).reset_index(drop=True)
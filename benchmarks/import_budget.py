@@ -0,0 +1,105 @@
+# benchmarks/import_budget.py
+"""
+Measure the import time each Streamlit page adds at startup, using
+python -X importtime, and check it against a per-page budget.
+
+Only the page's top-level import statements are run (the page script itself
+is not executed), each page in a fresh interpreter. Streamlit and pandas are
+imported first and excluded, since the server has them loaded already.
+
+Usage:
+    python benchmarks/import_budget.py              # report and check budgets
+    python benchmarks/import_budget.py --top 5      # also list the slowest modules per page
+    python benchmarks/import_budget.py --scale 2    # relax budgets on a slow machine
+
+Exits with status 1 when a page is over its budget. The project has no
+test suite, so this script is the check: run it in CI next to the other
+benchmarks and fail the build on its exit status.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ROOT / "pages"
+
+# ما يحمّله الخادم مسبقاً لكل الصفحات ولا يُحتسب على الصفحة
+BASELINE = "import streamlit, pandas"
+
+# الميزانية بالمللي ثانية للاستيرادات التي تضيفها الصفحة فوق الأساس
+# (yfinance وحدها ~150ms و plotly.express ~60ms، لذلك تُستورد داخل الدوال عند الحاجة)
+DEFAULT_BUDGET_MS = 120
+# استثناءات لصفحات بعينها: {"اسم الملف.py": ميزانية}
+BUDGET_MS: Dict[str, float] = {}
+
+
+def top_level_imports(path: Path) -> str:
+    """Source of the page's module-level import statements"""
+    source = path.read_text(encoding="utf-8")
+    nodes = [node for node in ast.parse(source).body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.get_source_segment(source, node) for node in nodes)
+
+
+def measure(code: str) -> List[Tuple[str, int, int]]:
+    """
+    Run code under -X importtime in a fresh interpreter
+
+    Returns:
+        list: (module, self_us, cumulative_us) of every module imported after the baseline
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{BASELINE}\n{code}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us), int(cumulative_us)))
+
+    # الأسطر تُطبع بعد اكتمال كل وحدة، فآخر سطر لـ pandas في المستوى الأعلى يُنهي الأساس
+    boundary = max(i for i, (name, _, _) in enumerate(rows) if name == "pandas")
+    return rows[boundary + 1:]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ميزانية زمن الاستيراد لكل صفحة")
+    parser.add_argument("--top", type=int, default=0, help="عرض أبطأ الوحدات لكل صفحة")
+    parser.add_argument("--scale", type=float, default=1.0, help="ضرب الميزانيات في هذا المعامل")
+    parser.add_argument("pages", nargs="*", help="صفحات محددة (الافتراضي: كل الصفحات)")
+    args = parser.parse_args(argv)
+
+    paths = [PAGES / name for name in args.pages] if args.pages else sorted(PAGES.glob("*.py"))
+    over = 0
+    for path in paths:
+        if path.name == "__init__.py":
+            continue
+        try:
+            rows = measure(top_level_imports(path))
+        except RuntimeError as e:
+            over += 1
+            print(f"FAIL {'':>24}  {path.name}: {e}")
+            continue
+        total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+        budget = BUDGET_MS.get(path.name, DEFAULT_BUDGET_MS) * args.scale
+        status = "OK  " if total_ms <= budget else "OVER"
+        over += total_ms > budget
+        print(f"{status} {total_ms:8.1f} ms / {budget:6.0f} ms  {path.name}")
+        for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+            print(f"         {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
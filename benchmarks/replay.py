@@ -0,0 +1,222 @@
+# benchmarks/replay.py
+"""
+Serve provider responses from recorded fixtures instead of the network.
+
+install() mounts a requests adapter on the shared http_client session, so
+every call made through http_client (Alpha Vantage, Finnhub, ...) is
+answered from benchmarks/fixtures/, and replaces yfinance.download, which
+does not go through http_client. Rate limits are lifted for the process.
+
+Fixtures are stored per provider and endpoint, one file per recorded
+symbol, e.g. fixtures/alpha_vantage/OVERVIEW/AAPL.json. Any symbol can be
+requested: it is answered with one of the recorded files (picked by a
+stable hash) with the recorded symbol swapped in, so a few files serve a
+10,000-symbol universe. Bar timestamps are shifted so the last recorded
+bar falls on the last business day.
+
+The files shipped here are samples in each provider's response format.
+Replace them with real responses using:
+
+    ALPHA_VANTAGE_API_KEY=... FINNHUB_API_KEY=... python benchmarks/replay.py record AAPL MSFT KO
+"""
+import io
+import json
+import os
+import sys
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+import http_client  # noqa: E402
+import rate_limiter  # noqa: E402
+
+
+def route(url: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Map a provider URL to its fixture location
+
+    Returns:
+        tuple: (provider, endpoint, symbol), or None if the URL is not replayable
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    # نطابق العناوين المضبوطة (*_BASE_URL) لا العناوين الافتراضية، وقد يشترك المزودان في عنوان واحد
+    for provider in ("alpha_vantage", "finnhub"):
+        base = urlsplit(http_client.base_url(provider))
+        if parts.netloc != base.netloc or not parts.path.startswith(base.path):
+            continue
+        path = parts.path[len(base.path):]
+        if provider == "alpha_vantage" and path == "/query":
+            return "alpha_vantage", query.get("function", ""), query.get("symbol", "")
+        if provider == "finnhub" and path.startswith("/api/v1/"):
+            endpoint = path[len("/api/v1/"):].replace("/", "_")
+            return "finnhub", endpoint, query.get("symbol", "")
+    return None
+
+
+# الملفات تُقرأ مرة واحدة حتى لا يُحسب زمن القرص على المسار المقاس
+@lru_cache(maxsize=None)
+def _recorded(provider: str, endpoint: str) -> List[Path]:
+    return sorted((FIXTURES / provider / endpoint).glob("*.*"))
+
+
+@lru_cache(maxsize=None)
+def _read(path: Path) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+@lru_cache(maxsize=None)
+def _read_history(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, index_col="Date", parse_dates=True)
+
+
+def _pick(files: List[Path], symbol: str) -> Path:
+    return files[zlib.crc32(symbol.encode()) % len(files)]
+
+
+def _last_session() -> pd.Timestamp:
+    return pd.Timestamp.now(tz="UTC").normalize() - pd.offsets.BDay(1)
+
+
+def _candles(body: dict, query: Dict[str, str]) -> dict:
+    # نزيح التواريخ لتنتهي في آخر يوم تداول، ثم نطبق from/to كما يفعل Finnhub
+    if body.get("s") != "ok" or not body.get("t"):
+        return body
+    shift = int(_last_session().timestamp()) - (body["t"][-1] - body["t"][-1] % 86400)
+    since = int(query.get("from", 0))
+    until = int(query.get("to", 2 ** 62))
+    keep = [i for i, t in enumerate(body["t"]) if since <= t + shift <= until]
+    if not keep:
+        return {"s": "no_data"}
+    out = {key: [body[key][i] for i in keep] for key in ("c", "h", "l", "o", "v")}
+    out["t"] = [body["t"][i] + shift for i in keep]
+    out["s"] = "ok"
+    return out
+
+
+def fixture_body(url: str) -> Optional[bytes]:
+    """The replayed response body for a URL, or None if there is no fixture for it"""
+    target = route(url)
+    if target is None:
+        return None
+    provider, endpoint, symbol = target
+    files = _recorded(provider, endpoint)
+    if not files:
+        return None
+    path = _pick(files, symbol)
+    text = _read(path)
+    if symbol:
+        text = text.replace(f'"{path.stem}"', json.dumps(symbol))
+    if endpoint == "stock_candle":
+        text = json.dumps(_candles(json.loads(text), dict(parse_qsl(urlsplit(url).query))))
+    return text.encode("utf-8")
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests adapter answering every request from the fixtures (404 when there is none)"""
+
+    def send(self, request, **kwargs):
+        body = fixture_body(request.url)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = 200 if body is not None else 404
+        response.reason = "OK" if body is not None else "No fixture"
+        response.headers["Content-Type"] = "application/json"
+        response.raw = io.BytesIO(body or b"{}")
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+
+def history_frame(symbol: str, last_session: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Recorded daily OHLCV bars of a symbol, ending on the last business day"""
+    frame = _read_history(_pick(_recorded("yahoo", "history"), symbol)).copy()
+    end = (last_session or _last_session()).tz_localize(None)
+    frame.index = pd.bdate_range(end=end, periods=len(frame), name="Date")
+    return frame
+
+
+def replay_download(tickers, group_by="ticker", **kwargs) -> pd.DataFrame:
+    """Stand-in for yfinance.download(group_by="ticker") built from the recorded histories"""
+    symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+    end = _last_session()
+    frames = {symbol: history_frame(symbol, end) for symbol in symbols}
+    return pd.concat(frames, axis=1)
+
+
+def install() -> None:
+    """Answer provider requests from the fixtures for the rest of this process"""
+    session = http_client.get_session()
+    adapter = ReplayAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # لا حدود للطلبات أثناء الإعادة: نقيس المعالجة وليس الانتظار
+    for provider in rate_limiter.PROVIDER_LIMITS:
+        rate_limiter.PROVIDER_LIMITS[provider] = {}
+    rate_limiter._limiters.clear()
+
+    import yfinance
+    yfinance.download = replay_download
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Real HTTP adapter that saves every successful replayable response as a fixture"""
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        target = route(request.url)
+        if target is not None and response.status_code == 200 and target[2]:
+            provider, endpoint, symbol = target
+            path = FIXTURES / provider / endpoint / f"{symbol}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(response.content)
+            print(f"recorded {path.relative_to(FIXTURES)}")
+        return response
+
+
+def record(symbols: List[str]) -> None:
+    """Fetch live responses for a few symbols and store them as fixtures"""
+    import fundamentals
+    from price_providers import fetch_from_provider
+
+    http_client.get_session().mount("https://", RecordingAdapter())
+    av_key = os.getenv("ALPHA_VANTAGE_API_KEY")
+    finnhub_key = os.getenv("FINNHUB_API_KEY")
+    for symbol in symbols:
+        if av_key:
+            fundamentals.fetch_overview_row(symbol, av_key)
+            fundamentals.fetch_av_cash_flow_rows(symbol, av_key)
+        if finnhub_key:
+            fundamentals.fetch_finnhub_cash_flow_rows(symbol, finnhub_key)
+            fetch_from_provider("finnhub", symbol, "1y", finnhub_key)
+
+        import yfinance as yf
+        history = yf.Ticker(symbol).history(period="1mo")
+        if not history.empty:
+            path = FIXTURES / "yahoo" / "history" / f"{symbol}.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            history[["Open", "High", "Low", "Close", "Volume"]].tz_localize(None).to_csv(path, index_label="Date")
+            print(f"recorded {path.relative_to(FIXTURES)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "record":
+        print("usage: python benchmarks/replay.py record SYMBOL [SYMBOL ...]")
+        sys.exit(2)
+    # نسجل في مجلد تخزين مؤقت منفصل حتى لا تُخدم الطلبات من ذاكرة التطبيق
+    os.environ.setdefault("APP_CACHE_DIR", str(FIXTURES.parent / ".record-cache"))
+    record([s.upper() for s in sys.argv[2:]])
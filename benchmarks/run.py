@@ -0,0 +1,260 @@
+# benchmarks/run.py
+"""
+Time the page pipelines offline against recorded provider fixtures.
+
+Every pipeline runs the same code the pages run (fetch, parse, compute
+and, where the page sends one, the Telegram report), with the network
+replaced by benchmarks/replay.py. Each case is timed cold (empty local
+cache directory) and warm (run again on the cache the cold run left).
+
+Results are saved to benchmarks/results/<git sha>.json, so two versions
+can be compared:
+
+    python benchmarks/run.py                             # all pipelines, 10..10,000 symbols
+    python benchmarks/run.py roe upload --sizes 10,100   # a subset
+    python benchmarks/run.py --compare HEAD~3            # also compare with that version's results
+
+Exits with status 1 when --compare finds a case slower than --threshold.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import replay
+import storage  # noqa: E402  (replay يضيف جذر المستودع إلى المسار)
+
+ROOT = replay.ROOT
+RESULTS = Path(__file__).resolve().parent / "results"
+DEFAULT_SIZES = [10, 100, 1_000, 10_000]
+API_KEY = "benchmark"
+
+
+def universe(n: int) -> List[str]:
+    return [f"S{i:05d}" for i in range(n)]
+
+
+# --- خطوط المعالجة كما تنفذها الصفحات ---
+def top_gainers(symbols: List[str]) -> pd.DataFrame:
+    """SA_USA-2 get_top_gainers_safe: grouped Yahoo download, price store, vectorized summary"""
+    from batch_quotes import download_histories, summarize_changes
+
+    return summarize_changes(download_histories(symbols))
+
+
+def bigbov_scoring(symbols: List[str]) -> pd.DataFrame:
+    """Bigbov tab 1: Finnhub candles per symbol, then OBV/MFI strength for all of them"""
+    from panel import classify_strength, to_panel
+    from price_providers import NoDataError, fetch_from_provider
+
+    frames = {}
+    for symbol in symbols:
+        try:
+            stock_data = fetch_from_provider("finnhub", symbol, "30d", API_KEY)
+        except NoDataError:
+            continue
+        frames[symbol] = stock_data
+    signals = classify_strength(to_panel(frames))
+    return pd.DataFrame({
+        'السهم': signals['Symbol'],
+        'السعر الأخير': signals['Close'],
+        'OBV': np.where(signals['OBV_Rising'], "صاعد", "هابط"),
+        'MFI': signals['MFI'].round(2),
+        'القوة': signals['Strength']
+    }).sort_values('القوة', ascending=False)
+
+
+def roe(symbols: List[str]) -> pd.DataFrame:
+    """roe_analysis / analysis2: fetch_roe_for_symbols and the Telegram report"""
+    from fundamentals import fetch_roe_for_symbols
+    from report_builder import build_report
+
+    df, _ = fetch_roe_for_symbols(symbols, API_KEY)
+    build_report(df, "🏢 <b>{Company}</b> ({Symbol})\n📊 ROE: {ROE:.2f}%\n🏭 القطاع: {Sector}\n\n")
+    return df
+
+
+def _fcf_report(fcf_df: pd.DataFrame, value: str, period: str) -> List[str]:
+    from report_builder import pack, render_groups
+
+    blocks = render_groups(
+        fcf_df.assign(fcf_m=(fcf_df[value] / 1e6).round(2)),
+        "symbol",
+        "- {" + period + "}: ${fcf_m}M\n",
+        group_header="📊 <b>{symbol}</b>\n",
+        group_footer="───────────────\n"
+    )
+    return pack(blocks, header="💰 <b>تحليل التدفق النقدي الحر (FCF)</b>\n\n")
+
+
+def fcf_alpha_vantage(symbols: List[str]) -> List[str]:
+    """free_cash_flow: Alpha Vantage CASH_FLOW rows and the grouped report"""
+    from fundamentals import fetch_av_cash_flow
+
+    fcf_df, _ = fetch_av_cash_flow(symbols, API_KEY)
+    return _fcf_report(fcf_df, "freeCashFlow", "fiscalDateEnding")
+
+
+def fcf_finnhub(symbols: List[str]) -> List[str]:
+    """free_cash_flow2: Finnhub financials rows and the grouped report"""
+    from fundamentals import fetch_finnhub_cash_flow
+
+    fcf_df, _ = fetch_finnhub_cash_flow(symbols, API_KEY)
+    return _fcf_report(fcf_df, "FreeCashFlow", "fiscalDate")
+
+
+def companies_csv(n: int) -> bytes:
+    """An upload of n companies built from the recorded FMP rows"""
+    rows = pd.read_csv(replay.FIXTURES / "fmp" / "companies.csv")
+    table = rows.iloc[np.arange(n) % len(rows)].reset_index(drop=True)
+    table["symbol"] = universe(n)
+    return table.to_csv(index=False).encode("utf-8")
+
+
+def upload(symbols: List[str]) -> List[str]:
+    """analyze_upload: chunked ingest, good-companies filter and the Telegram report"""
+    from report_builder import build_report
+    from upload_ingest import ingest_companies
+
+    filtered, _ = ingest_companies(io.BytesIO(_uploads[len(symbols)]), "companies.csv")
+    return build_report(
+        filtered,
+        "🔹 {symbol} - {companyName}\n"
+        "     💲 السعر: {price:,.2f}\n"
+        "     💰 التوزيع: {lastAnnualDividend:,.2f}\n\n",
+        header=f"📊 الشركات الجيدة حسب التحليل ({len(filtered)}):\n\n",
+        footer="📡 تم الإرسال من النظام."
+    )
+
+
+_uploads: Dict[int, bytes] = {}
+
+PIPELINES: Dict[str, Callable[[List[str]], object]] = {
+    "top_gainers": top_gainers,
+    "bigbov_scoring": bigbov_scoring,
+    "roe": roe,
+    "fcf_alpha_vantage": fcf_alpha_vantage,
+    "fcf_finnhub": fcf_finnhub,
+    "upload": upload,
+}
+
+
+def _timed(fn: Callable, symbols: List[str]) -> float:
+    started = time.perf_counter()
+    fn(symbols)
+    return time.perf_counter() - started
+
+
+def run_case(fn: Callable, n: int, repeat: int) -> Dict[str, float]:
+    """Median cold and warm seconds of one pipeline at n symbols"""
+    symbols = universe(n)
+    if fn is upload and n not in _uploads:
+        _uploads[n] = companies_csv(n)
+
+    cold, warm = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            storage.CACHE_DIR = Path(cache_dir)
+            cold.append(_timed(fn, symbols))
+            warm.append(_timed(fn, symbols))
+    return {"cold": statistics.median(cold), "warm": statistics.median(warm)}
+
+
+def git_version(ref: str = "HEAD") -> str:
+    """Short sha of ref, with -dirty for uncommitted changes to tracked files when ref is HEAD"""
+    sha = subprocess.run(
+        ["git", "rev-parse", "--short", ref], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    if ref == "HEAD":
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+        if dirty:
+            sha += "-dirty"
+    return sha
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    """Print current/baseline ratios; return the number of cases slower than threshold"""
+    slower = 0
+    print(f"\nمقارنة مع {baseline['version']}:")
+    for name, sizes in current["results"].items():
+        for size, times in sizes.items():
+            old = baseline["results"].get(name, {}).get(size)
+            if not old:
+                continue
+            for mode in ("cold", "warm"):
+                ratio = times[mode] / old[mode] if old[mode] else float("inf")
+                flag = "SLOWER" if ratio > threshold else ("faster" if ratio < 1 / threshold else "")
+                slower += ratio > threshold
+                print(f"  {name:<18} {size:>6} {mode:<4} {old[mode] * 1e3:10.1f} -> {times[mode] * 1e3:10.1f} ms  x{ratio:5.2f} {flag}")
+    return slower
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="قياس أداء مسارات الصفحات على بيانات مسجلة")
+    parser.add_argument("pipelines", nargs="*", help=f"المسارات (الافتراضي: الكل): {', '.join(PIPELINES)}")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="أعداد الرموز مفصولة بفواصل")
+    parser.add_argument("--repeat", type=int, default=3, help="عدد التكرارات (يؤخذ الوسيط)")
+    parser.add_argument("--compare", metavar="REF", help="مقارنة مع نتائج إصدار سابق (git ref)")
+    parser.add_argument("--threshold", type=float, default=1.25, help="نسبة التباطؤ التي تُعد تراجعاً")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.pipelines) - set(PIPELINES)
+    if unknown:
+        parser.error(f"مسار غير معروف: {', '.join(sorted(unknown))}")
+
+    replay.install()
+    names = args.pipelines or list(PIPELINES)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in names:
+        for n in sizes:
+            times = run_case(PIPELINES[name], n, args.repeat)
+            results.setdefault(name, {})[str(n)] = times
+            print(f"{name:<18} {n:>6} symbols  cold {times['cold'] * 1e3:10.1f} ms  warm {times['warm'] * 1e3:10.1f} ms")
+
+    version = git_version()
+    path = RESULTS / f"{version}.json"
+    previous: Optional[dict] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+    if previous:
+        # نضيف إلى نتائج نفس الإصدار بدلاً من استبدالها (عند تشغيل جزء من المسارات)
+        for name, sizes_ in previous["results"].items():
+            for size, times in sizes_.items():
+                results.setdefault(name, {}).setdefault(size, times)
+    current = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    RESULTS.mkdir(exist_ok=True)
+    path.write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nحُفظت النتائج في {path.relative_to(ROOT)}")
+
+    if args.compare:
+        baseline_path = RESULTS / f"{git_version(args.compare)}.json"
+        if not baseline_path.exists():
+            print(f"لا توجد نتائج محفوظة للإصدار {args.compare} ({baseline_path.name})")
+            return 1
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        return 1 if compare(current, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
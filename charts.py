@@ -0,0 +1,177 @@
+# charts.py
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# أقصى عدد نقاط لكل سلسلة: عرض الرسم بالبكسل تقريباً، وما زاد لا يظهر على الشاشة
+MAX_POINTS = 1500
+# فوق هذا العدد من النقاط نرسم بـ WebGL (Scattergl) بدلاً من SVG
+WEBGL_THRESHOLD = 1000
+
+
+def _numeric_x(index: pd.Index) -> np.ndarray:
+    # LTTB يحتاج محوراً رقمياً: التواريخ كنانوثانية، وغير ذلك بترتيب الصفوف
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype("float64")
+    if pd.api.types.is_numeric_dtype(index):
+        return np.asarray(index, dtype="float64")
+    return np.arange(len(index), dtype="float64")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket, so the line keeps its visual shape.
+
+    Args:
+        x: Numeric x values, increasing
+        y: y values (no NaN)
+        n_out: Number of points to keep
+
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 دلواً بين النقطة الأولى والأخيرة، كل دلو فيه نقطة واحدة على الأقل
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max bucket downsampling: the lowest and highest point of each bucket
+
+    Preserves every spike, which suits volume bars better than LTTB.
+
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    """
+    n = len(y)
+    buckets = n_out // 2
+    if n <= n_out or buckets < 1:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    rows = np.arange(buckets) * size
+    # آخر دلو قد يكون أقصر؛ الخانات الزائدة NaN ولا تُختار
+    valid = ~np.isnan(padded).all(axis=1)
+    low = rows[valid] + np.nanargmin(padded[valid], axis=1)
+    high = rows[valid] + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([low, high]))
+
+
+def downsample(series: pd.Series, max_points: Optional[int] = MAX_POINTS, method: str = "lttb") -> pd.Series:
+    """
+    Reduce a series to at most max_points points for plotting
+
+    Missing values are dropped first (e.g. the first bars of a moving average).
+
+    Args:
+        series: Values indexed by date (or any increasing index)
+        max_points: Point budget; None keeps every point
+        method: "lttb" for lines, "minmax" for bars
+
+    Returns:
+        pd.Series: The kept points, in order
+    """
+    series = series.dropna()
+    if max_points is None or len(series) <= max_points:
+        return series
+    y = series.to_numpy(dtype="float64")
+    if method == "minmax":
+        kept = minmax(y, max_points)
+    else:
+        kept = lttb(_numeric_x(series.index), y, max_points)
+    return series.iloc[kept]
+
+
+def _trace(series: pd.Series, name: str, kind: str, max_points: Optional[int]):
+    import plotly.graph_objects as go
+
+    points = downsample(series, max_points, "minmax" if kind == "bar" else "lttb")
+    if kind == "bar":
+        return go.Bar(x=points.index, y=points.to_numpy(), name=name)
+    scatter = go.Scattergl if len(points) > WEBGL_THRESHOLD else go.Scatter
+    return scatter(x=points.index, y=points.to_numpy(), mode="lines", name=name)
+
+
+def line_figure(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    title: str = "",
+    max_points: Optional[int] = MAX_POINTS
+):
+    """One or more columns of df as lines over its index (see downsample)"""
+    return panel_figure(df, [{"columns": list(columns)}], title, max_points)
+
+
+def panel_figure(
+    df: pd.DataFrame,
+    panels: List[Dict],
+    title: str = "",
+    max_points: Optional[int] = MAX_POINTS,
+    height_per_panel: int = 250
+):
+    """
+    Several indicator panels stacked in one figure with a shared date axis
+
+    A single figure replaces one figure per indicator: the browser gets
+    one payload and one plot, and zooming one panel zooms them all.
+
+    Args:
+        df: Price history with one column per indicator
+        panels: One dict per panel, top to bottom:
+            {"columns": ["Close", "SMA_20"], "title": "...",
+             "kind": "line" | "bar", "hlines": [(50, "gray"), (80, "red")]}
+        title: Figure title
+        max_points: Point budget per series (None keeps every point)
+        height_per_panel: Figure height in pixels per panel
+
+    Returns:
+        plotly.graph_objects.Figure
+    """
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=len(panels),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.06 if len(panels) > 1 else 0,
+        subplot_titles=[panel.get("title", "") for panel in panels] if len(panels) > 1 else None,
+    )
+    for row, panel in enumerate(panels, start=1):
+        kind = panel.get("kind", "line")
+        for column in panel["columns"]:
+            fig.add_trace(_trace(df[column], column, kind, max_points), row=row, col=1)
+        for y, color in panel.get("hlines", []):
+            fig.add_hline(y=y, line_dash="dash", line_color=color, row=row, col=1)
+
+    fig.update_layout(
+        title=title,
+        height=max(height_per_panel * len(panels), 400),
+        hovermode="x unified",
+        legend={"orientation": "h", "y": -0.1},
+        margin={"t": 60},
+    )
+    return fig
@@ -0,0 +1,129 @@
+# fetch_engine.py
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+import quota
+
+# Maximum number of in-flight requests per provider, shared by every
+# Streamlit session running in this process.
+PROVIDER_CONCURRENCY = {
+    "alpha_vantage": 4,
+    "finnhub": 8,
+    "fmp": 8,
+    "tiingo": 4,
+    "twelve_data": 4,
+    "yahoo": 8,
+}
+DEFAULT_CONCURRENCY = 4
+MAX_WORKERS = 16
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+Row = Dict[str, object]
+FetchOne = Callable[[str], Union[Row, List[Row], None]]
+
+
+class FetchError(Exception):
+    """Raised by a per-symbol fetcher with a message that is safe to show to the user"""
+
+
+def _provider_semaphore(provider: str) -> threading.BoundedSemaphore:
+    with _semaphores_lock:
+        semaphore = _semaphores.get(provider)
+        if semaphore is None:
+            limit = PROVIDER_CONCURRENCY.get(provider, DEFAULT_CONCURRENCY)
+            semaphore = threading.BoundedSemaphore(limit)
+            _semaphores[provider] = semaphore
+        return semaphore
+
+
+def _unique(symbols: Iterable[str]) -> List[str]:
+    seen = set()
+    ordered = []
+    for symbol in symbols:
+        if symbol and symbol not in seen:
+            seen.add(symbol)
+            ordered.append(symbol)
+    return ordered
+
+
+def _apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            df[column] = pd.Series(dtype=dtype, index=df.index)
+        elif pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def fetch_many(
+    symbols: Iterable[str],
+    fetch_one: FetchOne,
+    provider: str,
+    dtypes: Optional[Dict[str, str]] = None,
+    max_workers: Optional[int] = None
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Run a per-symbol fetcher concurrently over a whole symbol list
+
+    A list of several symbols is fetched at bulk priority (see quota.py), so
+    a screen cannot use up the daily quota kept for single-symbol lookups.
+
+    Args:
+        symbols: Symbols to fetch (duplicates are fetched once)
+        fetch_one: Callable returning a row dict, a list of row dicts or None
+            for a symbol. It must not call Streamlit since it runs on a worker
+            thread; raise FetchError to report a user-facing problem instead.
+        provider: Provider name used to pick the concurrency cap
+        dtypes: Optional column -> dtype mapping applied to the result
+        max_workers: Size of the thread pool (defaults to the provider cap)
+
+    Returns:
+        tuple: (DataFrame of all rows in input symbol order,
+                dict of symbol -> error message)
+    """
+    symbols = _unique(symbols)
+    semaphore = _provider_semaphore(provider)
+
+    def run(symbol):
+        with semaphore:
+            return fetch_one(symbol)
+
+    if max_workers is None:
+        max_workers = PROVIDER_CONCURRENCY.get(provider, DEFAULT_CONCURRENCY)
+    max_workers = max(1, min(max_workers, MAX_WORKERS, len(symbols) or 1))
+
+    rows: List[Row] = []
+    errors: Dict[str, str] = {}
+    level = quota.BULK if len(symbols) > 1 else quota.INTERACTIVE
+    with quota.priority(level), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # كل مهمة تأخذ نسخة من السياق حتى تصل الأولوية إلى خيوط المجمع
+        futures = [(symbol, pool.submit(contextvars.copy_context().run, run, symbol)) for symbol in symbols]
+        for symbol, future in futures:
+            try:
+                result = future.result()
+            except FetchError as e:
+                errors[symbol] = str(e)
+                continue
+            except Exception as e:
+                errors[symbol] = f"خطأ في جلب بيانات {symbol}: {e}"
+                continue
+
+            if result is None:
+                continue
+            if isinstance(result, dict):
+                rows.append(result)
+            else:
+                rows.extend(result)
+
+    df = pd.DataFrame(rows)
+    if dtypes:
+        df = _apply_dtypes(df, dtypes)
+    return df, errors
@@ -0,0 +1,235 @@
+# fundamentals.py
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+import requests
+
+import fundamentals_cache
+import http_client
+from fetch_engine import FetchError, fetch_many
+from fundamentals_cache import ANNUAL_FILING_LAG, QUARTERLY_FILING_LAG, next_report_expiry
+
+ROE_DTYPES = {
+    "Symbol": "string",
+    "Company": "string",
+    "ROE": "float64",
+    "Sector": "string",
+    "MarketCap": "Float64",
+}
+
+MARGINS_DTYPES = {
+    "Symbol": "string",
+    "Operating Margin (%)": "float64",
+    "Net Profit Margin (%)": "float64",
+    "Revenue Growth (%)": "float64",
+    "Finnhub Link": "string",
+}
+
+AV_CASH_FLOW_DTYPES = {
+    "symbol": "string",
+    "fiscalDateEnding": "string",
+    "operatingCashflow": "int64",
+    "capitalExpenditures": "int64",
+    "freeCashFlow": "int64",
+}
+
+FINNHUB_CASH_FLOW_DTYPES = {
+    "symbol": "string",
+    "fiscalDate": "int64",
+    "OperatingCashFlow": "float64",
+    "CapitalExpenditures": "float64",
+    "FreeCashFlow": "float64",
+}
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    if value is None or value in ("", "None", "-"):
+        return default
+    return float(value)
+
+
+# --- صلاحية البيانات المخزنة حتى موعد التقرير المالي التالي ---
+def _overview_expiry(data):
+    # Alpha Vantage يعيد {} أو رسالة Note/Information عند الخطأ
+    if not data.get("Symbol"):
+        return None
+    return next_report_expiry(data.get("LatestQuarter"), 3, QUARTERLY_FILING_LAG)
+
+
+def _metric_expiry(data):
+    if not data.get("metric"):
+        return None
+    quarterly = (data.get("series") or {}).get("quarterly") or {}
+    periods = [series[0]["period"] for series in quarterly.values() if series and "period" in series[0]]
+    return next_report_expiry(max(periods) if periods else None, 3, QUARTERLY_FILING_LAG)
+
+
+def _av_cash_flow_expiry(data):
+    reports = data.get("annualReports")
+    if not reports:
+        return None
+    return next_report_expiry(max(r.get("fiscalDateEnding", "") for r in reports), 12, ANNUAL_FILING_LAG)
+
+
+def _finnhub_financials_expiry(data):
+    reports = data.get("data")
+    if not reports:
+        return None
+    periods = [r.get("period") or f"{r.get('year')}-12-31" for r in reports]
+    return next_report_expiry(max(periods), 12, ANNUAL_FILING_LAG)
+
+
+def _cached_json(provider: str, endpoint: str, symbol: str, url: str, api_key: str, expires):
+    return fundamentals_cache.cached(
+        provider,
+        endpoint,
+        symbol,
+        lambda: http_client.get_json(url, provider=provider, api_key=api_key),
+        expires
+    )
+
+
+# --- Alpha Vantage OVERVIEW ---
+def fetch_overview_row(symbol: str, api_key: str) -> Dict[str, object]:
+    """Fetch the ROE row of a single symbol from Alpha Vantage OVERVIEW"""
+    url = f"{http_client.base_url('alpha_vantage')}/query?function=OVERVIEW&symbol={symbol}&apikey={api_key}"
+    try:
+        data = _cached_json("alpha_vantage", "OVERVIEW", symbol, url, api_key, _overview_expiry)
+    except requests.RequestException:
+        raise FetchError(f"تعذر جلب بيانات {symbol}")
+
+    roe = _to_float(data.get("ReturnOnEquityTTM"))
+    return {
+        "Symbol": symbol,
+        "Company": data.get("Name", "Unknown"),
+        "ROE": roe * 100,  # تحويل من نسبة عشرية إلى %
+        "Sector": data.get("Sector", "Unknown"),
+        "MarketCap": data.get("MarketCapitalization"),
+    }
+
+
+def fetch_roe_for_symbols(symbols: Iterable[str], api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Fetch ROE, sector and market cap for every symbol concurrently"""
+    return fetch_many(
+        symbols,
+        lambda symbol: fetch_overview_row(symbol, api_key),
+        provider="alpha_vantage",
+        dtypes=ROE_DTYPES
+    )
+
+
+# --- Finnhub stock/metric ---
+def fetch_margins_row(symbol: str, api_key: str) -> Dict[str, object]:
+    """Fetch operating/net margins and revenue growth of a symbol from Finnhub"""
+    url = f"{http_client.base_url('finnhub')}/api/v1/stock/metric?symbol={symbol}&metric=all&token={api_key}"
+    try:
+        data = _cached_json("finnhub", "stock/metric", symbol, url, api_key, _metric_expiry)
+    except requests.RequestException:
+        raise FetchError(f"⚠️ لم يتم جلب البيانات لـ {symbol}")
+
+    metrics = data.get("metric", {})
+    if not metrics:
+        raise FetchError(f"⚠️ لا توجد بيانات متاحة لـ {symbol}")
+
+    try:
+        op_margin = float(metrics.get("operatingMargin", metrics.get("operatingMarginTTM", "nan"))) * 100
+        net_margin = float(metrics.get("netProfitMargin", metrics.get("netProfitMarginTTM", "nan"))) * 100
+        revenue_growth = float(metrics.get("revenueGrowth", metrics.get("revenueGrowthTTM", "nan"))) * 100
+    except (TypeError, ValueError):
+        raise FetchError(f"⚠️ تعذر تحليل البيانات لـ {symbol}")
+
+    return {
+        "Symbol": symbol,
+        "Operating Margin (%)": round(op_margin, 2),
+        "Net Profit Margin (%)": round(net_margin, 2),
+        "Revenue Growth (%)": round(revenue_growth, 2),
+        "Finnhub Link": f"https://finnhub.io/stock/{symbol}",
+    }
+
+
+def fetch_margins_for_symbols(symbols: Iterable[str], api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Fetch margins and growth for every symbol concurrently"""
+    return fetch_many(
+        symbols,
+        lambda symbol: fetch_margins_row(symbol, api_key),
+        provider="finnhub",
+        dtypes=MARGINS_DTYPES
+    )
+
+
+# --- Free cash flow ---
+def fetch_av_cash_flow_rows(symbol: str, api_key: str) -> List[Dict[str, object]]:
+    """Fetch annual free cash flow rows of a symbol from Alpha Vantage CASH_FLOW"""
+    url = f"{http_client.base_url('alpha_vantage')}/query?function=CASH_FLOW&symbol={symbol}&apikey={api_key}"
+    try:
+        data = _cached_json("alpha_vantage", "CASH_FLOW", symbol, url, api_key, _av_cash_flow_expiry)
+    except requests.RequestException:
+        raise FetchError(f"⚠️ لم يتم جلب بيانات {symbol}")
+
+    if "annualReports" not in data:
+        raise FetchError(f"⚠️ لا توجد بيانات مالية لـ {symbol}")
+
+    rows = []
+    for report in data["annualReports"]:
+        try:
+            operating = int(report["operatingCashflow"])
+            capex = int(report["capitalExpenditures"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows.append({
+            "symbol": symbol,
+            "fiscalDateEnding": report["fiscalDateEnding"],
+            "operatingCashflow": operating,
+            "capitalExpenditures": capex,
+            "freeCashFlow": operating - capex,
+        })
+    return rows
+
+
+def fetch_av_cash_flow(symbols: Iterable[str], api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Fetch Alpha Vantage free cash flow history for every symbol concurrently"""
+    return fetch_many(
+        symbols,
+        lambda symbol: fetch_av_cash_flow_rows(symbol, api_key),
+        provider="alpha_vantage",
+        dtypes=AV_CASH_FLOW_DTYPES
+    )
+
+
+def fetch_finnhub_cash_flow_rows(symbol: str, api_key: str) -> List[Dict[str, object]]:
+    """Fetch annual free cash flow rows of a symbol from Finnhub financials"""
+    url = f"{http_client.base_url('finnhub')}/api/v1/stock/financials?symbol={symbol}&statement=cf&freq=annual&token={api_key}"
+    try:
+        data = _cached_json("finnhub", "stock/financials", symbol, url, api_key, _finnhub_financials_expiry)
+    except requests.RequestException:
+        raise FetchError(f"⚠️ لم يتم جلب بيانات {symbol}")
+
+    if "data" not in data or not data["data"]:
+        raise FetchError(f"⚠️ لا توجد بيانات مالية لـ {symbol}")
+
+    # نحسب FCF = Operating Cash Flow - Capital Expenditure
+    rows = []
+    for report in data["data"]:
+        try:
+            op = float(report.get("cashFromOperations", 0))
+            capex = float(report.get("capitalExpenditures", 0))
+            rows.append({
+                "symbol": symbol,
+                "fiscalDate": report["year"],
+                "OperatingCashFlow": op,
+                "CapitalExpenditures": capex,
+                "FreeCashFlow": op - capex,
+            })
+        except (KeyError, TypeError, ValueError):
+            continue
+    return rows
+
+
+def fetch_finnhub_cash_flow(symbols: Iterable[str], api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Fetch Finnhub free cash flow history for every symbol concurrently"""
+    return fetch_many(
+        symbols,
+        lambda symbol: fetch_finnhub_cash_flow_rows(symbol, api_key),
+        provider="finnhub",
+        dtypes=FINNHUB_CASH_FLOW_DTYPES
+    )
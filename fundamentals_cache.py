@@ -0,0 +1,140 @@
+# fundamentals_cache.py
+import json
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, List, Optional
+
+import pandas as pd
+
+import metrics
+from storage import connect
+
+DB_NAME = "fundamentals.sqlite"
+
+# أقل وأقصى مدة صلاحية للسجل
+MIN_TTL = timedelta(days=1)
+MAX_TTL = timedelta(days=400)
+
+# المدة المعتادة بين نهاية الفترة المالية ونشر التقرير
+QUARTERLY_FILING_LAG = timedelta(days=45)
+ANNUAL_FILING_LAG = timedelta(days=90)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fundamentals (
+    provider TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (provider, endpoint, symbol)
+);
+"""
+
+
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def next_report_expiry(period_end, months: int, filing_lag: timedelta, now: Optional[datetime] = None) -> datetime:
+    """
+    Estimate when data for the period after period_end will be published
+
+    The estimate is the end of the next fiscal period plus the usual filing
+    lag, clamped to [now + MIN_TTL, now + MAX_TTL]. A company that is late
+    to report is therefore re-checked daily rather than never.
+    """
+    now = now or datetime.now()
+    expiry = now + MIN_TTL
+    try:
+        end = pd.Timestamp(period_end)
+        if not pd.isna(end):
+            end = end.to_pydatetime().replace(tzinfo=None)
+            expiry = end + pd.DateOffset(months=months) + filing_lag
+    except (TypeError, ValueError):
+        pass
+    return min(max(expiry, now + MIN_TTL), now + MAX_TTL)
+
+
+def get(provider: str, endpoint: str, symbol: str) -> Optional[Any]:
+    """Return the cached payload, or None if it is missing or past its reporting date"""
+    with closing(_db()) as conn:
+        row = conn.execute(
+            "SELECT payload, expires_at FROM fundamentals WHERE provider=? AND endpoint=? AND symbol=?",
+            (provider, endpoint, symbol)
+        ).fetchone()
+    if row is None or row[1] <= time.time():
+        return None
+    return json.loads(row[0])
+
+
+def missing(provider: str, endpoint: str, symbols: Iterable[str]) -> List[str]:
+    """Symbols that have no fresh cached payload, i.e. that would cost a provider request"""
+    with closing(_db()) as conn:
+        fresh = {row[0] for row in conn.execute(
+            "SELECT symbol FROM fundamentals WHERE provider=? AND endpoint=? AND expires_at>?",
+            (provider, endpoint, time.time())
+        )}
+    return [symbol for symbol in dict.fromkeys(symbols) if symbol and symbol not in fresh]
+
+
+def put(provider: str, endpoint: str, symbol: str, payload: Any, expires_at: datetime) -> None:
+    """Store a payload until expires_at"""
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?, ?, ?)",
+            (provider, endpoint, symbol, json.dumps(payload), time.time(), expires_at.timestamp())
+        )
+
+
+def invalidate(symbol: Optional[str] = None, provider: Optional[str] = None, endpoint: Optional[str] = None) -> int:
+    """
+    Delete cached entries matching every given filter (all entries if none given)
+
+    Entries otherwise stay valid until the next expected report (see
+    next_report_expiry); the pages call this from their "refresh financial
+    data" button to force a refetch before then.
+
+    Returns:
+        int: Number of deleted entries
+    """
+    clauses, params = [], []
+    for column, value in (("symbol", symbol), ("provider", provider), ("endpoint", endpoint)):
+        if value is not None:
+            clauses.append(f"{column}=?")
+            params.append(value)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    with closing(_db()) as conn, conn:
+        return conn.execute(f"DELETE FROM fundamentals{where}", params).rowcount
+
+
+def cached(
+    provider: str,
+    endpoint: str,
+    symbol: str,
+    fetch: Callable[[], Any],
+    expires: Callable[[Any], Optional[datetime]]
+) -> Any:
+    """
+    Return a cached payload or fetch and store it
+
+    Args:
+        provider, endpoint, symbol: Cache key
+        fetch: Fetches the payload from the provider
+        expires: Returns the payload's expiry, or None if it must not be cached
+            (e.g. an error or rate-limit response)
+    """
+    payload = get(provider, endpoint, symbol)
+    if payload is not None:
+        metrics.cache_event("fundamentals", "hit")
+        return payload
+
+    metrics.cache_event("fundamentals", "miss")
+    payload = fetch()
+    expires_at = expires(payload)
+    if expires_at is not None:
+        put(provider, endpoint, symbol, payload, expires_at)
+    return payload
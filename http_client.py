@@ -0,0 +1,199 @@
+# http_client.py
+import copy
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import quota
+from rate_limiter import acquire
+from single_flight import SingleFlight
+
+# (مهلة الاتصال، مهلة القراءة) بالثواني
+DEFAULT_TIMEOUT = (3.05, 20)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+
+# عدد المضيفين المحتفظ باتصالاتهم، وعدد الاتصالات لكل مضيف
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+
+# عناوين المزودين؛ يمكن توجيهها إلى خادم محلي (loadtest/mock_server.py) عبر متغيرات البيئة:
+# <PROVIDER>_BASE_URL لمزود واحد (مثل FINNHUB_BASE_URL)، أو PROVIDER_BASE_URL لجميع المزودين
+DEFAULT_BASE_URLS = {
+    "alpha_vantage": "https://www.alphavantage.co",
+    "finnhub": "https://finnhub.io",
+    "fmp": "https://financialmodelingprep.com",
+    "tiingo": "https://api.tiingo.com",
+    "twelve_data": "https://api.twelvedata.com",
+    "telegram": "https://api.telegram.org",
+    "yahoo": "https://finance.yahoo.com",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_inflight = SingleFlight()
+
+
+def base_url(provider: str) -> str:
+    """Base URL of a provider's API (no trailing slash), honoring the *_BASE_URL overrides"""
+    override = os.getenv(f"{provider.upper()}_BASE_URL") or os.getenv("PROVIDER_BASE_URL")
+    return (override or DEFAULT_BASE_URLS[provider]).rstrip("/")
+
+
+def _retry_policy() -> Retry:
+    kwargs = dict(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=2,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=BACKOFF_JITTER, **kwargs)
+    except TypeError:
+        # urllib3 < 2.0 لا يدعم backoff_jitter
+        return Retry(**kwargs)
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide HTTP session
+
+    The session keeps a keep-alive connection pool per host and retries
+    idempotent requests on connection errors, 429 and 5xx responses with
+    jittered exponential backoff (honoring Retry-After). POST requests are
+    never retried automatically.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=_retry_policy()
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _send(method: str, url: str, provider: Optional[str], api_key: Optional[str], rate_limit: bool, **kwargs) -> requests.Response:
+    if provider and rate_limit:
+        acquire(provider, api_key)
+        quota.charge(provider, api_key)
+    # الطلبات بلا اسم مزود تُسجل باسم المضيف
+    label = provider or urlsplit(url).netloc
+    started = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.RequestException:
+        metrics.observe_request(label, "error", time.perf_counter() - started)
+        raise
+    retries = getattr(response.raw, "retries", None)
+    attempts = 1 + len(retries.history) if retries is not None else 1
+    size = len(response.content) if not kwargs.get("stream") else int(response.headers.get("Content-Length") or 0)
+    metrics.observe_request(label, response.status_code, time.perf_counter() - started, size, attempts=attempts)
+    if provider and rate_limit:
+        # إعادة المحاولة التلقائية تُحتسب من الحصة اليومية أيضاً
+        quota.record(provider, api_key, attempts - 1)
+        if not kwargs.get("stream"):
+            quota.check_response(provider, api_key, response.content)
+    return response
+
+
+def get(
+    url: str,
+    params: Optional[dict] = None,
+    provider: Optional[str] = None,
+    api_key: Optional[str] = None,
+    timeout=DEFAULT_TIMEOUT,
+    rate_limit: bool = True,
+    **kwargs
+) -> requests.Response:
+    """
+    Send a GET request through the shared session
+
+    Every request is recorded in metrics (latency, status, bytes, quota use).
+    Requests to a provider with a daily limit are billed to its shared quota
+    (see quota.py).
+
+    Args:
+        url: Request URL
+        params: Optional query parameters
+        provider: Provider name; when given the request waits for the provider's rate limit
+            and is refused with quota.QuotaExceeded once its daily quota is used up
+        api_key: API key the request is billed to (for per-key rate limits)
+        timeout: (connect, read) timeout in seconds
+        rate_limit: False for callers that pace their own requests (the provider
+            still names the request in metrics)
+
+    Returns:
+        requests.Response
+    """
+    return _send("GET", url, provider, api_key, rate_limit, params=params, timeout=timeout, **kwargs)
+
+
+def post(
+    url: str,
+    provider: Optional[str] = None,
+    api_key: Optional[str] = None,
+    timeout=DEFAULT_TIMEOUT,
+    rate_limit: bool = True,
+    **kwargs
+) -> requests.Response:
+    """Send a POST request through the shared session (see get)"""
+    return _send("POST", url, provider, api_key, rate_limit, timeout=timeout, **kwargs)
+
+
+def _request_key(provider: Optional[str], url: str, params: Optional[dict]) -> tuple:
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    return (provider, parts.netloc, parts.path, tuple(sorted((str(k), str(v)) for k, v in query)))
+
+
+def get_json(
+    url: str,
+    params: Optional[dict] = None,
+    provider: Optional[str] = None,
+    api_key: Optional[str] = None,
+    timeout=DEFAULT_TIMEOUT,
+    dedupe: bool = True,
+    **kwargs
+):
+    """
+    GET a URL and return its decoded JSON body, raising on HTTP errors
+
+    With dedupe=True, identical requests (same provider, endpoint and query
+    parameters) that are already in flight in this process, e.g. from other
+    Streamlit sessions, are not sent again: the callers wait for the
+    running request and each receives its own copy of the result. Only the
+    request that is actually sent counts against the rate limit.
+    """
+    def fetch():
+        response = get(url, params=params, provider=provider, api_key=api_key, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    if not dedupe:
+        return fetch()
+
+    result, shared = _inflight.do(_request_key(provider, url, params), fetch)
+    metrics.cache_event("inflight", "hit" if shared else "miss")
+    return copy.deepcopy(result) if shared else result
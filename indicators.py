@@ -0,0 +1,162 @@
+# indicators.py
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+ArrayLike = Union[np.ndarray, pd.Series, pd.DataFrame, list]
+Result = Union[pd.Series, pd.DataFrame]
+
+# جميع الدوال تعمل على مصفوفة أحادية (سهم واحد) أو ثنائية (تواريخ × رموز)
+# ويكون محور الزمن هو المحور الأول دائمًا
+
+
+def _values(x: ArrayLike) -> np.ndarray:
+    return np.asarray(x, dtype="float64")
+
+
+def _like(*inputs: ArrayLike):
+    # نأخذ الفهرس (والأعمدة) من أول مدخل من نوع pandas
+    for x in inputs:
+        if isinstance(x, (pd.Series, pd.DataFrame)):
+            return x
+    return None
+
+
+def _wrap(values: np.ndarray, like) -> Result:
+    if values.ndim == 1:
+        return pd.Series(values, index=like.index if like is not None else None)
+    if isinstance(like, pd.DataFrame):
+        return pd.DataFrame(values, index=like.index, columns=like.columns)
+    return pd.DataFrame(values)
+
+
+def _frame(values: np.ndarray) -> Result:
+    return pd.Series(values) if values.ndim == 1 else pd.DataFrame(values)
+
+
+def _rolling(values: np.ndarray, window: int, how: str, **kwargs) -> np.ndarray:
+    # pandas.rolling يجمع بنفس الترتيب العددي للحلقات الأصلية
+    if values.ndim == 1:
+        return getattr(pd.Series(values).rolling(window), how)(**kwargs).to_numpy()
+
+    # المصفوفة الثنائية تُفرد عمودًا بعد عمود في سلسلة واحدة بدلاً من نافذة لكل عمود،
+    # ثم تُلغى النوافذ التي تعبر الحد بين سهمين
+    rows, cols = values.shape
+    flat = pd.Series(values.T.ravel())
+    out = getattr(flat.rolling(window), how)(**kwargs).to_numpy().reshape(cols, rows).T.copy()
+    out[:window - 1] = np.nan
+    return out
+
+
+def _shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full_like(values, np.nan)
+    out[periods:] = values[:-periods]
+    return out
+
+
+def obv(close: ArrayLike, volume: ArrayLike) -> Result:
+    """
+    On-Balance Volume
+
+    Starts at 0 and adds (subtracts) the bar's volume when the close is
+    above (below) the previous close.
+    """
+    like = _like(close, volume)
+    close, volume = _values(close), _values(volume)
+    change = np.diff(close, axis=0)
+    flow = np.where(change > 0, volume[1:], np.where(change < 0, -volume[1:], 0.0))
+    out = np.zeros_like(close)
+    if len(close) > 1:
+        out[1:] = np.cumsum(flow, axis=0)
+    return _wrap(out, like)
+
+
+def mfi(high: ArrayLike, low: ArrayLike, close: ArrayLike, volume: ArrayLike, window: int = 14) -> Result:
+    """
+    Money Flow Index
+
+    Keeps the classic behavior of this app: when the typical price rises
+    (falls) on bar i, the money flow of bar i-1 is counted as positive
+    (negative). The first bar has no comparison and is NaN, as are the
+    bars before the window fills.
+    """
+    like = _like(high, low, close, volume)
+    high, low, close, volume = _values(high), _values(low), _values(close), _values(volume)
+    tp = (high + low + close) / 3
+    mf = tp * volume
+
+    change = np.diff(tp, axis=0)
+    prev_mf = mf[:-1]
+    pos = _rolling(np.where(change > 0, prev_mf, 0.0), window, "sum")
+    neg = _rolling(np.where(change < 0, prev_mf, 0.0), window, "sum")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = 100 - (100 / (1 + (pos / neg)))
+    out = np.full_like(tp, np.nan)
+    out[1:] = ratio
+    return _wrap(out, like)
+
+
+def sma(values: ArrayLike, window: int = 20) -> Result:
+    """Simple moving average over the last `window` bars"""
+    like = _like(values)
+    return _wrap(_rolling(_values(values), window, "mean"), like)
+
+
+def ema(values: ArrayLike, span: int = 20) -> Result:
+    """Exponential moving average with alpha = 2 / (span + 1)"""
+    like = _like(values)
+    return _wrap(_frame(_values(values)).ewm(span=span, adjust=False).mean().to_numpy(), like)
+
+
+def _wilder(values: np.ndarray, window: int) -> np.ndarray:
+    return _frame(values).ewm(alpha=1 / window, adjust=False, min_periods=window).mean().to_numpy()
+
+
+def rsi(close: ArrayLike, window: int = 14) -> Result:
+    """Relative Strength Index with Wilder smoothing"""
+    like = _like(close)
+    change = np.diff(_values(close), axis=0, prepend=np.nan)
+    gain = _wilder(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), window)
+    loss = _wilder(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - (100 / (1 + gain / loss))
+    return _wrap(out, like)
+
+
+def macd(close: ArrayLike, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[Result, Result, Result]:
+    """
+    Moving Average Convergence Divergence
+
+    Returns:
+        tuple: (macd line, signal line, histogram)
+    """
+    like = _like(close)
+    values = _values(close)
+    line = ema(values, fast).to_numpy() - ema(values, slow).to_numpy()
+    signal_line = ema(line, signal).to_numpy()
+    return _wrap(line, like), _wrap(signal_line, like), _wrap(line - signal_line, like)
+
+
+def atr(high: ArrayLike, low: ArrayLike, close: ArrayLike, window: int = 14) -> Result:
+    """Average True Range with Wilder smoothing"""
+    like = _like(high, low, close)
+    high, low, close = _values(high), _values(low), _values(close)
+    prev_close = _shift(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _wrap(_wilder(true_range, window), like)
+
+
+def bollinger(close: ArrayLike, window: int = 20, num_std: float = 2.0) -> Tuple[Result, Result, Result]:
+    """
+    Bollinger Bands (population standard deviation)
+
+    Returns:
+        tuple: (middle, upper, lower)
+    """
+    like = _like(close)
+    values = _values(close)
+    middle = _rolling(values, window, "mean")
+    std = _rolling(values, window, "std", ddof=0)
+    return _wrap(middle, like), _wrap(middle + num_std * std, like), _wrap(middle - num_std * std, like)
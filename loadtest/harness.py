@@ -0,0 +1,469 @@
+# loadtest/harness.py
+"""
+Drive the Streamlit pages headlessly with N concurrent sessions.
+
+Every session is a thread that clicks through USApp.py, USA_SA_AR.py,
+Bigbov.py and roe_analysis.py with Streamlit's AppTest, which runs each
+page script on its own script thread exactly as the server does for a
+browser tab, with one session state across the pages of a session. All
+sessions share one process, so they share the app's
+connection pool, rate limits, in-process caches and the GIL, like the
+sessions of one `streamlit run`.
+
+The providers are answered by loadtest/mock_server.py (started as a
+subprocess unless --base-url is given), with its latency, error and rate
+limit profile. yfinance does not let its URLs be redirected, so it is
+replaced by a small client of the mock server's Yahoo chart endpoint.
+
+For each N the harness reports the p50/p95/p99 time of a page run (one
+script run: opening a page or one click), the process CPU use and RSS,
+and the provider responses the mock server returned. Each N starts with
+an empty local cache directory.
+
+    python loadtest/harness.py                                  # N = 1, 2, 4, 8, 16
+    python loadtest/harness.py --sessions 1,8,32 --iterations 3
+    python loadtest/harness.py --config loadtest/mock_server.example.json --json results.json
+    python loadtest/harness.py --no-client-limits               # measure the server, not the API quotas
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import http_client  # noqa: E402
+import rate_limiter  # noqa: E402
+import storage  # noqa: E402
+from price_store import OHLCV_COLUMNS  # noqa: E402
+
+DEFAULT_SESSIONS = [1, 2, 4, 8, 16]
+API_KEY = "loadtest"
+SECRETS = {
+    "FINNHUB_API_KEY": API_KEY,
+    "alpha_vantage": {"api_key": API_KEY},
+    "telegram": {"bot_token": API_KEY, "chat_id": "1"},
+}
+# كل جلسة تحلل سهماً وسوقاً مختلفين حتى لا تخدم الذاكرة المؤقتة الجميع من أول طلب
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "KO", "XOM", "JPM", "2222.SR"]
+MARKETS = ["NASDAQ", "NYSE", "Tadawul"]
+
+
+# --- بديل yfinance يقرأ من واجهة الرسم البياني في الخادم المحلي ---
+def chart_history(symbol: str, period: str = "1mo", start=None) -> pd.DataFrame:
+    """Daily bars of a symbol from the Yahoo v8 chart endpoint, indexed like yfinance (exchange-local midnight)"""
+    params = {"interval": "1d"}
+    if start is None:
+        params["range"] = period
+    else:
+        params["period1"] = int(pd.Timestamp(start, tz="UTC").timestamp())
+        params["period2"] = int(time.time())
+    data = http_client.get_json(f"{http_client.base_url('yahoo')}/v8/finance/chart/{symbol}", params=params)
+    result = data["chart"]["result"][0]
+    if not result.get("timestamp"):
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    quote = result["indicators"]["quote"][0]
+    index = pd.to_datetime(result["timestamp"], unit="s").normalize().tz_localize(result["meta"]["exchangeTimezoneName"])
+    return pd.DataFrame(
+        {column: quote[column.lower()] for column in OHLCV_COLUMNS},
+        index=pd.DatetimeIndex(index, name="Date")
+    )
+
+
+class ChartTicker:
+    """Stand-in for yfinance.Ticker (history only)"""
+
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+
+    def history(self, period: str = "1mo", start=None, **kwargs) -> pd.DataFrame:
+        return chart_history(self.ticker, period, start)
+
+
+def _download_one(symbol: str, period: str) -> Optional[pd.DataFrame]:
+    try:
+        return chart_history(symbol, period).tz_localize(None)
+    except Exception:
+        return None
+
+
+def chart_download(tickers, period: str = "1mo", group_by: str = "ticker", threads: bool = True, **kwargs) -> pd.DataFrame:
+    """
+    Stand-in for yfinance.download(group_by="ticker")
+
+    Like yfinance, one chart request per symbol, in parallel on up to
+    2 x CPU threads; failed symbols are left out.
+    """
+    symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+    workers = min(len(symbols), (os.cpu_count() or 1) * 2) if threads else 1
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        results = pool.map(lambda symbol: _download_one(symbol, period), symbols)
+        frames = {symbol: frame for symbol, frame in zip(symbols, results) if frame is not None}
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+def _keep_first(cls: type, attribute: str) -> type:
+    """A subclass of cls through which attribute can be set on cls once, but not replaced or cleared"""
+    class KeepFirst(type):
+        def __setattr__(self, name, value):
+            if name != attribute:
+                super().__setattr__(name, value)
+            elif getattr(cls, attribute) is None and value is not None:
+                setattr(cls, attribute, value)
+
+    return KeepFirst(cls.__name__, (cls,), {})
+
+
+def install(no_client_limits: bool = False) -> None:
+    """
+    Prepare the process for concurrent AppTest sessions
+
+    Routes yfinance to the mock server, gives every page the same secrets
+    and makes AppTest share the compiled pages and the Runtime between
+    sessions, as the server does.
+    """
+    import streamlit as st
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test
+    import yfinance
+
+    yfinance.Ticker = ChartTicker
+    yfinance.download = chart_download
+
+    # نضبط st.secrets مرة واحدة للعملية بدلاً من AppTest.secrets، الذي يستبدلها ثم يعيدها
+    # مع كل تشغيل ولا يصلح عندما تعمل عدة جلسات في نفس الوقت
+    secrets = Secrets()
+    secrets._secrets = SECRETS
+    st.secrets = secrets
+
+    # الخادم يترجم كل صفحة مرة واحدة ويشاركها بين الجلسات، بينما ينشئ AppTest ذاكرة جديدة
+    # مع كل تشغيل؛ والترجمة المتزامنة في عدة خيوط تفشل أحياناً في Python 3.11
+    shared_cache = ScriptCache()
+    app_test.ScriptCache = lambda: shared_cache
+    # ويثبت AppTest كذلك Runtime وهمياً ويعيد ضبط نوع التطبيق (مجلد pages) مع كل تشغيل ثم يحذفهما،
+    # فتحذف الجلسات المتزامنة ما تعتمد عليه الأخرى؛ الخادم فيه Runtime واحد فنبقي أول ما يُثبَّت
+    app_test.Runtime = _keep_first(Runtime, "_instance")
+    app_test.PagesManager = _keep_first(PagesManager, "uses_pages_directory")
+    # AppTest يُنشأ خارج خيط تشغيل الصفحة، وهذا التحذير يتكرر مع كل جلسة
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage()
+    )
+
+    if no_client_limits:
+        for provider in rate_limiter.PROVIDER_LIMITS:
+            rate_limiter.PROVIDER_LIMITS[provider] = {}
+
+
+# --- مسار الجلسة: الصفحات والنقرات بالترتيب ---
+Step = Tuple[str, Callable]
+
+
+def _find(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"العنصر غير موجود في الصفحة: {label}")
+
+
+def _open(at, session: dict) -> None:
+    pass
+
+
+def _click(label: str) -> Callable:
+    def step(at, session: dict) -> None:
+        _find(at.button, label).click()
+    return step
+
+
+def _fill_and_click(input_label: str, button_label: str) -> Callable:
+    def step(at, session: dict) -> None:
+        _find(at.text_input, input_label).set_value(session["symbol"])
+        _find(at.button, button_label).click()
+    return step
+
+
+def _market_and_click(button_label: str) -> Callable:
+    def step(at, session: dict) -> None:
+        _find(at.selectbox, "اختر السوق:").set_value(session["market"])
+        _find(at.button, button_label).click()
+    return step
+
+
+PAGES: Dict[str, Tuple[str, List[Step]]] = {
+    "USApp": ("USApp.py", [
+        ("open", _open),
+        ("chart", _click("عرض الرسم البياني التاريخي")),
+    ]),
+    "USA_SA_AR": ("pages/USA_SA_AR.py", [
+        ("open", _open),
+        ("gainers", _market_and_click("جلب أحدث البيانات")),
+        ("analyze", _fill_and_click("أدخل رمز السهم (مثال: AAPL, 2222.SR):", "تحليل السهم")),
+    ]),
+    "Bigbov": ("pages/Bigbov.py", [
+        ("open", _open),
+        ("gainers", _click("جلب أحدث البيانات")),
+        ("analyze", _fill_and_click("أدخل رمز السهم (مثال: AAPL):", "تحليل السهم")),
+    ]),
+    "roe_analysis": ("pages/roe_analysis.py", [
+        ("open", _open),
+        ("search", _click("🔎 بحث عن الشركات")),
+    ]),
+}
+
+
+class LevelResult:
+    """Page run samples and errors collected by the sessions of one load level"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Tuple[str, str, float]] = []
+        self.errors: Counter = Counter()
+        self.messages: Counter = Counter()
+
+    def add(self, page: str, step: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.append((page, step, seconds))
+
+    def error(self, page: str, message: str) -> None:
+        with self._lock:
+            self.errors[page] += 1
+            self.messages[f"{page}: {message[:120]}"] += 1
+
+    def alert(self, page: str, message: str) -> None:
+        with self._lock:
+            self.messages[f"{page}: (st.error) {message[:120]}"] += 1
+
+
+def run_session(at, index: int, iterations: int, result: LevelResult, start: threading.Barrier) -> None:
+    """One simulated analyst: every page of PAGES, step by step, iterations times"""
+    session = {"symbol": SYMBOLS[index % len(SYMBOLS)], "market": MARKETS[index % len(MARKETS)]}
+    start.wait()
+    for _ in range(iterations):
+        for page, (script, steps) in PAGES.items():
+            at.switch_page(script)
+            for name, step in steps:
+                try:
+                    step(at, session)
+                    started = time.perf_counter()
+                    at.run()
+                    result.add(page, name, time.perf_counter() - started)
+                except Exception as e:
+                    # انتهاء المهلة أو عنصر مفقود بعد خطأ سابق: ننتقل إلى الصفحة التالية
+                    result.error(page, f"{name}: {e}")
+                    break
+                for exception in at.exception:
+                    result.error(page, f"{name}: {exception.value}")
+                # رسائل st.error قد تكون نتيجة تحليل عادية، فتُعرض مع التفاصيل ولا تُحسب أخطاء
+                for alert in at.error:
+                    result.alert(page, f"{name}: {alert.value}")
+
+
+# --- قياس موارد العملية ---
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceSampler:
+    """Samples RSS on a background thread; CPU comes from process_time deltas"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.cpu_started = time.process_time()
+        self.wall_started = time.perf_counter()
+        self.rss_started = rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+        self.cpu = time.process_time() - self.cpu_started
+        self.wall = time.perf_counter() - self.wall_started
+
+
+# --- الخادم المحلي ---
+def start_mock_server(config: Optional[str], seed: Optional[int]) -> Tuple[subprocess.Popen, str]:
+    """Run mock_server.py in its own process so its CPU and memory are not counted here"""
+    command = [sys.executable, "-u", str(ROOT / "loadtest" / "mock_server.py"), "--port", "0"]
+    if config:
+        command += ["--config", config]
+    if seed is not None:
+        command += ["--seed", str(seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Mock providers listening on "):
+        process.kill()
+        raise RuntimeError(f"تعذر تشغيل الخادم المحلي: {line.strip()}")
+    return process, line.rsplit(" ", 1)[1].strip()
+
+
+def mock_call(base: str, path: str) -> dict:
+    method = http_client.post if path == "/__reset" else http_client.get
+    return method(f"{base}{path}").json()
+
+
+def _reset_process_state(cache_dir: str) -> None:
+    # كل مستوى حمل يبدأ بذاكرة مؤقتة فارغة وحدود طلبات جديدة
+    import yahoo_scraper
+
+    storage.CACHE_DIR = Path(cache_dir)
+    with yahoo_scraper._parsed_lock:
+        yahoo_scraper._parsed.clear()
+    with rate_limiter._limiters_lock:
+        rate_limiter._limiters.clear()
+
+
+def run_level(n: int, iterations: int, timeout: float, base: str) -> dict:
+    """Run n concurrent sessions and summarize their page times and resource use"""
+    from streamlit.testing.v1 import AppTest
+
+    result = LevelResult()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _reset_process_state(cache_dir)
+        mock_call(base, "/__reset")
+        start = threading.Barrier(n + 1)
+        # الصفحات تُفتح من خلال الصفحة الرئيسية كما في المتصفح، فيكون مسار الاستيراد هو جذر التطبيق.
+        # ننشئ الجلسات هنا لأن AppTest يفترض إنشاءه في الخيط الرئيسي
+        threads = [
+            threading.Thread(
+                target=run_session,
+                args=(AppTest.from_file(str(ROOT / "USApp.py"), default_timeout=timeout), i, iterations, result, start),
+                name=f"session-{i}"
+            )
+            for i in range(n)
+        ]
+        for thread in threads:
+            thread.start()
+        with ResourceSampler() as usage:
+            start.wait()
+            for thread in threads:
+                thread.join()
+        provider_stats = mock_call(base, "/__stats")
+
+    def percentiles(seconds: List[float]) -> Dict[str, float]:
+        if not seconds:
+            return {}
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        return {"runs": len(seconds), "p50": p50, "p95": p95, "p99": p99, "max": max(seconds)}
+
+    by_page = defaultdict(list)
+    for page, _, seconds in result.samples:
+        by_page[page].append(seconds)
+    return {
+        "sessions": n,
+        "wall_s": usage.wall,
+        "cpu_s": usage.cpu,
+        "cpu_percent": usage.cpu / usage.wall * 100 if usage.wall else 0.0,
+        "rss_start_mb": usage.rss_started / 2 ** 20,
+        "rss_peak_mb": usage.peak_rss / 2 ** 20,
+        "pages": percentiles([seconds for _, _, seconds in result.samples]),
+        "by_page": {page: percentiles(seconds) for page, seconds in by_page.items()},
+        "errors": dict(result.errors),
+        "error_messages": dict(result.messages.most_common(10)),
+        "provider_responses": provider_stats,
+    }
+
+
+def print_level(level: dict, verbose: bool) -> None:
+    pages = level["pages"]
+    errors = sum(level["errors"].values())
+    if pages:
+        print(f"{level['sessions']:>4} {pages['runs']:>6} {pages['p50']:8.2f} {pages['p95']:8.2f} {pages['p99']:8.2f}"
+              f" {pages['max']:8.2f} {errors:>6} {level['cpu_percent']:6.0f}% {level['rss_peak_mb']:9.0f}")
+    else:
+        print(f"{level['sessions']:>4}  لا توجد نتائج ({errors} أخطاء)")
+    if verbose:
+        for page, stats in level["by_page"].items():
+            print(f"       {page:<14} p50 {stats['p50']:6.2f}  p95 {stats['p95']:6.2f}  p99 {stats['p99']:6.2f}"
+                  f"  أخطاء {level['errors'].get(page, 0)}")
+        print(f"       المزودون: {json.dumps(level['provider_responses'], ensure_ascii=False)}")
+        for message, count in level["error_messages"].items():
+            print(f"       ×{count} {message}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="اختبار حمل لصفحات Streamlit بجلسات متزامنة")
+    parser.add_argument("--sessions", default=",".join(map(str, DEFAULT_SESSIONS)), help="أعداد الجلسات مفصولة بفواصل")
+    parser.add_argument("--iterations", type=int, default=1, help="عدد مرات مرور كل جلسة على الصفحات")
+    parser.add_argument("--timeout", type=float, default=180, help="أقصى مدة لتشغيل صفحة واحدة (ثوان)")
+    parser.add_argument("--base-url", help="عنوان خادم محلي يعمل مسبقاً (الافتراضي: تشغيل mock_server.py)")
+    parser.add_argument("--config", help="ملف إعدادات الخادم المحلي (زمن الاستجابة والأخطاء والحدود)")
+    parser.add_argument("--seed", type=int, help="بذرة الخادم المحلي")
+    parser.add_argument("--no-client-limits", action="store_true", help="إلغاء حدود الطلبات في التطبيق")
+    parser.add_argument("--json", metavar="PATH", help="حفظ النتائج في ملف JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="تفاصيل كل صفحة والأخطاء")
+    args = parser.parse_args(argv)
+
+    # أخطاء الصفحات تُجمع في النتائج، فلا داعي لطباعة سجلات Streamlit
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "critical")
+    # USApp.py يبحث عن pages/us_market.py بمسار نسبي
+    os.chdir(ROOT)
+
+    process = None
+    base = args.base_url
+    if base is None:
+        process, base = start_mock_server(args.config, args.seed)
+    os.environ["PROVIDER_BASE_URL"] = base
+    install(args.no_client_limits)
+
+    levels = []
+    try:
+        # جلسة تمهيدية غير محسوبة: استيراد المكتبات وتجميع الصفحات لا يُحسب على أول مستوى
+        run_level(1, 1, args.timeout, base)
+        print(f"الخادم المحلي: {base}")
+        print("   N   runs      p50      p95      p99      max errors    CPU  RSS (MB)")
+        for n in (int(size) for size in args.sessions.split(",")):
+            level = run_level(n, args.iterations, args.timeout, base)
+            levels.append(level)
+            print_level(level, args.verbose)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "iterations": args.iterations,
+            "client_limits": not args.no_client_limits,
+            "levels": levels,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,599 @@
+# loadtest/mock_server.py
+"""
+Local stand-in for the provider APIs the pages call, for load and latency tests.
+
+Serves the subset of Alpha Vantage (TOP_GAINERS_LOSERS, OVERVIEW, CASH_FLOW,
+TIME_SERIES_DAILY, GLOBAL_QUOTE, MARKET_STATUS), Finnhub (stock/metric,
+stock/financials, stock/candle, stock/gainers), FMP (quote, actives),
+Tiingo (daily prices), Twelve Data (time_series), Telegram sendMessage and
+Yahoo Finance (the gainers / index components pages and the v8 chart API).
+The URL paths of these APIs do not overlap, so one server stands in for
+all of them. Point the app at it with:
+
+    PROVIDER_BASE_URL=http://127.0.0.1:8765 streamlit run USApp.py
+
+yfinance builds its own Yahoo URLs, so price history fetched through it
+still goes to Yahoo; loadtest/harness.py replaces yfinance with calls to
+the chart endpoint here.
+
+Every provider has a configurable latency distribution, error rate and
+server-side rate limit (answered like the real API: HTTP 429 with
+Retry-After, Telegram's parameters.retry_after, or Alpha Vantage's 200 with
+an "Information" message). Response data and injected latencies/errors are
+derived from --seed and the request itself, so a run can be repeated.
+
+Usage:
+    python loadtest/mock_server.py                          # default profile on port 8765
+    python loadtest/mock_server.py --config loadtest/mock_server.example.json --port 9000
+
+GET /__stats returns request counts per provider and status; POST /__reset clears them.
+"""
+import argparse
+import copy
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rate_limiter import RateLimiter  # noqa: E402
+
+# زمن الاستجابة بالمللي ثانية، ونسبة الأخطاء (5xx)، وحدود الطلبات على جانب الخادم
+DEFAULT_CONFIG = {
+    "seed": 1,
+    "providers": {
+        "alpha_vantage": {
+            "latency_ms": {"dist": "lognormal", "median": 250, "sigma": 0.4},
+            "error_rate": 0.0,
+            "rate_limit": {"per_minute": 75},
+        },
+        "finnhub": {
+            "latency_ms": {"dist": "lognormal", "median": 90, "sigma": 0.5},
+            "error_rate": 0.0,
+            "rate_limit": {"per_second": 30, "per_minute": 60},
+        },
+        "fmp": {
+            "latency_ms": {"dist": "lognormal", "median": 120, "sigma": 0.4},
+            "error_rate": 0.0,
+            "rate_limit": {"per_minute": 300},
+        },
+        "tiingo": {
+            "latency_ms": {"dist": "lognormal", "median": 150, "sigma": 0.4},
+            "error_rate": 0.0,
+            "rate_limit": {"per_hour": 500},
+        },
+        "twelve_data": {
+            "latency_ms": {"dist": "lognormal", "median": 200, "sigma": 0.4},
+            "error_rate": 0.0,
+            "rate_limit": {"per_minute": 8},
+        },
+        "yahoo": {
+            "latency_ms": {"dist": "lognormal", "median": 180, "sigma": 0.5},
+            "error_rate": 0.0,
+            # Yahoo لا ينشر حدوده؛ هذا قريب مما يُلاحظ قبل الحظر المؤقت
+            "rate_limit": {"per_hour": 2000},
+        },
+        "telegram": {
+            "latency_ms": {"dist": "lognormal", "median": 120, "sigma": 0.3},
+            "error_rate": 0.0,
+            "rate_limit": {"per_second": 30},
+            # حد إضافي لكل محادثة كما يفعل Telegram
+            "chat_rate_limit": {"per_second": 1},
+        },
+    },
+}
+
+ERROR_STATUSES = (500, 502, 503)
+AV_RATE_LIMIT_MESSAGE = (
+    "Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day. "
+    "Please subscribe to any of the premium plans to instantly remove all daily rate limits."
+)
+_BOT_PATH = re.compile(r"^/bot([^/]+)/(\w+)$")
+_TIINGO_PATH = re.compile(r"^/tiingo/daily/([^/]+)/prices$")
+_FMP_QUOTE_PATH = re.compile(r"^/api/v3/quote/([^/]+)$")
+_YAHOO_PATH = re.compile(r"^/(gainers|quote/([^/]+)/components/?|v8/finance/chart/([^/]+))$")
+# عدد أيام التداول لكل مدة في واجهة الرسم البياني
+_YAHOO_RANGES = {"5d": 5, "1mo": 22, "3mo": 66, "6mo": 130, "1y": 260, "2y": 520, "5y": 1300, "max": 2500}
+
+
+def merge_config(base: dict, override: dict) -> dict:
+    """Deep-merge a (partial) config over the defaults"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def sample_latency(spec: dict, rng: random.Random) -> float:
+    """
+    Draw one latency in seconds
+
+    spec: {"dist": "constant", "value": 50}
+          {"dist": "uniform", "low": 20, "high": 80}
+          {"dist": "lognormal", "median": 90, "sigma": 0.5}
+          plus optional {"spike_rate": 0.01, "spike_ms": 2000} for rare stalls
+    """
+    dist = spec.get("dist", "constant")
+    if dist == "uniform":
+        ms = rng.uniform(spec["low"], spec["high"])
+    elif dist == "lognormal":
+        ms = spec["median"] * math.exp(rng.gauss(0, spec.get("sigma", 0.5)))
+    else:
+        ms = spec.get("value", 0)
+    if rng.random() < spec.get("spike_rate", 0):
+        ms += spec.get("spike_ms", 0)
+    return ms / 1000
+
+
+# --- بيانات مولدة بشكل حتمي لكل رمز ---
+def _symbol_rng(symbol: str, salt: str = "") -> random.Random:
+    return random.Random(int(hashlib.sha256(f"{symbol}:{salt}".encode()).hexdigest()[:16], 16))
+
+
+def _business_days(count: int, end: Optional[date] = None) -> List[date]:
+    day = end or datetime.now(timezone.utc).date() - timedelta(days=1)
+    days = []
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def daily_bars(symbol: str, count: int) -> List[dict]:
+    """count daily OHLCV bars of a symbol ending on the last business day, oldest first"""
+    rng = _symbol_rng(symbol, "bars")
+    price = rng.uniform(5, 500)
+    bars = []
+    for day in _business_days(count):
+        open_ = price
+        price = max(0.5, price * math.exp(rng.gauss(0.0003, 0.02)))
+        high = max(open_, price) * (1 + rng.uniform(0, 0.015))
+        low = min(open_, price) * (1 - rng.uniform(0, 0.015))
+        bars.append({
+            "date": day, "open": round(open_, 2), "high": round(high, 2), "low": round(low, 2),
+            "close": round(price, 2), "volume": int(rng.uniform(2e5, 5e7)),
+        })
+    return bars
+
+
+def _universe(rng: random.Random, count: int) -> List[str]:
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(2, 4))) for _ in range(count)]
+
+
+def alpha_vantage(query: Dict[str, str]) -> dict:
+    function = query.get("function", "")
+    symbol = query.get("symbol", "").upper()
+    if function == "TOP_GAINERS_LOSERS":
+        rng = _symbol_rng(datetime.now(timezone.utc).strftime("%Y-%m-%d"), "movers")
+        def movers(sign):
+            rows = []
+            for ticker in _universe(rng, 20):
+                price = rng.uniform(1, 300)
+                change = sign * rng.uniform(0.5, 60)
+                rows.append({
+                    "ticker": ticker,
+                    "price": f"{price:.2f}",
+                    "change_amount": f"{price * change / 100:.4f}",
+                    "change_percentage": f"{change:.4f}%",
+                    "volume": str(int(rng.uniform(1e5, 9e7))),
+                })
+            return sorted(rows, key=lambda r: -sign * float(r["change_percentage"][:-1]))
+        return {
+            "metadata": "Top gainers, losers, and most actively traded US tickers",
+            "last_updated": datetime.now(timezone.utc).strftime("%Y-%m-%d 16:15:59 US/Eastern"),
+            "top_gainers": movers(1),
+            "top_losers": movers(-1),
+            "most_actively_traded": movers(1),
+        }
+    if function == "OVERVIEW":
+        rng = _symbol_rng(symbol, "overview")
+        sectors = ["TECHNOLOGY", "FINANCE", "ENERGY & TRANSPORTATION", "LIFE SCIENCES", "MANUFACTURING", "TRADE & SERVICES"]
+        quarter_end = date(date.today().year, ((date.today().month - 1) // 3) * 3 + 1, 1) - timedelta(days=1)
+        return {
+            "Symbol": symbol, "AssetType": "Common Stock", "Name": f"{symbol} Corporation",
+            "Exchange": "NASDAQ", "Currency": "USD", "Country": "USA", "Sector": rng.choice(sectors),
+            "Industry": "SERVICES", "FiscalYearEnd": "December", "LatestQuarter": quarter_end.isoformat(),
+            "MarketCapitalization": str(int(10 ** rng.uniform(8, 12.5))),
+            "PERatio": f"{rng.uniform(5, 60):.2f}", "EPS": f"{rng.uniform(-2, 15):.2f}",
+            "ReturnOnEquityTTM": f"{rng.uniform(-0.2, 0.6):.4f}",
+            "OperatingMarginTTM": f"{rng.uniform(-0.1, 0.5):.4f}", "ProfitMargin": f"{rng.uniform(-0.1, 0.4):.4f}",
+        }
+    if function == "CASH_FLOW":
+        rng = _symbol_rng(symbol, "cash_flow")
+        reports = []
+        for year in range(date.today().year - 1, date.today().year - 6, -1):
+            operating = int(rng.uniform(1e8, 1e11))
+            reports.append({
+                "fiscalDateEnding": f"{year}-12-31", "reportedCurrency": "USD",
+                "operatingCashflow": str(operating),
+                "capitalExpenditures": str(int(operating * rng.uniform(0.05, 0.6))),
+                "netIncome": str(int(operating * rng.uniform(0.4, 0.9))),
+            })
+        return {"symbol": symbol, "annualReports": reports, "quarterlyReports": []}
+    if function == "TIME_SERIES_DAILY":
+        bars = daily_bars(symbol, 100 if query.get("outputsize", "compact") == "compact" else 5000)
+        return {
+            "Meta Data": {"1. Information": "Daily Prices (open, high, low, close) and Volumes", "2. Symbol": symbol},
+            "Time Series (Daily)": {
+                bar["date"].isoformat(): {
+                    "1. open": f"{bar['open']:.4f}", "2. high": f"{bar['high']:.4f}", "3. low": f"{bar['low']:.4f}",
+                    "4. close": f"{bar['close']:.4f}", "5. volume": str(bar["volume"]),
+                }
+                for bar in reversed(bars)
+            },
+        }
+    if function == "GLOBAL_QUOTE":
+        last, prev = daily_bars(symbol, 2)[::-1]
+        change = last["close"] - prev["close"]
+        return {"Global Quote": {
+            "01. symbol": symbol, "02. open": f"{last['open']:.4f}", "03. high": f"{last['high']:.4f}",
+            "04. low": f"{last['low']:.4f}", "05. price": f"{last['close']:.4f}", "06. volume": str(last["volume"]),
+            "07. latest trading day": last["date"].isoformat(), "08. previous close": f"{prev['close']:.4f}",
+            "09. change": f"{change:.4f}", "10. change percent": f"{change / prev['close'] * 100:.4f}%",
+        }}
+    if function == "MARKET_STATUS":
+        return {"endpoint": "Global Market Open & Close Status", "markets": [
+            {"market_type": "Equity", "region": "United States", "primary_exchanges": "NASDAQ, NYSE",
+             "local_open": "09:30", "local_close": "16:15", "current_status": "open", "notes": ""},
+            {"market_type": "Equity", "region": "Saudi Arabia", "primary_exchanges": "Tadawul",
+             "local_open": "10:00", "local_close": "15:00", "current_status": "closed", "notes": ""},
+        ]}
+    return {"Error Message": f"Invalid API call: unsupported function {function}"}
+
+
+def finnhub(endpoint: str, query: Dict[str, str]) -> Tuple[int, object]:
+    symbol = query.get("symbol", "").upper()
+    if endpoint == "stock/metric":
+        rng = _symbol_rng(symbol, "metric")
+        quarter = (date.today() - timedelta(days=100)).isoformat()
+        return 200, {"symbol": symbol, "metricType": "all", "metric": {
+            "operatingMarginTTM": rng.uniform(-0.1, 0.5), "netProfitMarginTTM": rng.uniform(-0.1, 0.4),
+            "revenueGrowthTTM": rng.uniform(-0.3, 0.8), "roeTTM": rng.uniform(-20, 60),
+        }, "series": {"quarterly": {"eps": [{"period": quarter, "v": rng.uniform(-1, 5)}]}}}
+    if endpoint == "stock/financials":
+        rng = _symbol_rng(symbol, "financials")
+        rows = []
+        for year in range(date.today().year - 1, date.today().year - 8, -1):
+            operations = rng.uniform(1e8, 1e11)
+            rows.append({"year": year, "period": f"{year}-12-31", "cashFromOperations": operations,
+                         "capitalExpenditures": operations * rng.uniform(0.05, 0.6)})
+        return 200, {"symbol": symbol, "data": rows}
+    if endpoint == "stock/candle":
+        since = int(query.get("from", 0))
+        until = int(query.get("to", time.time()))
+        bars = [
+            bar for bar in daily_bars(symbol, 260)
+            if since <= datetime.combine(bar["date"], datetime.min.time(), timezone.utc).timestamp() <= until
+        ]
+        if not bars:
+            return 200, {"s": "no_data"}
+        return 200, {
+            "s": "ok",
+            "t": [int(datetime.combine(bar["date"], datetime.min.time(), timezone.utc).timestamp()) for bar in bars],
+            "o": [bar["open"] for bar in bars], "h": [bar["high"] for bar in bars],
+            "l": [bar["low"] for bar in bars], "c": [bar["close"] for bar in bars],
+            "v": [bar["volume"] for bar in bars],
+        }
+    if endpoint == "stock/gainers":
+        rng = _symbol_rng(datetime.now(timezone.utc).strftime("%Y-%m-%d"), "finnhub-gainers")
+        return 200, [{"symbol": ticker, "change": rng.uniform(1, 40)} for ticker in _universe(rng, 30)]
+    return 404, {"error": f"Unknown endpoint {endpoint}"}
+
+
+def fmp(path: str) -> Tuple[int, object]:
+    match = _FMP_QUOTE_PATH.match(path)
+    if match:
+        quotes = []
+        for symbol in match.group(1).upper().split(","):
+            last, prev = daily_bars(symbol, 2)[::-1]
+            quotes.append({
+                "symbol": symbol, "name": f"{symbol} Corporation", "price": last["close"],
+                "change": round(last["close"] - prev["close"], 2),
+                "changesPercentage": round((last["close"] - prev["close"]) / prev["close"] * 100, 4),
+                "volume": last["volume"], "previousClose": prev["close"],
+            })
+        return 200, quotes
+    if path == "/api/v3/stock_market/actives":
+        rng = _symbol_rng(datetime.now(timezone.utc).strftime("%Y-%m-%d"), "fmp-actives")
+        return 200, [
+            {"symbol": ticker, "name": f"{ticker} Inc", "change": round(rng.uniform(-5, 5), 2),
+             "price": round(rng.uniform(1, 300), 2), "changesPercentage": round(rng.uniform(-20, 20), 4)}
+            for ticker in _universe(rng, 50)
+        ]
+    return 404, {"Error Message": "Invalid endpoint"}
+
+
+def tiingo(symbol: str, query: Dict[str, str]) -> list:
+    since = query.get("startDate")
+    bars = daily_bars(symbol.upper(), 260)
+    return [
+        {"date": f"{bar['date'].isoformat()}T00:00:00.000Z", "open": bar["open"], "high": bar["high"],
+         "low": bar["low"], "close": bar["close"], "volume": bar["volume"], "adjClose": bar["close"]}
+        for bar in bars if since is None or bar["date"].isoformat() >= since
+    ]
+
+
+def twelve_data(query: Dict[str, str]) -> dict:
+    symbol = query.get("symbol", "").upper()
+    since = query.get("start_date")
+    bars = [bar for bar in daily_bars(symbol, 260) if since is None or bar["date"].isoformat() >= since]
+    return {"meta": {"symbol": symbol, "interval": "1day"}, "status": "ok", "values": [
+        {"datetime": bar["date"].isoformat(), "open": str(bar["open"]), "high": str(bar["high"]),
+         "low": str(bar["low"]), "close": str(bar["close"]), "volume": str(bar["volume"])}
+        for bar in reversed(bars)
+    ]}
+
+
+def _html_table(columns: List[str], rows: List[list]) -> str:
+    head = "".join(f"<th>{column}</th>" for column in columns)
+    body = "".join("<tr>" + "".join(f"<td>{value}</td>" for value in row) + "</tr>" for row in rows)
+    # الصفحة الحقيقية كبيرة (سكربتات وقوائم)؛ نضيف حشواً حتى يبقى مسار الاستخراج واقعياً
+    filler = "<script>window.__data = {};</script>" * 200
+    return (f"<html><head><title>Yahoo Finance</title>{filler}</head><body>"
+            f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table></body></html>")
+
+
+def yahoo(match: "re.Match", query: Dict[str, str]) -> Tuple[int, object]:
+    if match.group(3):
+        symbol = match.group(3).upper()
+        if "period1" in query:
+            since = date.fromtimestamp(int(query["period1"]))
+            until = date.fromtimestamp(int(query.get("period2", time.time())))
+            bars = [bar for bar in daily_bars(symbol, 2500) if since <= bar["date"] <= until]
+        else:
+            bars = daily_bars(symbol, _YAHOO_RANGES.get(query.get("range", "1mo"), 22))
+        if not bars:
+            return 200, {"chart": {"result": [{"meta": {"symbol": symbol}, "indicators": {"quote": [{}]}}], "error": None}}
+        quote = {field: [bar[field] for bar in bars] for field in ("open", "high", "low", "close", "volume")}
+        return 200, {"chart": {"result": [{
+            "meta": {"symbol": symbol, "currency": "SAR" if symbol.endswith(".SR") else "USD",
+                     "exchangeTimezoneName": "Asia/Riyadh" if symbol.endswith(".SR") else "America/New_York"},
+            "timestamp": [int(datetime.combine(bar["date"], datetime.min.time(), timezone.utc).timestamp()) for bar in bars],
+            "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]},
+        }], "error": None}}
+
+    # صفحة الأسهم الأكثر ارتفاعاً أو مكونات المؤشر: تتغير مرة في اليوم لكل سوق
+    market = match.group(2) or query.get("e", "nasdaq")
+    rng = _symbol_rng(datetime.now(timezone.utc).strftime("%Y-%m-%d"), f"yahoo-{market}")
+    tickers = _universe(rng, min(int(query.get("count", 25)), 100))
+    if market.startswith("."):
+        tickers = [f"{rng.randint(1010, 8313)}.SR" for _ in tickers]
+    rows = []
+    for ticker in tickers:
+        last = daily_bars(ticker, 1)[0]
+        change = rng.uniform(2, 40)
+        rows.append([ticker, f"{ticker} Corp", f"{last['close']:.2f}",
+                     f"+{last['close'] * change / 100:.2f}", f"+{change:.2f}%", f"{last['volume'] / 1e6:.3f}M"])
+    rows.sort(key=lambda row: -float(row[4][1:-1]))
+    return 200, _html_table(["Symbol", "Name", "Price (Intraday)", "Change", "% Change", "Volume"], rows)
+
+
+class MockProviders:
+    """Routing, fault injection and rate limits shared by all server threads"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.seed = config.get("seed", 1)
+        self._lock = threading.Lock()
+        self._limiters: Dict[Tuple[str, str], RateLimiter] = {}
+        self._occurrences: Counter = Counter()
+        self.stats: Counter = Counter()
+        self._message_id = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+            self._occurrences.clear()
+            self.stats.clear()
+
+    def _rng(self, provider: str, target: str) -> random.Random:
+        # نفس الطلب يأخذ نفس زمن الاستجابة ونفس الخطأ في كل تشغيل
+        with self._lock:
+            self._occurrences[target] += 1
+            occurrence = self._occurrences[target]
+        return random.Random(f"{self.seed}:{provider}:{target}:{occurrence}")
+
+    def _limited(self, provider: str, key: str, limits: Optional[dict]) -> float:
+        if not limits:
+            return 0.0
+        with self._lock:
+            limiter = self._limiters.get((provider, key))
+            if limiter is None:
+                limiter = self._limiters[(provider, key)] = RateLimiter(limits)
+        return limiter.try_acquire()
+
+    def handle(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, str], object, float]:
+        """
+        Answer one request
+
+        Returns:
+            tuple: (status, extra headers, JSON payload or HTML text, seconds to delay the response)
+        """
+        parts = urlsplit(target)
+        path, query = parts.path, dict(parse_qsl(parts.query))
+        bot = _BOT_PATH.match(path)
+        tiingo_match = _TIINGO_PATH.match(path)
+        yahoo_match = _YAHOO_PATH.match(path)
+        if path == "/query":
+            provider, key = "alpha_vantage", query.get("apikey", "")
+        elif path.startswith("/api/v1/"):
+            provider, key = "finnhub", query.get("token", "")
+        elif path.startswith("/api/v3/"):
+            provider, key = "fmp", query.get("apikey", "")
+        elif tiingo_match:
+            provider, key = "tiingo", query.get("token", "")
+        elif path == "/time_series":
+            provider, key = "twelve_data", query.get("apikey", "")
+        elif bot:
+            provider, key = "telegram", bot.group(1)
+        elif yahoo_match:
+            provider, key = "yahoo", "-"
+        else:
+            return 404, {}, {"error": "unknown endpoint"}, 0.0
+
+        settings = self.config["providers"].get(provider, {})
+        rng = self._rng(provider, target)
+        delay = sample_latency(settings.get("latency_ms", {}), rng)
+        status, headers, payload = self._respond(
+            provider, key, settings, rng, method, path, query, body, bot, tiingo_match or yahoo_match
+        )
+        with self._lock:
+            self.stats[f"{provider} {status}"] += 1
+        return status, headers, payload, delay
+
+    def _respond(self, provider, key, settings, rng, method, path, query, body, bot, match):
+        wait = self._limited(provider, key, settings.get("rate_limit"))
+        if wait == 0.0 and provider == "telegram":
+            try:
+                chat_id = str(json.loads(body or b"{}").get("chat_id", ""))
+            except ValueError:
+                chat_id = ""
+            wait = self._limited("telegram-chat", f"{key}:{chat_id}", settings.get("chat_rate_limit"))
+        if wait > 0:
+            retry_after = max(1, math.ceil(wait))
+            if provider == "alpha_vantage":
+                return 200, {}, {"Information": AV_RATE_LIMIT_MESSAGE}
+            if provider == "telegram":
+                return 429, {"Retry-After": str(retry_after)}, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                }
+            return 429, {"Retry-After": str(retry_after)}, {"error": "API limit reached. Please try again later."}
+
+        if rng.random() < settings.get("error_rate", 0.0):
+            status = rng.choice(ERROR_STATUSES)
+            if provider == "telegram":
+                return status, {}, {"ok": False, "error_code": status, "description": "Internal Server Error"}
+            return status, {}, {"error": "Internal Server Error"}
+
+        if provider == "alpha_vantage":
+            return 200, {}, alpha_vantage(query)
+        if provider == "finnhub":
+            status, payload = finnhub(path[len("/api/v1/"):], query)
+            return status, {}, payload
+        if provider == "fmp":
+            status, payload = fmp(path)
+            return status, {}, payload
+        if provider == "tiingo":
+            return 200, {}, tiingo(match.group(1), query)
+        if provider == "twelve_data":
+            return 200, {}, twelve_data(query)
+        if provider == "yahoo":
+            status, payload = yahoo(match, query)
+            return status, {}, payload
+
+        # Telegram
+        if method != "POST" or bot.group(2) != "sendMessage":
+            return 404, {}, {"ok": False, "error_code": 404, "description": "Not Found"}
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+        return 200, {}, {"ok": True, "result": {"message_id": message_id, "date": int(time.time())}}
+
+
+def make_handler(providers: MockProviders):
+    class Handler(BaseHTTPRequestHandler):
+        # اتصالات دائمة كما في المزودين الحقيقيين، فمجمع اتصالات http_client يعمل كالمعتاد
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None) -> None:
+            if isinstance(payload, str):
+                data, content_type = payload.encode("utf-8"), "text/html; charset=utf-8"
+            else:
+                data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _serve(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if self.path == "/__stats":
+                with providers._lock:
+                    self._send(200, dict(providers.stats))
+                return
+            if self.path == "/__reset":
+                providers.reset()
+                self._send(200, {"ok": True})
+                return
+            status, headers, payload, delay = providers.handle(method, self.path, body)
+            if delay > 0:
+                time.sleep(delay)
+            self._send(status, payload, headers)
+
+        def do_GET(self):
+            self._serve("GET")
+
+        def do_POST(self):
+            self._serve("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(config: Optional[dict] = None, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Run the mock server on a background thread
+
+    Args:
+        config: Partial config merged over DEFAULT_CONFIG
+        port: 0 picks a free port
+
+    Returns:
+        tuple: (server, base URL); call server.shutdown() to stop it
+    """
+    providers = MockProviders(merge_config(DEFAULT_CONFIG, config or {}))
+    server = ThreadingHTTPServer((host, port), make_handler(providers))
+    server.daemon_threads = True
+    server.providers = providers
+    threading.Thread(target=server.serve_forever, name="mock-providers", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="خادم محلي يحاكي واجهات مزودي البيانات")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--config", help="ملف JSON يعدّل الإعدادات الافتراضية")
+    parser.add_argument("--seed", type=int, help="بذرة الأرقام العشوائية")
+    args = parser.parse_args(argv)
+
+    config = json.loads(Path(args.config).read_text(encoding="utf-8")) if args.config else {}
+    if args.seed is not None:
+        config["seed"] = args.seed
+    server, url = start(config, args.host, args.port)
+    print(f"Mock providers listening on {url}")
+    print(f"  PROVIDER_BASE_URL={url} streamlit run USApp.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+# metrics.py
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# حدود مدرج زمن الاستجابة بالثواني
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# نتائج طبقات الذاكرة المؤقتة: hit بلا طلب للمزود، refresh طلب للتحقق أو لإكمال بيانات مخزنة، miss جلب كامل
+CACHE_RESULTS = ("hit", "refresh", "miss")
+
+_lock = threading.Lock()
+_registry: List["Metric"] = []
+_collectors: List[Callable[[], None]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names (Prometheus data model)"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def series(self) -> List[Tuple[Dict[str, str], object]]:
+        """(labels, value) of every label combination seen so far"""
+        with _lock:
+            return [(self._labels(key), value) for key, value in self._values.items()]
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for labels, value in self.series():
+            yield self.name, labels, value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with _lock:
+            self._values[self._key(labels)] = float(value)
+
+    def clear(self) -> None:
+        with _lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def series(self):
+        with _lock:
+            return [
+                (self._labels(key), {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]})
+                for key, state in self._values.items()
+            ]
+
+    def samples(self):
+        for labels, state in self.series():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, state["sum"]
+            yield f"{self.name}_count", labels, state["count"]
+
+    def quantile(self, q: float, state: dict) -> Optional[float]:
+        """
+        Estimate a quantile from the bucket counts of one series
+
+        Interpolates linearly inside the bucket, like PromQL's histogram_quantile.
+        """
+        if not state["count"]:
+            return None
+        rank = q * state["count"]
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, state["counts"]):
+            if cumulative + count >= rank and count:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound if bound != float("inf") else lower
+        return lower
+
+
+# --- المقاييس ---
+REQUEST_SECONDS = Histogram(
+    "provider_request_duration_seconds", "Latency of outbound provider requests", ["provider", "status"]
+)
+REQUESTS = Counter("provider_requests_total", "Outbound provider requests by HTTP status (or 'error')", ["provider", "status"])
+RESPONSE_BYTES = Counter("provider_response_bytes_total", "Response body bytes received from providers", ["provider"])
+QUOTA_USED = Counter(
+    "provider_quota_used_total", "Requests billed to provider quotas, including automatic retries", ["provider"]
+)
+RATE_LIMIT_WAIT = Counter(
+    "provider_rate_limit_wait_seconds_total", "Time spent waiting for the client-side rate limiter", ["provider"]
+)
+QUOTA_REMAINING = Gauge(
+    "provider_quota_remaining", "Requests left in each rate-limit window of a provider/API key", ["provider", "key", "window"]
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by layer and result (hit, refresh, miss)", ["cache", "result"])
+
+
+def register_collector(collect: Callable[[], None]) -> None:
+    """Register a function that refreshes gauges right before they are read"""
+    with _lock:
+        _collectors.append(collect)
+
+
+def collect() -> None:
+    with _lock:
+        collectors = list(_collectors)
+    for refresh in collectors:
+        try:
+            refresh()
+        except Exception:
+            logger.exception("metrics collector failed")
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    collect()
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- التسجيل من الوحدات الأخرى ---
+def observe_request(provider: str, status, seconds: float, size: int = 0, attempts: int = 1) -> None:
+    """
+    Record one outbound request
+
+    Args:
+        provider: Provider name (or host for unnamed calls)
+        status: HTTP status code, or "error" when no response was received
+        seconds: Time until the response (including automatic retries)
+        size: Response body bytes
+        attempts: Requests actually sent, retries included (quota consumption)
+    """
+    status = str(status)
+    REQUEST_SECONDS.observe(seconds, provider=provider, status=status)
+    REQUESTS.inc(provider=provider, status=status)
+    if size:
+        RESPONSE_BYTES.inc(size, provider=provider)
+    QUOTA_USED.inc(attempts, provider=provider)
+
+
+@contextmanager
+def track(provider: str, requests: int = 1):
+    """
+    Time a provider call made by an SDK that bypasses http_client (e.g. yfinance)
+
+    Records status "ok", or "error" when the block raises.
+    """
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        observe_request(provider, status, time.perf_counter() - started, attempts=requests)
+
+
+def cache_event(cache: str, result: str) -> None:
+    """Count one lookup in a cache layer; result is one of CACHE_RESULTS"""
+    CACHE_REQUESTS.inc(cache=cache, result=result)
+
+
+_local = threading.local()
+
+
+def cache_data(name: str, **cache_kwargs):
+    """
+    st.cache_data that also counts hits and misses under cache_requests_total
+
+    A call is a miss when the wrapped function actually runs.
+
+    Args:
+        name: Cache name in the metrics
+        **cache_kwargs: Passed to st.cache_data (ttl, max_entries, ...)
+    """
+    import streamlit as st
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            _local.missed = True
+            return fn(*args, **kwargs)
+
+        cached = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # الدوال المخزنة قد تستدعي بعضها، فنحفظ حالة الاستدعاء الخارجي
+            outer = getattr(_local, "missed", False)
+            _local.missed = False
+            try:
+                result = cached(*args, **kwargs)
+                cache_event(name, "miss" if _local.missed else "hit")
+                return result
+            finally:
+                _local.missed = outer
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+# --- ملخصات لصفحة المراقبة ---
+def provider_summary() -> List[dict]:
+    """Per provider: requests, errors, latency quantiles, bytes and quota used"""
+    collect()
+    rows: Dict[str, dict] = {}
+
+    def row(provider: str) -> dict:
+        return rows.setdefault(provider, {
+            "provider": provider, "requests": 0, "errors": 0, "bytes": 0, "quota_used": 0,
+            "p50_s": None, "p95_s": None, "p99_s": None,
+        })
+
+    for labels, value in REQUESTS.series():
+        entry = row(labels["provider"])
+        entry["requests"] += int(value)
+        status = labels["status"]
+        if status == "error" or (status.isdigit() and int(status) >= 400):
+            entry["errors"] += int(value)
+    for labels, value in RESPONSE_BYTES.series():
+        row(labels["provider"])["bytes"] += int(value)
+    for labels, value in QUOTA_USED.series():
+        row(labels["provider"])["quota_used"] += int(value)
+
+    # نجمع مدرجات الحالات المختلفة لكل مزود قبل تقدير النسب
+    merged: Dict[str, dict] = {}
+    for labels, state in REQUEST_SECONDS.series():
+        total = merged.setdefault(labels["provider"], {"counts": [0] * len(REQUEST_SECONDS.buckets), "sum": 0.0, "count": 0})
+        total["counts"] = [a + b for a, b in zip(total["counts"], state["counts"])]
+        total["sum"] += state["sum"]
+        total["count"] += state["count"]
+    for provider, state in merged.items():
+        entry = row(provider)
+        for q, column in ((0.5, "p50_s"), (0.95, "p95_s"), (0.99, "p99_s")):
+            entry[column] = REQUEST_SECONDS.quantile(q, state)
+    return sorted(rows.values(), key=lambda entry: entry["provider"])
+
+
+def cache_summary() -> List[dict]:
+    """Per cache layer: hit, refresh and miss counts and the hit ratio"""
+    rows: Dict[str, dict] = {}
+    for labels, value in CACHE_REQUESTS.series():
+        entry = rows.setdefault(labels["cache"], {"cache": labels["cache"], **{result: 0 for result in CACHE_RESULTS}})
+        entry[labels["result"]] = entry.get(labels["result"], 0) + int(value)
+    for entry in rows.values():
+        total = sum(entry[result] for result in CACHE_RESULTS)
+        entry["hit_ratio"] = entry["hit"] / total if total else None
+    return sorted(rows.values(), key=lambda entry: entry["cache"])
+
+
+def quota_summary() -> List[dict]:
+    """Remaining requests per provider/API key and rate-limit window"""
+    collect()
+    return sorted(
+        ({**labels, "remaining": value} for labels, value in QUOTA_REMAINING.series()),
+        key=lambda entry: (entry["provider"], entry["key"], entry["window"])
+    )
+
+
+# --- نقطة Prometheus ---
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[int]:
+    """
+    Serve /metrics in the Prometheus text format on a background thread
+
+    Safe to call on every Streamlit rerun: the server is started once per
+    process. Without a port argument, METRICS_PORT decides (unset: no server);
+    METRICS_HOST defaults to 127.0.0.1.
+
+    Returns:
+        int: The port being served, or None if there is no server
+    """
+    global _server
+    if port is None:
+        port = int(os.getenv("METRICS_PORT") or 0) or None
+    with _server_lock:
+        if _server is not None:
+            return _server.server_port
+        if port is None:
+            return None
+        try:
+            server = ThreadingHTTPServer((host or os.getenv("METRICS_HOST", "127.0.0.1"), port), _Handler)
+        except OSError as e:
+            # منفذ مستخدم، مثلاً من عملية أخرى للتطبيق
+            logger.warning("metrics server not started on port %s: %s", port, e)
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        _server = server
+        return server.server_port
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import yfinance as yf
 from datetime import datetime, timedelta
 import time
-import numpy as np
+from charts import panel_figure
+from price_store import get_yahoo_history
+from batch_quotes import download_histories, summarize_changes
 
 # تهيئة التطبيق
 st.set_page_config(page_title="أداة الأسهم الصاعدة - معدل", layout="wide")
@@ -13,21 +13,20 @@ st.title('📈 أداة الأسهم الأكثر ارتفاعًا (معدلة)'
 # إعدادات التطبيق
 st.sidebar.header("إعدادات التطبيق")
 MAX_RETRIES = 3  # عدد المحاولات عند الفشل
-DELAY = 2  # تأخير بين الطلبات (بالثواني)
 
 # --- وظائف محسنة مع معالجة الأخطاء ---
 def safe_yfinance_request(symbol, period="1mo", retries=MAX_RETRIES):
     """دالة محسنة لجلب البيانات مع إدارة معدل الطلبات"""
     for attempt in range(retries):
         try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period=period)
-            time.sleep(DELAY)  # تأخير بين الطلبات
+            # معدل الطلبات يُدار عبر rate_limiter بدلاً من تأخير ثابت
+            hist = get_yahoo_history(symbol, period)
             return hist[['Open', 'High', 'Low', 'Close', 'Volume']] if not hist.empty else pd.DataFrame()
         except Exception as e:
             if attempt == retries - 1:
                 st.error(f"فشل جلب بيانات {symbol} بعد {retries} محاولات. الخطأ: {str(e)}")
-            time.sleep(DELAY * 2)  # زيادة التأخير مع كل محاولة فاشلة
+            else:
+                time.sleep(2 ** attempt)  # تأخير تصاعدي بعد المحاولات الفاشلة فقط
     return pd.DataFrame()
 
 def get_top_gainers_safe(market="NASDAQ", max_stocks=10):
@@ -38,19 +37,9 @@ def get_top_gainers_safe(market="NASDAQ", max_stocks=10):
         else:
             tickers = ["AAPL", "MSFT", "AMZN", "GOOG", "META", "TSLA", "NVDA", "PYPL", "ADBE", "NFLX"]
         
-        results = []
-        for symbol in tickers[:max_stocks]:
-            data = safe_yfinance_request(symbol)
-            if not data.empty:
-                results.append({
-                    'Symbol': symbol,
-                    'Last Close': data['Close'].iloc[-1],
-                    '% Change': ((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100,
-                    'Volume': data['Volume'].iloc[-1]
-                })
-            time.sleep(DELAY)
-        
-        return pd.DataFrame(results).sort_values('% Change', ascending=False)
+        # تنزيل جميع الرموز في طلبات مجمعة بدلاً من طلب لكل سهم
+        frames = download_histories(tickers[:max_stocks])
+        return summarize_changes(frames)
     except Exception as e:
         st.error(f"خطأ في جلب القائمة: {str(e)}")
         return pd.DataFrame()
@@ -112,13 +101,11 @@ with tab2:
                         st.metric("المتوسط المتحرك (20 يوم)", f"{data['SMA_20'].iloc[-1]:.2f}")
                     
                     # الرسوم البيانية
-                    fig1 = px.line(data, x=data.index, y=['Close', 'SMA_20'], 
-                                 title=f"أداء السهم {symbol}")
-                    st.plotly_chart(fig1, use_container_width=True)
-                    
-                    fig2 = px.bar(data, x=data.index, y='Volume',
-                                title=f"حجم التداول لـ {symbol}")
-                    st.plotly_chart(fig2, use_container_width=True)
+                    fig = panel_figure(data, [
+                        {"columns": ['Close', 'SMA_20'], "title": "السعر"},
+                        {"columns": ['Volume'], "title": "حجم التداول", "kind": "bar"},
+                    ], title=f"أداء السهم {symbol}")
+                    st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.error("فشل في جلب بيانات السهم. تأكد من الرمز وحاول لاحقاً.")
 
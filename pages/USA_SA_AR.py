@@ -1,38 +1,23 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import yfinance as yf
 from datetime import datetime, timedelta
 import numpy as np
+from charts import panel_figure
+from indicators import mfi, obv
+from panel import STRONG, WARNING, WEAK
+from price_store import get_yahoo_history
+from snapshot_producers import gainers_strength_name, refresh_gainers_strength
+from snapshot_store import read_snapshot, snapshot_age
 
 # تهيئة صفحة Streamlit
 st.set_page_config(page_title="أداة تحليل الأسهم الصاعدة - Yahoo Finance", layout="wide")
 st.title('📈 أداة تحليل الأسهم الأكثر ارتفاعًا (Yahoo Finance)')
 
 # --- وظائف تحليل البيانات ---
-def get_top_gainers_market(market):
-    """جلب الأسهم الأكثر ارتفاعًا من Yahoo Finance حسب السوق"""
-    try:
-        if market == "NASDAQ":
-            url = "https://finance.yahoo.com/gainers?offset=0&count=100"
-        elif market == "NYSE":
-            url = "https://finance.yahoo.com/gainers?e=nyse&offset=0&count=100"
-        elif market == "Tadawul":  # للسوق السعودي
-            url = "https://finance.yahoo.com/quote/.TASI/components/"
-        
-        tables = pd.read_html(url)
-        gainers_df = tables[0].copy()
-        gainers_df['Market'] = market
-        return gainers_df[['Symbol', 'Name', 'Price (Intraday)', '% Change', 'Volume', 'Market']]
-    except Exception as e:
-        st.error(f"خطأ في جلب البيانات: {str(e)}")
-        return pd.DataFrame()
-
 def get_stock_data(symbol, period="1mo"):
     """جلب بيانات السهم من Yahoo Finance"""
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period)
+        hist = get_yahoo_history(symbol, period)
         if hist.empty:
             return pd.DataFrame()
         
@@ -44,43 +29,6 @@ def get_stock_data(symbol, period="1mo"):
         st.error(f"خطأ في جلب بيانات السهم: {str(e)}")
         return pd.DataFrame()
 
-def calculate_obv(df):
-    """حساب مؤشر OBV يدويًا"""
-    obv = [0]
-    for i in range(1, len(df)):
-        if df['Close'].iloc[i] > df['Close'].iloc[i-1]:
-            obv.append(obv[-1] + df['Volume'].iloc[i])
-        elif df['Close'].iloc[i] < df['Close'].iloc[i-1]:
-            obv.append(obv[-1] - df['Volume'].iloc[i])
-        else:
-            obv.append(obv[-1])
-    return obv
-
-def calculate_mfi(df, window=14):
-    """حساب مؤشر MFI يدويًا"""
-    tp = (df['High'] + df['Low'] + df['Close']) / 3
-    mf = tp * df['Volume']
-    
-    pos_mf = []
-    neg_mf = []
-    
-    for i in range(1, len(tp)):
-        if tp.iloc[i] > tp.iloc[i-1]:
-            pos_mf.append(mf.iloc[i-1])
-            neg_mf.append(0)
-        elif tp.iloc[i] < tp.iloc[i-1]:
-            neg_mf.append(mf.iloc[i-1])
-            pos_mf.append(0)
-        else:
-            pos_mf.append(0)
-            neg_mf.append(0)
-    
-    pos_mf = pd.Series(pos_mf).rolling(window).sum()
-    neg_mf = pd.Series(neg_mf).rolling(window).sum()
-    
-    mfi = 100 - (100 / (1 + (pos_mf / neg_mf)))
-    return mfi
-
 # --- واجهة التطبيق الرئيسية ---
 tab1, tab2 = st.tabs(["الأسهم الأكثر ارتفاعًا", "تحليل سهم معين"])
 
@@ -89,79 +37,57 @@ with tab1:
     
     market = st.selectbox("اختر السوق:", ["NASDAQ", "NYSE", "Tadawul"])
     
+    # النتائج تُقرأ من آخر لقطة محفوظة (ينتجها scheduler.py)، والزر يحسبها مباشرة ويحدّث اللقطة
+    signals = None
     if st.button("جلب أحدث البيانات"):
         with st.spinner(f"جاري تحليل الأسهم الأكثر ارتفاعًا في {market}..."):
-            gainers_df = get_top_gainers_market(market)
+            try:
+                signals = refresh_gainers_strength(market)
+            except Exception as e:
+                st.error(f"خطأ في جلب البيانات: {str(e)}")
+                signals = pd.DataFrame()
+    else:
+        snapshot = read_snapshot(gainers_strength_name(market))
+        if snapshot is not None:
+            signals, info = snapshot
+            st.caption(f"📸 آخر لقطة محفوظة: {snapshot_age(info)}")
+
+    if signals is not None:
+        if not signals.empty:
+            emojis = {STRONG: "✅", WARNING: "⚠️", WEAK: "❌"}
+            results_df = pd.DataFrame({
+                'السهم': signals['Symbol'],
+                'الاسم': signals['Name'],
+                'السوق': market,
+                'السعر': signals['Close'].map("{:.2f}".format),
+                'التغير %': signals['% Change'].astype(str),
+                'الحجم': signals['Volume'].map("{:,.0f}".format),
+                'OBV': np.where(signals['OBV_Rising'], "صاعد", "هابط"),
+                'MFI': signals['MFI'].map("{:.1f}".format),
+                'القوة': signals['Strength'],
+                'الرمز': signals['Strength'].map(emojis)
+            })
             
-            if not gainers_df.empty:
-                # تحليل أول 10 أسهم فقط للأداء
-                results = []
-                for _, row in gainers_df.head(10).iterrows():
-                    symbol = row['Symbol']
-                    stock_data = get_stock_data(symbol)
-                    
-                    if not stock_data.empty and len(stock_data) > 20:
-                        # حساب المؤشرات
-                        stock_data['OBV'] = calculate_obv(stock_data)
-                        stock_data['MFI'] = calculate_mfi(stock_data)
-                        stock_data['Daily_Return'] = stock_data['Close'].pct_change() * 100
-                        stock_data['Avg_Volume'] = stock_data['Volume'].rolling(20).mean()
-                        
-                        # تقييم آخر يومين
-                        last_day = stock_data.iloc[-1]
-                        prev_day = stock_data.iloc[-2]
-                        
-                        # المعايير
-                        is_rising = last_day['Close'] > prev_day['Close']
-                        high_volume = last_day['Volume'] > last_day['Avg_Volume']
-                        obv_rising = last_day['OBV'] > prev_day['OBV']
-                        mfi_ok = 50 < last_day['MFI'] < 80
-                        
-                        # تقييم القوة
-                        if is_rising and high_volume and obv_rising and mfi_ok:
-                            strength = "قوي"
-                            strength_emoji = "✅"
-                        elif is_rising and high_volume and not obv_rising:
-                            strength = "تحذير: OBV متناقض"
-                            strength_emoji = "⚠️"
-                        else:
-                            strength = "ضعيف"
-                            strength_emoji = "❌"
-                        
-                        results.append({
-                            'السهم': symbol,
-                            'الاسم': row['Name'],
-                            'السوق': market,
-                            'السعر': f"{last_day['Close']:.2f}",
-                            'التغير %': f"{row['% Change']}",
-                            'الحجم': f"{last_day['Volume']:,.0f}",
-                            'OBV': "صاعد" if obv_rising else "هابط",
-                            'MFI': f"{last_day['MFI']:.1f}",
-                            'القوة': strength,
-                            'الرمز': strength_emoji
-                        })
-                
-                # عرض النتائج
-                results_df = pd.DataFrame(results)
-                st.dataframe(
-                    results_df.sort_values('القوة', ascending=False),
-                    column_config={
-                        "الرمز": st.column_config.TextColumn("التقييم")
-                    },
-                    hide_index=True,
-                    use_container_width=True
-                )
-                
-                # عرض أفضل الأسهم
-                st.subheader("أفضل الأسهم ذات المؤشرات القوية")
-                strong_stocks = results_df[results_df['القوة'] == "قوي"]
-                if not strong_stocks.empty:
-                    for _, stock in strong_stocks.iterrows():
-                        st.success(f"{stock['الرمز']} {stock['السهم']} ({stock['الاسم']}): سعر {stock['السعر']} (تغير {stock['التغير %']}) - حجم تداول {stock['الحجم']}")
-                else:
-                    st.warning("لا توجد أسهم ذات مؤشرات قوية اليوم")
+            # عرض النتائج
+            st.dataframe(
+                results_df.sort_values('القوة', ascending=False),
+                column_config={
+                    "الرمز": st.column_config.TextColumn("التقييم")
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+            
+            # عرض أفضل الأسهم
+            st.subheader("أفضل الأسهم ذات المؤشرات القوية")
+            strong_stocks = results_df[results_df['القوة'] == "قوي"]
+            if not strong_stocks.empty:
+                for _, stock in strong_stocks.iterrows():
+                    st.success(f"{stock['الرمز']} {stock['السهم']} ({stock['الاسم']}): سعر {stock['السعر']} (تغير {stock['التغير %']}) - حجم تداول {stock['الحجم']}")
             else:
-                st.error("لا يمكن جلب بيانات الأسهم الأكثر ارتفاعًا")
+                st.warning("لا توجد أسهم ذات مؤشرات قوية اليوم")
+        else:
+            st.error("لا يمكن جلب بيانات الأسهم الأكثر ارتفاعًا")
 
 with tab2:
     st.header("تحليل سهم معين")
@@ -176,8 +102,8 @@ with tab2:
                 
                 if not stock_data.empty:
                     # حساب المؤشرات
-                    stock_data['OBV'] = calculate_obv(stock_data)
-                    stock_data['MFI'] = calculate_mfi(stock_data)
+                    stock_data['OBV'] = obv(stock_data['Close'], stock_data['Volume'])
+                    stock_data['MFI'] = mfi(stock_data['High'], stock_data['Low'], stock_data['Close'], stock_data['Volume'])
                     stock_data['Daily_Return'] = stock_data['Close'].pct_change() * 100
                     stock_data['Avg_Volume'] = stock_data['Volume'].rolling(20).mean()
                     
@@ -230,24 +156,13 @@ with tab2:
                     # الرسوم البيانية
                     st.subheader("الرسوم البيانية")
                     
-                    fig1 = px.line(stock_data, x=stock_data.index, y='Close', 
-                                 title=f"تحليل سعر سهم {symbol}")
-                    st.plotly_chart(fig1, use_container_width=True)
-                    
-                    fig2 = px.line(stock_data, x=stock_data.index, y=['Volume', 'Avg_Volume'], 
-                                 title=f"حجم التداول لسهم {symbol}",
-                                 labels={'value': 'الحجم', 'variable': ''})
-                    st.plotly_chart(fig2, use_container_width=True)
-                    
-                    fig3 = px.line(stock_data, x=stock_data.index, y='OBV', 
-                                 title=f"مؤشر OBV لسهم {symbol}")
-                    st.plotly_chart(fig3, use_container_width=True)
-                    
-                    fig4 = px.line(stock_data, x=stock_data.index, y='MFI', 
-                                 title=f"مؤشر MFI لسهم {symbol}")
-                    fig4.add_hline(y=50, line_dash="dash", line_color="gray")
-                    fig4.add_hline(y=80, line_dash="dash", line_color="red")
-                    st.plotly_chart(fig4, use_container_width=True)
+                    fig = panel_figure(stock_data, [
+                        {"columns": ['Close'], "title": "السعر"},
+                        {"columns": ['Volume', 'Avg_Volume'], "title": "حجم التداول"},
+                        {"columns": ['OBV'], "title": "مؤشر OBV"},
+                        {"columns": ['MFI'], "title": "مؤشر MFI", "hlines": [(50, "gray"), (80, "red")]},
+                    ], title=f"تحليل سهم {symbol}")
+                    st.plotly_chart(fig, use_container_width=True)
                     
                 else:
                     st.error("فشل في جلب بيانات السهم. الرجاء التحقق من رمز السهم")
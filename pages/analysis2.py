@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import requests
 from datetime import datetime
 from telegram_sender import TelegramSender
+from report_builder import build_report
+from fundamentals import fetch_roe_for_symbols
+import fundamentals_cache
+import quota
+from screening import run_screen
 
 # قائمة أسهم افتراضية (أشهر أسهم للسوق الأمريكي مثلاً)
 DEFAULT_SYMBOLS = [
@@ -11,34 +14,6 @@ DEFAULT_SYMBOLS = [
     "V", "PG", "NVDA", "DIS", "MA", "HD", "BAC", "XOM", "PFE", "KO", "INTC"
 ]
 
-def fetch_roe_for_symbols(symbols, api_key):
-    data_list = []
-    for symbol in symbols:
-        try:
-            url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={api_key}"
-            response = requests.get(url)
-            if response.status_code == 200:
-                json_data = response.json()
-                roe_str = json_data.get("ReturnOnEquityTTM")
-                if roe_str is None or roe_str == "":
-                    roe = 0.0
-                else:
-                    roe = float(roe_str)
-                data_list.append({
-                    "Symbol": symbol,
-                    "Company": json_data.get("Name", "Unknown"),
-                    "ROE": roe * 100,
-                    "Sector": json_data.get("Sector", "Unknown"),
-                    "MarketCap": json_data.get("MarketCapitalization", "Unknown")
-                })
-            else:
-                st.warning(f"تعذر جلب بيانات {symbol}")
-        except Exception as e:
-            st.warning(f"خطأ في جلب بيانات {symbol}: {e}")
-
-    return pd.DataFrame(data_list)
-
-
 def main():
     st.title("📊 تحليل الشركات حسب عائد حقوق المساهمين (ROE)")
 
@@ -59,6 +34,10 @@ def main():
         "الخدمات المالية", "السلع الاستهلاكية"
     ])
 
+    if st.sidebar.button("🔄 تحديث البيانات المالية"):
+        removed = fundamentals_cache.invalidate(provider="alpha_vantage", endpoint="OVERVIEW")
+        st.sidebar.success(f"تم حذف {removed} سجل من الذاكرة المؤقتة")
+
     uploaded_file = st.file_uploader("📂 حمل ملف CSV يحتوي على قائمة رموز الأسهم (اختياري)", type=["csv"])
 
     symbols = []
@@ -77,14 +56,32 @@ def main():
         st.info("⬆️ لم يتم رفع ملف. سيتم استخدام قائمة أسهم افتراضية.")
         symbols = DEFAULT_SYMBOLS
 
+    # الرموز غير المخزنة فقط تستهلك طلبات من الحصة اليومية
+    uncached = fundamentals_cache.missing("alpha_vantage", "OVERVIEW", symbols)
+    budget = quota.status("alpha_vantage", api_key, quota.BULK)
+    if budget is not None:
+        st.caption(f"📉 {quota.describe(budget)}. هذا البحث يحتاج {len(uncached)} طلب (الباقي من الذاكرة المؤقتة).")
+
     if st.button("🔎 بحث عن الشركات"):
+        skipped = []
+        if budget is not None and len(uncached) > budget["available"]:
+            skipped = uncached[budget["available"]:]
+            symbols = [s for s in symbols if s not in set(skipped)]
+            st.warning(
+                f"⚠️ الحصة المتاحة لا تكفي لجميع الرموز؛ تم تخطي {len(skipped)} رمز: {', '.join(skipped)}. "
+                f"أعد المحاولة بعد {quota.format_duration(budget['resets_in'])}."
+            )
+
         with st.spinner("جاري جلب وتحليل البيانات..."):
-            df = fetch_roe_for_symbols(symbols, api_key)
+            df, errors = fetch_roe_for_symbols(symbols, api_key)
+            for error in errors.values():
+                st.warning(error)
 
             # تصفية البيانات حسب القطاع والـ ROE
+            screen = {"where": [{"column": "ROE", "op": ">=", "value": min_roe}]}
             if sector != "الكل":
-                df = df[df["Sector"] == sector]
-            df = df[df["ROE"] >= min_roe]
+                screen["where"].append({"column": "Sector", "op": "in", "value": [sector]})
+            df = run_screen(df, screen)
 
             st.session_state["search_results"] = df
 
@@ -97,6 +94,7 @@ def main():
             st.dataframe(df)
 
             st.subheader("📈 توزيع ROE حسب القطاع")
+            import plotly.express as px
             fig = px.bar(
                 df,
                 x="Company",
@@ -110,26 +108,31 @@ def main():
 
             if st.button("📩 إرسال نتائج ROE إلى التليجرام"):
                 try:
-                    message = f"📊 <b>نتائج تحليل ROE</b>\n\n"
-                    message += f"<b>معايير البحث:</b>\n"
-                    message += f"- أدنى ROE: {min_roe}%\n"
-                    message += f"- القطاع: {sector}\n\n"
-                    message += f"<b>الشركات التي تطابق المعايير ({len(df)}):</b>\n\n"
-
-                    for _, row in df.iterrows():
-                        message += f"🏢 <b>{row['Company']}</b> ({row['Symbol']})\n"
-                        message += f"📊 ROE: {row['ROE']:.2f}%\n"
-                        message += f"🏛 القطاع: {row['Sector']}\n"
-                        message += f"💰 القيمة السوقية: {row['MarketCap']}\n"
-                        message += "────────────────────\n"
-
-                    message += f"\n🔄 آخر تحديث: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                    header = (
+                        f"📊 <b>نتائج تحليل ROE</b>\n\n"
+                        f"<b>معايير البحث:</b>\n"
+                        f"- أدنى ROE: {min_roe}%\n"
+                        f"- القطاع: {sector}\n\n"
+                        f"<b>الشركات التي تطابق المعايير ({len(df)}):</b>\n\n"
+                    )
+                    # كل شركة كتلة واحدة، والكتل تُجمع في أقل عدد من الرسائل ضمن حد Telegram
+                    messages = build_report(
+                        df,
+                        "🏢 <b>{Company}</b> ({Symbol})\n"
+                        "📊 ROE: {ROE:.2f}%\n"
+                        "🏛 القطاع: {Sector}\n"
+                        "💰 القيمة السوقية: {MarketCap:,.0f}\n"
+                        "────────────────────\n",
+                        header=header,
+                        footer=f"\n🔄 آخر تحديث: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                        na_rep="Unknown"
+                    )
 
                     sender = TelegramSender()
-                    success = sender.send_message(message)
+                    success = sender.enqueue(messages)
 
                     if success:
-                        st.success("✅ تم إرسال النتائج إلى تليجرام بنجاح!")
+                        st.success(f"✅ تمت إضافة النتائج ({len(messages)} رسالة) إلى قائمة الإرسال إلى تليجرام!")
                     else:
                         st.error("❌ فشل في إرسال الرسالة. يرجى التحقق من إعدادات Telegram.")
                 except Exception as e:
@@ -1,69 +1,56 @@
 import streamlit as st
-import pandas as pd
+from telegram_queue import batch_status
 from telegram_sender import TelegramSender
+from report_builder import build_report
+from upload_ingest import ingest_companies, preview
 
 st.set_page_config(page_title="📤 تحليل ملف شركات", layout="wide")
 st.title("📤 رفع ملف CSV وتحليل الشركات")
 
 # رفع الملف
-uploaded_file = st.file_uploader("📎 اختر ملف CSV يحتوي على بيانات الشركات", type="csv")
+uploaded_file = st.file_uploader(
+    "📎 اختر ملف CSV يحتوي على بيانات الشركات (أو Parquet / Arrow)",
+    type=["csv", "parquet", "arrow", "feather"]
+)
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
-
-    st.subheader("📄 معاينة أول 5 أسطر")
-    st.dataframe(df.head())
-
-    # معالجة وتحويل الأعمدة المهمة
-    for col in ["marketCap", "price", "lastAnnualDividend"]:
-        df[col] = pd.to_numeric(df.get(col, 0), errors="coerce")
-
-    # تصفية الشركات الجيدة
-    filtered = df[
-        (df["marketCap"] > 1_000_000_000) &
-        (df["price"] > 5) &
-        (df["lastAnnualDividend"] > 0) &
-        (df["isEtf"] == False) &
-        (df["isFund"] == False) &
-        (df["isActivelyTrading"] == True)
-    ]
-
-    st.success(f"✅ تم العثور على {len(filtered)} شركة جيدة.")
+    # قراءة الأعمدة المطلوبة فقط على دفعات وتصفية الشركات الجيدة في كل دفعة
+    try:
+        st.subheader("📄 معاينة أول 5 أسطر")
+        st.dataframe(preview(uploaded_file, uploaded_file.name))
+        filtered, scanned = ingest_companies(uploaded_file, uploaded_file.name)
+    except Exception as e:
+        st.error(f"خطأ في قراءة الملف: {str(e)}")
+        st.stop()
+
+    st.success(f"✅ تم العثور على {len(filtered)} شركة جيدة من أصل {scanned:,} سطر.")
     st.dataframe(filtered[["symbol", "companyName", "price", "marketCap", "lastAnnualDividend"]])
 
-    # تقسيم الشركات إلى رسائل متعددة (كل 10 شركات في رسالة)
-    messages = []
-    companies_per_message = 10
-
-    filtered = filtered.reset_index(drop=True)
-    total = len(filtered)
-
-    for i in range(0, total, companies_per_message):
-        chunk = filtered.iloc[i:i + companies_per_message]
-        message = f"📊 الشركات الجيدة حسب التحليل ({i+1} - {min(i+companies_per_message, total)}):\n\n"
-
-        for _, row in chunk.iterrows():
-            symbol = row['symbol']
-            name = row['companyName']
-            price = row['price']
-            dividend = row['lastAnnualDividend']
-
-            message += f"🔹 {symbol} - {name}\n"
-            message += f"     💲 السعر: {price:,.2f}\n"
-            message += f"     💰 التوزيع: {dividend:,.2f}\n\n"
-
-        message += "📡 تم الإرسال من النظام."
-        messages.append(message)
-
-    # إرسال إلى تيليجرام
+    # كل شركة كتلة واحدة، والكتل تُجمع في أقل عدد من الرسائل ضمن حد Telegram (4096 حرفاً)
+    messages = build_report(
+        filtered,
+        "🔹 {symbol} - {companyName}\n"
+        "     💲 السعر: {price:,.2f}\n"
+        "     💰 التوزيع: {lastAnnualDividend:,.2f}\n\n",
+        header=f"📊 الشركات الجيدة حسب التحليل ({len(filtered)}):\n\n",
+        footer="📡 تم الإرسال من النظام."
+    )
+
+    # إرسال إلى تيليجرام في الخلفية: الصفحة تضيف الرسائل إلى صندوق الإرسال وتعود فوراً
     if st.button("📨 إرسال النتائج إلى Telegram"):
-        sender = TelegramSender()
-        success_count = 0
-        for msg in messages:
-            result = sender.send_message(msg)
-            if result and isinstance(result, dict) and result.get("ok"):
-                success_count += 1
-        if success_count == len(messages):
-            st.success(f"✅ تم إرسال جميع الرسائل ({success_count}) بنجاح!")
-        else:
-            st.warning(f"⚠️ تم إرسال {success_count} من {len(messages)} رسالة.")
+        batch_id = TelegramSender().enqueue(messages)
+        if batch_id:
+            st.session_state["telegram_batch"] = batch_id
+
+    batch_id = st.session_state.get("telegram_batch")
+    if batch_id:
+        status = batch_status(batch_id)
+        total = status["total"] or 1
+        st.progress(status["sent"] / total, text=f"📨 تم إرسال {status['sent']} من {status['total']} رسالة")
+        if status["failed"]:
+            st.warning(f"⚠️ فشل إرسال {status['failed']} رسالة: {status['last_error']}")
+        if status["pending"] or status["sending"]:
+            st.info("⏳ جاري الإرسال في الخلفية مع احترام حدود Telegram...")
+            st.button("🔄 تحديث حالة الإرسال")
+        elif status["sent"] == status["total"]:
+            st.success(f"✅ تم إرسال جميع الرسائل ({status['sent']}) بنجاح!")
@@ -1,8 +1,9 @@
 import streamlit as st
-import pandas as pd
-import requests
 from datetime import datetime
 from telegram_sender import TelegramSender
+from report_builder import pack, render_groups
+from fundamentals import fetch_finnhub_cash_flow
+import fundamentals_cache
 
 st.set_page_config(page_title="تحليل التدفق النقدي الحر - Finnhub", layout="wide")
 
@@ -17,48 +18,25 @@ api_key = st.secrets["finnhub"]["api_key"]
 st.title("💰 تحليل الشركات حسب التدفق النقدي الحر (FCF) - باستخدام Finnhub")
 symbols_input = st.text_input("🔍 أدخل رموز الأسهم (مثل: AAPL, MSFT, TSLA)", value="AAPL")
 
+if st.sidebar.button("🔄 تحديث البيانات المالية"):
+    removed = fundamentals_cache.invalidate(provider="finnhub", endpoint="stock/financials")
+    st.sidebar.success(f"تم حذف {removed} سجل من الذاكرة المؤقتة")
+
 # عند الضغط على زر تحليل
 if st.button("📊 تحليل FCF"):
     symbols = [sym.strip().upper() for sym in symbols_input.split(",") if sym.strip()]
-    results = []
-
     with st.spinner("⏳ جاري تحليل التدفقات النقدية..."):
-        for symbol in symbols:
-            url = f"https://finnhub.io/api/v1/stock/financials?symbol={symbol}&statement=cf&freq=annual&token={api_key}"
-            response = requests.get(url)
-            if response.status_code != 200:
-                st.warning(f"⚠️ لم يتم جلب بيانات {symbol}")
-                continue
-
-            data = response.json()
-            if "data" not in data or not data["data"]:
-                st.warning(f"⚠️ لا توجد بيانات مالية لـ {symbol}")
-                continue
-
-            # نحسب FCF = Operating Cash Flow - Capital Expenditure
-            rows = []
-            for report in data["data"]:
-                try:
-                    op = float(report.get("cashFromOperations", 0))
-                    capex = float(report.get("capitalExpenditures", 0))
-                    fcf = op - capex
-                    rows.append({
-                        "fiscalDate": report["year"],
-                        "OperatingCashFlow": op,
-                        "CapitalExpenditures": capex,
-                        "FreeCashFlow": fcf
-                    })
-                except:
-                    continue
-
-            if rows:
-                df = pd.DataFrame(rows)
-                results.append((symbol, df))
+        fcf_df, errors = fetch_finnhub_cash_flow(symbols, api_key)
+        for error in errors.values():
+            st.warning(error)
+    results = [
+        (symbol, df.drop(columns="symbol").reset_index(drop=True))
+        for symbol, df in fcf_df.groupby("symbol", sort=False)
+    ]
 
     if not results:
         st.warning("❌ لا توجد بيانات FCF متاحة.")
     else:
-        message = "💰 <b>تحليل التدفق النقدي الحر (FCF)</b>\n\n"
         for symbol, df in results:
             st.subheader(f"📈 {symbol} - التحليل")
             st.markdown(f"[🔗 تفاصيل السهم على Finnhub](https://finnhub.io/stock/{symbol})", unsafe_allow_html=True)
@@ -66,21 +44,26 @@ if st.button("📊 تحليل FCF"):
             st.dataframe(df)
             st.line_chart(df.set_index("fiscalDate")["FreeCashFlow"])
 
-            message += f"📊 <b>{symbol}</b>\n"
-            for _, row in df.iterrows():
-                fcf_m = round(row['FreeCashFlow'] / 1e6, 2)
-                message += f"- {row['fiscalDate']}: ${fcf_m}M\n"
-            message += f"🔗 https://finnhub.io/stock/{symbol}\n"
-            message += "───────────────\n"
-
-        message += f"\n⏰ التوقيت: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        # كتلة لكل سهم، والكتل تُجمع في أقل عدد من الرسائل ضمن حد Telegram
+        blocks = render_groups(
+            fcf_df.assign(fcf_m=(fcf_df["FreeCashFlow"] / 1e6).round(2)),
+            "symbol",
+            "- {fiscalDate}: ${fcf_m}M\n",
+            group_header="📊 <b>{symbol}</b>\n",
+            group_footer="🔗 https://finnhub.io/stock/{symbol}\n───────────────\n"
+        )
+        messages = pack(
+            blocks,
+            header="💰 <b>تحليل التدفق النقدي الحر (FCF)</b>\n\n",
+            footer=f"\n⏰ التوقيت: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        )
 
         if st.button("📩 إرسال النتائج إلى تليجرام"):
             try:
                 sender = TelegramSender()
-                success = sender.send_message(message)
+                success = sender.enqueue(messages)
                 if success:
-                    st.success("✅ تم إرسال النتائج إلى تليجرام بنجاح!")
+                    st.success(f"✅ تمت إضافة النتائج ({len(messages)} رسالة) إلى قائمة الإرسال إلى تليجرام!")
                 else:
                     st.error("❌ فشل في إرسال الرسالة.")
             except Exception as e:
@@ -1,25 +1,18 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import yfinance as yf
-from datetime import datetime, timedelta
-import time
-import numpy as np
+from importlib.util import find_spec
+from batch_quotes import download_histories, summarize_changes
+from charts import panel_figure
+from price_providers import SOURCE_PROVIDERS, get_price_history, provider_order
 
-# استيراد Twelve Data مع معالجة الخطأ
-try:
-    import twelvedata as td
-    TWELVE_DATA_AVAILABLE = True
-except ImportError:
-    TWELVE_DATA_AVAILABLE = False
+# فحص توفر Twelve Data دون استيرادها (تُحمّل عند الاستخدام فقط)
+TWELVE_DATA_AVAILABLE = find_spec("twelvedata") is not None
+if not TWELVE_DATA_AVAILABLE:
     st.warning("ملاحظة: مكتبة TwelveData غير مثبتة. سيتم تعطيل خيار TwelveData.")
 
-# استيراد Alpha Vantage مع معالجة الخطأ
-try:
-    from alpha_vantage.timeseries import TimeSeries
-    ALPHA_VANTAGE_AVAILABLE = True
-except ImportError:
-    ALPHA_VANTAGE_AVAILABLE = False
+# فحص توفر Alpha Vantage دون استيرادها
+ALPHA_VANTAGE_AVAILABLE = find_spec("alpha_vantage") is not None
+if not ALPHA_VANTAGE_AVAILABLE:
     st.warning("ملاحظة: مكتبة AlphaVantage غير مثبتة. سيتم تعطيل خيار AlphaVantage.")
 
 # إعداد واجهة المستخدم
@@ -42,52 +35,23 @@ data_source = st.sidebar.selectbox(
 )
 
 # إدارة مفاتيح API
+api_keys = {}
 if data_source == "Alpha Vantage" and ALPHA_VANTAGE_AVAILABLE:
-    av_key = st.sidebar.text_input("أدخل مفتاح Alpha Vantage API:", type="password")
+    api_keys["alpha_vantage"] = st.sidebar.text_input("أدخل مفتاح Alpha Vantage API:", type="password")
 elif data_source == "Twelve Data" and TWELVE_DATA_AVAILABLE:
-    td_key = st.sidebar.text_input("أدخل مفتاح Twelve Data API:", type="password")
+    api_keys["twelve_data"] = st.sidebar.text_input("أدخل مفتاح Twelve Data API:", type="password")
 
 # --- وظائف جلب البيانات ---
-def get_stock_data(symbol, period="1mo"):
-    """دالة موحدة لجلب البيانات من المصدر المحدد"""
-    try:
-        if data_source == "Yahoo Finance":
-            return get_yfinance_data(symbol, period)
-        elif data_source == "Alpha Vantage":
-            return get_alphavantage_data(symbol, period) if ALPHA_VANTAGE_AVAILABLE else pd.DataFrame()
-        elif data_source == "Twelve Data":
-            return get_twelvedata_data(symbol, period) if TWELVE_DATA_AVAILABLE else pd.DataFrame()
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"خطأ في جلب البيانات: {str(e)}")
-        return pd.DataFrame()
+def get_stock_data(symbol, period="1mo", hedge=False):
+    """جلب البيانات عبر الموجّه: المصدر المحدد أولاً ثم المصادر الاحتياطية تلقائيًا"""
+    primary = SOURCE_PROVIDERS[data_source]
+    data, used = get_price_history(symbol, period, provider_order(primary, api_keys), api_keys, hedge=hedge)
+    if data.empty:
+        st.error(f"تعذر جلب بيانات {symbol} من جميع المصادر المتاحة")
+    elif used != primary:
+        st.info(f"تم جلب بيانات {symbol} من مصدر احتياطي: {used}")
+    return data
 
-def get_twelvedata_data(symbol, period):
-    """جلب البيانات من Twelve Data"""
-    if not TWELVE_DATA_AVAILABLE or not td_key:
-        st.error("Twelve Data غير متاح. الرجاء تثبيت المكتبة وإدخال المفتاح")
-        return pd.DataFrame()
-    
-    try:
-        client = td.Client(apikey=td_key)
-        timeframe = "1day" if "mo" in period else "1hour"
-        
-        data = client.time_series(
-            symbol=symbol,
-            interval=timeframe,
-            outputsize=100,
-            timezone="UTC"
-        ).as_pandas()
-        
-        if not data.empty:
-            data.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-            return data.last(period)
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"خطأ في Twelve Data: {str(e)}")
-        return pd.DataFrame()
-
-# باقي الكود (وظائف get_yfinance_data و get_alphavantage_data وواجهة المستخدم) ...
 # --- واجهة التطبيق ---
 tab1, tab2 = st.tabs(["الأسهم الصاعدة", "تحليل مفصل"])
 
@@ -104,18 +68,27 @@ with tab1:
                 symbols = ["2222.SR", "1180.SR", "7010.SR", "1211.SR", "2380.SR"]
             
             results = []
-            for symbol in symbols:
-                data = get_stock_data(symbol)
-                if not data.empty and len(data) > 1:
-                    change_pct = ((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100
-                    results.append({
-                        'السهم': symbol,
-                        'السعر': data['Close'].iloc[-1],
-                        'التغير %': change_pct,
-                        'الحجم': data['Volume'].iloc[-1],
-                        'المصدر': data_source
-                    })
-                time.sleep(DELAY)
+            if data_source == "Yahoo Finance":
+                # تنزيل جميع الرموز في طلب مجمع واحد
+                summary = summarize_changes(download_histories(symbols))
+                results = summary.rename(columns={
+                    'Symbol': 'السهم',
+                    'Last Close': 'السعر',
+                    '% Change': 'التغير %',
+                    'Volume': 'الحجم'
+                }).assign(المصدر=data_source).to_dict('records')
+            else:
+                for symbol in symbols:
+                    data = get_stock_data(symbol)
+                    if not data.empty and len(data) > 1:
+                        change_pct = ((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100
+                        results.append({
+                            'السهم': symbol,
+                            'السعر': data['Close'].iloc[-1],
+                            'التغير %': change_pct,
+                            'الحجم': data['Volume'].iloc[-1],
+                            'المصدر': data_source
+                        })
             
             if results:
                 df = pd.DataFrame(results).sort_values('التغير %', ascending=False)
@@ -137,7 +110,7 @@ with tab2:
             st.warning("الرجاء إدخال رمز السهم")
         else:
             with st.spinner("جاري التحليل..."):
-                data = get_stock_data(symbol, "3mo")
+                data = get_stock_data(symbol, "3mo", hedge=True)
                 
                 if not data.empty:
                     # تحليل البيانات
@@ -152,13 +125,11 @@ with tab2:
                     col2.metric("المتوسط المتحرك", f"{data['SMA_20'].iloc[-1]:.2f}")
                     
                     # الرسوم البيانية
-                    fig1 = px.line(data, x=data.index, y=['Close', 'SMA_20'], 
-                                 title=f"أداء السهم {symbol} (مصدر: {data_source})")
-                    st.plotly_chart(fig1, use_container_width=True)
-                    
-                    fig2 = px.bar(data, x=data.index, y='Volume',
-                                 title=f"حجم التداول لـ {symbol}")
-                    st.plotly_chart(fig2, use_container_width=True)
+                    fig = panel_figure(data, [
+                        {"columns": ['Close', 'SMA_20'], "title": "السعر"},
+                        {"columns": ['Volume'], "title": "حجم التداول", "kind": "bar"},
+                    ], title=f"أداء السهم {symbol} (مصدر: {data_source})")
+                    st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.error("فشل في جلب البيانات. حاول:")
                     st.markdown("""
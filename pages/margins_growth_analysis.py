@@ -1,8 +1,9 @@
 import streamlit as st
-import pandas as pd
-import requests
 from datetime import datetime
 from telegram_sender import TelegramSender
+from report_builder import build_report
+from fundamentals import fetch_margins_for_symbols
+import fundamentals_cache
 
 st.set_page_config(page_title="تحليل الهوامش والنمو - Finnhub", layout="wide")
 
@@ -17,66 +18,44 @@ api_key = st.secrets["finnhub"]["api_key"]
 st.title("📊 تحليل الهوامش والنمو")
 symbols_input = st.text_input("🔍 أدخل رموز الأسهم (مثل: AAPL, MSFT, TSLA)", value="AAPL")
 
+if st.sidebar.button("🔄 تحديث البيانات المالية"):
+    removed = fundamentals_cache.invalidate(provider="finnhub", endpoint="stock/metric")
+    st.sidebar.success(f"تم حذف {removed} سجل من الذاكرة المؤقتة")
+
 if st.button("📊 تحليل البيانات"):
     symbols = [sym.strip().upper() for sym in symbols_input.split(",") if sym.strip()]
-    results = []
-
     with st.spinner("جاري تحليل الهوامش والنمو..."):
-        for symbol in symbols:
-            url = f"https://finnhub.io/api/v1/stock/metric?symbol={symbol}&metric=all&token={api_key}"
-            response = requests.get(url)
-
-            if response.status_code != 200:
-                st.warning(f"⚠️ لم يتم جلب البيانات لـ {symbol}")
-                continue
-
-            data = response.json()
-            metrics = data.get("metric", {})
-
-            if not metrics:
-                st.warning(f"⚠️ لا توجد بيانات متاحة لـ {symbol}")
-                continue
-
-            try:
-                op_margin = float(metrics.get("operatingMargin", metrics.get("operatingMarginTTM", "nan"))) * 100
-                net_margin = float(metrics.get("netProfitMargin", metrics.get("netProfitMarginTTM", "nan"))) * 100
-                revenue_growth = float(metrics.get("revenueGrowth", metrics.get("revenueGrowthTTM", "nan"))) * 100
-
-
-                results.append({
-                    "Symbol": symbol,
-                    "Operating Margin (%)": round(op_margin, 2),
-                    "Net Profit Margin (%)": round(net_margin, 2),
-                    "Revenue Growth (%)": round(revenue_growth, 2),
-                    "Finnhub Link": f"https://finnhub.io/stock/{symbol}"
-                })
-            except:
-                st.warning(f"⚠️ تعذر تحليل البيانات لـ {symbol}")
+        df, errors = fetch_margins_for_symbols(symbols, api_key)
+        for error in errors.values():
+            st.warning(error)
+    results = df.to_dict("records")
 
     if not results:
         st.error("❌ لم يتم العثور على بيانات.")
     else:
-        df = pd.DataFrame(results)
         st.subheader("📋 النتائج")
         st.dataframe(df)
 
         # 📩 إرسال إلى تليجرام
         if st.button("📩 إرسال التقرير إلى تليجرام"):
             try:
-                message = "📊 <b>تقرير الهوامش والنمو</b>\n\n"
-                for row in results:
-                    message += f"📈 <b>{row['Symbol']}</b>\n"
-                    message += f"🔹 Operating Margin: {row['Operating Margin (%)']}%\n"
-                    message += f"🔹 Net Profit Margin: {row['Net Profit Margin (%)']}%\n"
-                    message += f"🔹 Revenue Growth: {row['Revenue Growth (%)']}%\n"
-                    message += f"🔗 {row['Finnhub Link']}\n"
-                    message += "───────────────\n"
-                message += f"\n⏰ التوقيت: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                messages = build_report(
+                    df,
+                    "📈 <b>{Symbol}</b>\n"
+                    "🔹 Operating Margin: {Operating Margin (%)}%\n"
+                    "🔹 Net Profit Margin: {Net Profit Margin (%)}%\n"
+                    "🔹 Revenue Growth: {Revenue Growth (%)}%\n"
+                    "🔗 {Finnhub Link}\n"
+                    "───────────────\n",
+                    header="📊 <b>تقرير الهوامش والنمو</b>\n\n",
+                    footer=f"\n⏰ التوقيت: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    na_rep="None"
+                )
 
                 sender = TelegramSender()
-                success = sender.send_message(message)
+                success = sender.enqueue(messages)
                 if success:
-                    st.success("✅ تم إرسال التقرير إلى تليجرام بنجاح!")
+                    st.success(f"✅ تمت إضافة التقرير ({len(messages)} رسالة) إلى قائمة الإرسال إلى تليجرام!")
                 else:
                     st.error("❌ فشل في إرسال التقرير.")
             except Exception as e:
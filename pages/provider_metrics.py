@@ -0,0 +1,86 @@
+import streamlit as st
+import pandas as pd
+import metrics
+
+st.set_page_config(page_title="مراقبة المزودين", layout="wide")
+st.title("📡 مراقبة المزودين والذاكرة المؤقتة")
+st.caption("المقاييس خاصة بعملية الخادم الحالية وتبدأ من الصفر عند إعادة تشغيله")
+
+port = metrics.start_server()
+if port:
+    st.info(f"نقطة Prometheus: http://<الخادم>:{port}/metrics")
+else:
+    st.caption("لتفعيل نقطة Prometheus اضبط المتغير METRICS_PORT قبل تشغيل التطبيق")
+
+if st.button("🔄 تحديث"):
+    st.rerun()
+
+# --- المزودون ---
+st.header("🌐 طلبات المزودين")
+providers = pd.DataFrame(metrics.provider_summary())
+if providers.empty:
+    st.info("لم تُرسل أي طلبات بعد في هذه العملية.")
+else:
+    providers["error_rate"] = providers["errors"] / providers["requests"] * 100
+    providers["kb"] = providers["bytes"] / 1024
+    st.dataframe(
+        providers[["provider", "requests", "errors", "error_rate", "p50_s", "p95_s", "p99_s", "kb", "quota_used"]].rename(columns={
+            "provider": "المزود",
+            "requests": "الطلبات",
+            "errors": "الأخطاء",
+            "error_rate": "نسبة الأخطاء %",
+            "p50_s": "p50 (ث)",
+            "p95_s": "p95 (ث)",
+            "p99_s": "p99 (ث)",
+            "kb": "البيانات (KB)",
+            "quota_used": "الحصة المستهلكة"
+        }).style.format({
+            "نسبة الأخطاء %": "{:.1f}",
+            "p50 (ث)": "{:.3f}",
+            "p95 (ث)": "{:.3f}",
+            "p99 (ث)": "{:.3f}",
+            "البيانات (KB)": "{:,.1f}"
+        }, na_rep="-"),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption("النسب المئوية للزمن تقديرية من فئات المدرج التكراري، والحصة المستهلكة تشمل إعادة المحاولة التلقائية")
+
+# --- الحصص المتبقية ---
+st.header("⏳ الحصص المتبقية (حدود التطبيق)")
+quotas = pd.DataFrame(metrics.quota_summary())
+if quotas.empty:
+    st.info("لا توجد حدود طلبات مستخدمة بعد.")
+else:
+    st.dataframe(
+        quotas.rename(columns={"provider": "المزود", "key": "المفتاح", "window": "النافذة", "remaining": "المتبقي"})
+        .style.format({"المتبقي": "{:.0f}"}),
+        hide_index=True,
+        use_container_width=True
+    )
+
+# --- الذاكرة المؤقتة ---
+st.header("🗄️ طبقات الذاكرة المؤقتة")
+caches = pd.DataFrame(metrics.cache_summary())
+if caches.empty:
+    st.info("لم تُستخدم الذاكرة المؤقتة بعد في هذه العملية.")
+else:
+    caches["hit_ratio"] = caches["hit_ratio"] * 100
+    st.dataframe(
+        caches.rename(columns={
+            "cache": "الطبقة",
+            "hit": "إصابة",
+            "refresh": "تحديث جزئي",
+            "miss": "إخفاق",
+            "hit_ratio": "نسبة الإصابة %"
+        }).style.format({"نسبة الإصابة %": "{:.1f}"}, na_rep="-"),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption("إصابة: بدون طلب للمزود. تحديث جزئي: طلب للتحقق من البيانات المخزنة أو إكمالها. إخفاق: جلب كامل.")
+
+# --- نص Prometheus ---
+text = metrics.render()
+with st.expander("📄 نص Prometheus"):
+    st.code(text, language="text")
+st.download_button("⬇️ تنزيل المقاييس", text, file_name="metrics.txt", mime="text/plain")
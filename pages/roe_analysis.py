@@ -1,33 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import requests
 from datetime import datetime
 from telegram_sender import TelegramSender
-
-def fetch_roe_for_symbols(symbols, api_key):
-    data_list = []
-    for symbol in symbols:
-        try:
-            url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={api_key}"
-            response = requests.get(url)
-            if response.status_code == 200:
-                json_data = response.json()
-                # تأكد أن ROE موجودة ويمكن تحويله إلى float
-                roe = float(json_data.get("ReturnOnEquityTTM", 0))
-                data_list.append({
-                    "Symbol": symbol,
-                    "Company": json_data.get("Name", "Unknown"),
-                    "ROE": roe * 100,  # تحويل من نسبة عشرية إلى %
-                    "Sector": json_data.get("Sector", "Unknown"),
-                    "MarketCap": json_data.get("MarketCapitalization", "Unknown")
-                })
-            else:
-                st.warning(f"تعذر جلب بيانات {symbol}")
-        except Exception as e:
-            st.warning(f"خطأ في جلب بيانات {symbol}: {e}")
-
-    return pd.DataFrame(data_list)
+from report_builder import build_report
+import fundamentals_cache
+from screening import run_screen
+from snapshot_producers import ROE_OVERVIEW, refresh_roe_overview
+from snapshot_store import read_snapshot, snapshot_age
 
 def main():
     st.title("📊 تحليل الشركات حسب عائد حقوق المساهمين (ROE)")
@@ -49,17 +27,38 @@ def main():
         "الخدمات المالية", "السلع الاستهلاكية"
     ])
 
+    if st.sidebar.button("🔄 تحديث البيانات المالية"):
+        removed = fundamentals_cache.invalidate(provider="alpha_vantage", endpoint="OVERVIEW")
+        st.sidebar.success(f"تم حذف {removed} سجل من الذاكرة المؤقتة")
+
     # قائمة الأسهم التي تريد تحليلها (يمكنك تعديلها)
     symbols = ["AAPL", "MSFT", "JNJ", "XOM", "JPM"]
 
-    if st.button("🔎 بحث عن الشركات"):
+    search = st.button("🔎 بحث عن الشركات")
+    refresh = st.button("🔄 تحديث الآن")
+    if search or refresh:
         with st.spinner("جاري جلب وتحليل البيانات..."):
-            df = fetch_roe_for_symbols(symbols, api_key)
+            # نستخدم آخر لقطة محفوظة إذا كانت تغطي الرموز المطلوبة وما زالت بياناتها المالية مخزنة
+            # (لم تنتهِ صلاحيتها ولم تُحذف بزر التحديث)، وإلا نجلب مباشرة ونحدّث اللقطة
+            snapshot = None if refresh else read_snapshot(ROE_OVERVIEW, max_age=fundamentals_cache.MIN_TTL.total_seconds())
+            if (
+                snapshot is not None
+                and set(symbols) <= set(snapshot[1]["meta"].get("symbols", []))
+                and not fundamentals_cache.missing("alpha_vantage", "OVERVIEW", symbols)
+            ):
+                df, info = snapshot
+                df = df[df["Symbol"].isin(symbols)]
+                st.caption(f"📸 آخر لقطة محفوظة: {snapshot_age(info)}")
+            else:
+                df, errors = refresh_roe_overview(symbols, api_key)
+                for error in errors.values():
+                    st.warning(error)
 
             # تصفية البيانات
+            screen = {"where": [{"column": "ROE", "op": ">=", "value": min_roe}]}
             if sector != "الكل":
-                df = df[df["Sector"] == sector]
-            df = df[df["ROE"] >= min_roe]
+                screen["where"].append({"column": "Sector", "op": "in", "value": [sector]})
+            df = run_screen(df, screen)
 
             st.session_state["search_results"] = df
 
@@ -73,6 +72,7 @@ def main():
             st.dataframe(df)
 
             st.subheader("📈 توزيع ROE حسب القطاع")
+            import plotly.express as px
             fig = px.bar(
                 df,
                 x="Company",
@@ -86,26 +86,31 @@ def main():
 
             if st.button("📩 إرسال نتائج ROE إلى التليجرام"):
                 try:
-                    message = f"📊 <b>نتائج تحليل ROE</b>\n\n"
-                    message += f"<b>معايير البحث:</b>\n"
-                    message += f"- أدنى ROE: {min_roe}%\n"
-                    message += f"- القطاع: {sector}\n\n"
-                    message += f"<b>الشركات التي تطابق المعايير ({len(df)}):</b>\n\n"
-
-                    for _, row in df.iterrows():
-                        message += f"🏢 <b>{row['Company']}</b> ({row['Symbol']})\n"
-                        message += f"📊 ROE: {row['ROE']:.2f}%\n"
-                        message += f"🏛 القطاع: {row['Sector']}\n"
-                        message += f"💰 القيمة السوقية: {row['MarketCap']}\n"
-                        message += "────────────────────\n"
-
-                    message += f"\n🔄 آخر تحديث: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                    header = (
+                        f"📊 <b>نتائج تحليل ROE</b>\n\n"
+                        f"<b>معايير البحث:</b>\n"
+                        f"- أدنى ROE: {min_roe}%\n"
+                        f"- القطاع: {sector}\n\n"
+                        f"<b>الشركات التي تطابق المعايير ({len(df)}):</b>\n\n"
+                    )
+                    # كل شركة كتلة واحدة، والكتل تُجمع في أقل عدد من الرسائل ضمن حد Telegram
+                    messages = build_report(
+                        df,
+                        "🏢 <b>{Company}</b> ({Symbol})\n"
+                        "📊 ROE: {ROE:.2f}%\n"
+                        "🏛 القطاع: {Sector}\n"
+                        "💰 القيمة السوقية: {MarketCap:,.0f}\n"
+                        "────────────────────\n",
+                        header=header,
+                        footer=f"\n🔄 آخر تحديث: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                        na_rep="Unknown"
+                    )
 
                     sender = TelegramSender()
-                    success = sender.send_message(message)
+                    success = sender.enqueue(messages)
 
                     if success:
-                        st.success("✅ تم إرسال النتائج إلى تليجرام بنجاح!")
+                        st.success(f"✅ تمت إضافة النتائج ({len(messages)} رسالة) إلى قائمة الإرسال إلى تليجرام!")
                     else:
                         st.error("❌ فشل في إرسال الرسالة. يرجى التحقق من إعدادات Telegram.")
                 except Exception as e:
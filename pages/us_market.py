@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import requests
 from datetime import datetime
+import http_client
+from snapshot_producers import US_MARKET_GAINERS, refresh_us_market_gainers
+from snapshot_store import read_snapshot, snapshot_age
 
 def main():
     st.title("📊 تحليل سوق الأسهم الأمريكية - مباشر")
@@ -14,36 +15,29 @@ def main():
     
     api_key = st.secrets["alpha_vantage"]["api_key"]
 
-    # ✅ دالة جلب البيانات من Alpha Vantage
-    @st.cache_data(ttl=3600)
-    def fetch_market_data():
+    # ✅ النتائج تُقرأ من آخر لقطة محفوظة (ينتجها scheduler.py)، والجلب المباشر عند الطلب
+    # أو عندما تكون اللقطة أقدم من ساعة
+    gainers_df = None
+    snapshot = read_snapshot(US_MARKET_GAINERS, max_age=3600)
+    if st.button("🔄 تحديث الآن") or snapshot is None:
         try:
-            url = f"https://www.alphavantage.co/query?function=TOP_GAINERS_LOSERS&apikey={api_key}"
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
+            with st.spinner("جاري جلب أحدث البيانات..."):
+                gainers_df = refresh_us_market_gainers(api_key)
         except Exception as e:
             st.error(f"خطأ في جلب البيانات: {str(e)}")
-            return None
+            snapshot = read_snapshot(US_MARKET_GAINERS)
+            if snapshot is None:
+                st.error("❌ تعذر جلب البيانات. تحقق من الاتصال أو API.")
+                st.stop()
 
-    # ✅ جلب البيانات
-    data = fetch_market_data()
-
-    if not data:
-        st.error("❌ تعذر جلب البيانات. تحقق من الاتصال أو API.")
-        st.stop()
+    if gainers_df is None:
+        gainers_df, info = snapshot
+        st.caption(f"📸 آخر لقطة محفوظة: {snapshot_age(info)}")
 
     # ✅ عرض الأسهم الأمريكية الأكثر ارتفاعًا
     st.header("🚀 الأسهم الأمريكية الأكثر ارتفاعاً اليوم")
-    gainers = data.get("top_gainers", [])
-    if gainers:
+    if not gainers_df.empty:
         try:
-            gainers_df = pd.DataFrame(gainers)
-            gainers_df["change_percentage"] = gainers_df["change_percentage"].str.replace('%', '').astype(float)
-            gainers_df["price"] = gainers_df["price"].astype(float)
-
             # ✅ عرض جدول الأسهم
             st.dataframe(
                 gainers_df[["ticker", "price", "change_amount", "change_percentage", "volume"]].rename(columns={
@@ -56,6 +50,7 @@ def main():
             )
 
             # ✅ رسم بياني لأعلى 5 أسهم صعودًا
+            import plotly.graph_objects as go
             fig = go.Figure(go.Bar(
                 x=gainers_df["ticker"].head(5),
                 y=gainers_df["change_percentage"].head(5),
@@ -75,20 +70,21 @@ def main():
 
     # ✅ التحليل الفني لسهم أمريكي مختار
     st.header("📈 التحليل الفني للسهم")
-    if "top_gainers" in data:
-        stocks = [item["ticker"] for item in data["top_gainers"][:5]]
+    if not gainers_df.empty:
+        stocks = gainers_df["ticker"].head(5).tolist()
         selected = st.selectbox("اختر السهم:", stocks)
 
         if st.button("عرض الرسم البياني التاريخي"):
             try:
-                url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={selected}&apikey={api_key}&outputsize=compact"
-                res = requests.get(url).json()
+                url = f"{http_client.base_url('alpha_vantage')}/query?function=TIME_SERIES_DAILY&symbol={selected}&apikey={api_key}&outputsize=compact"
+                res = http_client.get(url, provider="alpha_vantage", api_key=api_key).json()
 
                 if "Time Series (Daily)" in res:
                     df = pd.DataFrame(res["Time Series (Daily)"]).T
                     df.index = pd.to_datetime(df.index)
                     df = df.astype(float)
 
+                    import plotly.graph_objects as go
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(x=df.index, y=df["4. close"], mode='lines', name="سعر الإغلاق"))
                     fig.update_layout(
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 from datetime import datetime
-import requests
 import os
+import http_client
+import metrics
+import quota
 
 def main():
     st.title("📊 لوحة تحليل السوق الأمريكي - بيانات حقيقية")
@@ -15,25 +16,28 @@ def main():
     
     api_key = st.secrets["alpha_vantage"]["api_key"]
     
-    @st.cache_data(ttl=3600)
+    # جلب بيانات الأسهم والمؤشرات الحقيقية
+    query_url = f"{http_client.base_url('alpha_vantage')}/query"
+    endpoints = {
+        "market_status": f"{query_url}?function=MARKET_STATUS&apikey={api_key}",
+        "gainers_losers": f"{query_url}?function=TOP_GAINERS_LOSERS&apikey={api_key}",
+        "sp500": f"{query_url}?function=GLOBAL_QUOTE&symbol=^GSPC&apikey={api_key}",
+        "dow_jones": f"{query_url}?function=GLOBAL_QUOTE&symbol=^DJI&apikey={api_key}",
+        "nasdaq": f"{query_url}?function=GLOBAL_QUOTE&symbol=^IXIC&apikey={api_key}"
+    }
+
+    @metrics.cache_data("fetch_real_time_data", ttl=3600)
     def fetch_real_time_data():
+        # لا نبدأ الجلب إلا إذا كفت الحصة جميع الطلبات؛ الاستثناء لا يُخزن في الذاكرة المؤقتة
+        quota.require("alpha_vantage", api_key, len(endpoints))
         try:
-            # جلب بيانات الأسهم والمؤشرات الحقيقية
-            endpoints = {
-                "market_status": f"https://www.alphavantage.co/query?function=MARKET_STATUS&apikey={api_key}",
-                "gainers_losers": f"https://www.alphavantage.co/query?function=TOP_GAINERS_LOSERS&apikey={api_key}",
-                "sp500": f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=^GSPC&apikey={api_key}",
-                "dow_jones": f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=^DJI&apikey={api_key}",
-                "nasdaq": f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol=^IXIC&apikey={api_key}"
-            }
-            
             responses = {}
             for name, url in endpoints.items():
-                response = requests.get(url)
-                if response.status_code == 200:
-                    responses[name] = response.json()
-                else:
-                    st.warning(f"فشل جلب بيانات {name.replace('_', ' ')}")
+                # الطلبات المتطابقة الجارية من جلسات أخرى تُدمج في طلب واحد
+                try:
+                    responses[name] = http_client.get_json(url, provider="alpha_vantage", api_key=api_key)
+                except Exception as e:
+                    st.warning(f"فشل جلب بيانات {name.replace('_', ' ')}: {e}")
             
             return responses
         
@@ -41,7 +45,15 @@ def main():
             st.error(f"خطأ في جلب البيانات: {str(e)}")
             return None
     
-    data = fetch_real_time_data()
+    try:
+        data = fetch_real_time_data()
+    except quota.QuotaExceeded as e:
+        st.warning(f"⏳ {e}")
+        st.stop()
+
+    budget = quota.status("alpha_vantage", api_key)
+    if budget is not None:
+        st.caption(f"📉 {quota.describe(budget)}. تحديث هذه الصفحة يستهلك {len(endpoints)} طلبات كل ساعة.")
     
     if not data:
         st.error("❌ تعذر جلب البيانات من السوق. يرجى التحقق من اتصال الإنترنت أو مفتاح API")
@@ -116,6 +128,7 @@ def main():
                 }))
             
             # رسم بياني
+            import plotly.graph_objects as go
             fig = go.Figure(go.Bar(
                 x=gainers_df["ticker"],
                 y=gainers_df["change_percentage"],
@@ -137,8 +150,8 @@ def main():
         
         if st.button("عرض البيانات التاريخية"):
             try:
-                hist_url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={selected_stock}&apikey={api_key}&outputsize=compact"
-                hist_data = requests.get(hist_url).json()
+                hist_url = f"{http_client.base_url('alpha_vantage')}/query?function=TIME_SERIES_DAILY&symbol={selected_stock}&apikey={api_key}&outputsize=compact"
+                hist_data = http_client.get(hist_url, provider="alpha_vantage", api_key=api_key).json()
                 
                 if "Time Series (Daily)" in hist_data:
                     df = pd.DataFrame(hist_data["Time Series (Daily)"]).T
@@ -146,6 +159,7 @@ def main():
                     df = df.astype(float)
                     
                     # Create a Plotly figure for better visualization
+                    import plotly.graph_objects as go
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(
                         x=df.index,
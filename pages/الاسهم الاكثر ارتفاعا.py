@@ -4,6 +4,8 @@ import os
 import requests
 import pandas as pd
 from datetime import datetime
+import http_client
+from rate_limiter import RateLimitExceeded
 
 # تحميل متغيرات البيئة 
 load_dotenv()
@@ -73,10 +75,13 @@ config = Config()
 def fetch_stock_data(api_key, symbol="AAPL"):
     """جلب بيانات الأسهم من API"""
     try:
-        url = f"https://financialmodelingprep.com/api/v3/quote/{symbol}?apikey={api_key}"
-        response = requests.get(url)
+        url = f"{http_client.base_url('fmp')}/api/v3/quote/{symbol}?apikey={api_key}"
+        response = http_client.get(url, provider="fmp", api_key=api_key)
         response.raise_for_status()
         return response.json()
+    except RateLimitExceeded as e:
+        st.warning(f"⏳ {e}")
+        return None
     except requests.exceptions.RequestException as e:
         st.error(f"خطأ في جلب البيانات: {e}")
         return None
@@ -1,12 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import yfinance as yf
-from datetime import datetime, timedelta
-import time
-import numpy as np
-import requests
-from io import StringIO
+from importlib.util import find_spec
+from batch_quotes import download_histories, summarize_changes
+from charts import panel_figure
+from price_providers import SOURCE_PROVIDERS, get_price_history, provider_order
 
 # --- إعدادات التطبيق ---
 st.set_page_config(page_title="أداة الأسهم متعددة المصادر", layout="wide")
@@ -24,14 +21,12 @@ class DataSources:
             "Alpha Vantage": {
                 "name": "Alpha Vantage",
                 "requires_key": True,
-                "available": False,
-                "module": None
+                "available": False
             },
             "Twelve Data": {
                 "name": "Twelve Data",
                 "requires_key": True,
-                "available": False,
-                "module": None
+                "available": False
             },
             "Tiingo": {
                 "name": "Tiingo",
@@ -44,21 +39,9 @@ class DataSources:
     
     def _check_available_sources(self):
         """فحص المصادر المتاحة"""
-        # Alpha Vantage
-        try:
-            from alpha_vantage.timeseries import TimeSeries
-            self.sources["Alpha Vantage"]["available"] = True
-            self.sources["Alpha Vantage"]["module"] = TimeSeries
-        except ImportError:
-            pass
-        
-        # Twelve Data
-        try:
-            import twelvedata as td
-            self.sources["Twelve Data"]["available"] = True
-            self.sources["Twelve Data"]["module"] = td
-        except ImportError:
-            pass
+        # نفحص وجود المكتبات دون استيرادها، فلا تبطئ تحميل الصفحة
+        self.sources["Alpha Vantage"]["available"] = find_spec("alpha_vantage") is not None
+        self.sources["Twelve Data"]["available"] = find_spec("twelvedata") is not None
         
         # Tiingo (لا يحتاج لمكتبة خاصة)
         self.sources["Tiingo"]["available"] = True
@@ -92,97 +75,11 @@ for src in data_sources.get_available_sources():
         )
 
 # --- وظائف جلب البيانات ---
-def get_yfinance_data(symbol, period="1mo"):
-    """جلب البيانات من Yahoo Finance"""
-    try:
-        data = yf.Ticker(symbol).history(period=period)
-        time.sleep(0.5)  # تجنب حظر الطلبات
-        return data[['Open', 'High', 'Low', 'Close', 'Volume']] if not data.empty else pd.DataFrame()
-    except Exception as e:
-        st.error(f"خطأ في Yahoo Finance: {str(e)}")
-        return pd.DataFrame()
-
-def get_alphavantage_data(symbol, period="1mo"):
-    """جلب البيانات من Alpha Vantage"""
-    if not api_keys.get("Alpha Vantage"):
-        st.error("الرجاء إدخال مفتاح Alpha Vantage API")
-        return pd.DataFrame()
-    
-    try:
-        ts = data_sources.sources["Alpha Vantage"]["module"](key=api_keys["Alpha Vantage"], output_format='pandas')
-        data, _ = ts.get_daily(symbol=symbol, outputsize='full')
-        data = data.sort_index()
-        data.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        return data.last(period)
-    except Exception as e:
-        st.error(f"خطأ في Alpha Vantage: {str(e)}")
-        return pd.DataFrame()
-
-def get_twelvedata_data(symbol, period="1mo"):
-    """جلب البيانات من Twelve Data"""
-    if not api_keys.get("Twelve Data"):
-        st.error("الرجاء إدخال مفتاح Twelve Data API")
-        return pd.DataFrame()
-    
-    try:
-        client = data_sources.sources["Twelve Data"]["module"].Client(apikey=api_keys["Twelve Data"])
-        timeframe = "1day" if "mo" in period else "1hour"
-        
-        data = client.time_series(
-            symbol=symbol,
-            interval=timeframe,
-            outputsize=100,
-            timezone="UTC"
-        ).as_pandas()
-        
-        if not data.empty:
-            data.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-            return data.last(period)
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"خطأ في Twelve Data: {str(e)}")
-        return pd.DataFrame()
-
-def get_tiingo_data(symbol, period="1mo"):
-    """جلب البيانات من Tiingo"""
-    if not api_keys.get("Tiingo"):
-        st.error("الرجاء إدخال مفتاح Tiingo API")
-        return pd.DataFrame()
-    
-    try:
-        # حساب تاريخ البداية بناءً على الفترة المطلوبة
-        end_date = datetime.now()
-        if "mo" in period:
-            months = int(period.replace("mo", ""))
-            start_date = end_date - timedelta(days=months*30)
-        else:
-            days = int(period.replace("d", ""))
-            start_date = end_date - timedelta(days=days)
-        
-        url = f"https://api.tiingo.com/tiingo/daily/{symbol}/prices?startDate={start_date.strftime('%Y-%m-%d')}&endDate={end_date.strftime('%Y-%m-%d')}&token={api_keys['Tiingo']}"
-        
-        headers = {
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        data = pd.read_json(StringIO(response.text))
-        if not data.empty:
-            data = data.set_index('date')
-            data.index = pd.to_datetime(data.index)
-            return data[['open', 'high', 'low', 'close', 'volume']].rename(columns={
-                'open': 'Open',
-                'high': 'High',
-                'low': 'Low',
-                'close': 'Close',
-                'volume': 'Volume'
-            })
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"خطأ في Tiingo: {str(e)}")
-        return pd.DataFrame()
+def get_stock_data(symbol, period="1mo", hedge=False):
+    """جلب البيانات عبر الموجّه: المصدر المحدد أولاً ثم باقي المصادر التي أُدخل مفتاحها"""
+    keys = {SOURCE_PROVIDERS[name]: key for name, key in api_keys.items() if key}
+    primary = SOURCE_PROVIDERS[selected_source]
+    return get_price_history(symbol, period, provider_order(primary, keys), keys, hedge=hedge)
 
 # --- الواجهة الرئيسية ---
 tab1, tab2 = st.tabs(["الأسهم الصاعدة", "تحليل مفصل"])
@@ -221,19 +118,14 @@ with tab1:
                 # دمج الرموز الأساسية مع الإضافية
                 symbols = base_symbols + additional_symbols
                 
-                results = []
-                for symbol in symbols:
-                    data = get_yfinance_data(symbol)
-                    if not data.empty and len(data) > 1:
-                        change_pct = ((data['Close'].iloc[-1] - data['Close'].iloc[-2]) / data['Close'].iloc[-2]) * 100
-                        results.append({
-                            'السهم': symbol,
-                            'السعر': data['Close'].iloc[-1],
-                            'التغير %': change_pct,
-                            'الحجم': data['Volume'].iloc[-1],
-                            'المصدر': selected_source
-                        })
-                    time.sleep(0.5)  # تجنب حظر الطلبات
+                # تنزيل جميع الرموز في طلبات مجمعة بدلاً من طلب لكل سهم
+                summary = summarize_changes(download_histories(symbols))
+                results = summary.rename(columns={
+                    'Symbol': 'السهم',
+                    'Last Close': 'السعر',
+                    '% Change': 'التغير %',
+                    'Volume': 'الحجم'
+                }).assign(المصدر=selected_source).to_dict('records')
                 
                 if results:
                     df = pd.DataFrame(results).sort_values('التغير %', ascending=False)
@@ -258,16 +150,10 @@ with tab2:
             st.warning("الرجاء إدخال رمز السهم")
         else:
             with st.spinner("جاري تحليل السهم..."):
-                if selected_source == "Yahoo Finance":
-                    data = get_yfinance_data(symbol, "3mo")
-                elif selected_source == "Alpha Vantage":
-                    data = get_alphavantage_data(symbol, "3mo")
-                elif selected_source == "Twelve Data":
-                    data = get_twelvedata_data(symbol, "3mo")
-                elif selected_source == "Tiingo":
-                    data = get_tiingo_data(symbol, "3mo")
-                else:
-                    data = pd.DataFrame()
+                data, used_provider = get_stock_data(symbol, "3mo", hedge=True)
+                used_source = next((name for name, p in SOURCE_PROVIDERS.items() if p == used_provider), used_provider)
+                if used_provider and used_source != selected_source:
+                    st.info(f"تعذر الجلب من {selected_source}، تم استخدام {used_source} تلقائيًا")
                 
                 if not data.empty:
                     # تحليل البيانات
@@ -282,19 +168,17 @@ with tab2:
                     col2.metric("المتوسط المتحرك", f"{data['SMA_20'].iloc[-1]:.2f}")
                     
                     # الرسوم البيانية
-                    fig1 = px.line(data, x=data.index, y=['Close', 'SMA_20'], 
-                                 title=f"أداء السهم {symbol} (مصدر: {selected_source})")
-                    st.plotly_chart(fig1, use_container_width=True)
-                    
-                    fig2 = px.bar(data, x=data.index, y='Volume',
-                                 title=f"حجم التداول لـ {symbol}")
-                    st.plotly_chart(fig2, use_container_width=True)
+                    fig = panel_figure(data, [
+                        {"columns": ['Close', 'SMA_20'], "title": "السعر"},
+                        {"columns": ['Volume'], "title": "حجم التداول", "kind": "bar"},
+                    ], title=f"أداء السهم {symbol} (مصدر: {used_source})")
+                    st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.error("فشل في جلب البيانات. حاول:")
                     st.markdown("""
                     1. التأكد من صحة رمز السهم
-                    2. التحقق من مفتاح API
-                    3. تجربة مصدر بيانات مختلف
+                    2. التحقق من مفاتيح API
+                    3. إدخال مفاتيح مصادر إضافية لاستخدامها كمصادر احتياطية
                     """)
 
 # --- تذييل الصفحة ---
@@ -1,12 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import yfinance as yf
 from datetime import datetime, timedelta
-import time
-import numpy as np
-import requests
 from io import StringIO
+from charts import panel_figure
+import http_client
+import metrics
+from screening import run_screen
+from rate_limiter import acquire
 
 # --- إعدادات التطبيق ---
 st.set_page_config(page_title="أداة الأسهم متعددة المصادر", layout="wide")
@@ -18,11 +18,11 @@ max_price = st.sidebar.number_input("السعر الأعلى", min_value=1.0, va
 limit_results = st.sidebar.number_input("عدد الأسهم الظاهرة", min_value=1, max_value=100, value=10)
 
 # --- إعداد مصدر بيانات خارجي ---
-@st.cache_data(ttl=300)
+@metrics.cache_data("get_most_active_stocks", ttl=300)
 def get_most_active_stocks():
     try:
-        url = f"https://financialmodelingprep.com/api/v3/stock_market/actives?apikey={st.secrets['FMP_API_KEY']}"
-        response = requests.get(url)
+        url = f"{http_client.base_url('fmp')}/api/v3/stock_market/actives?apikey={st.secrets['FMP_API_KEY']}"
+        response = http_client.get(url, provider="fmp", api_key=st.secrets['FMP_API_KEY'])
         stocks = pd.DataFrame(response.json())
         return stocks
     except Exception as e:
@@ -32,8 +32,10 @@ def get_most_active_stocks():
 def get_yfinance_data(symbol, period="1mo"):
     """جلب البيانات من Yahoo Finance"""
     try:
-        data = yf.Ticker(symbol).history(period=period)
-        time.sleep(0.5)  # تجنب حظر الطلبات
+        acquire("yahoo")
+        import yfinance as yf
+        with metrics.track("yahoo"):
+            data = yf.Ticker(symbol).history(period=period)
         return data[['Open', 'High', 'Low', 'Close', 'Volume']] if not data.empty else pd.DataFrame()
     except Exception as e:
         st.error(f"خطأ في Yahoo Finance: {str(e)}")
@@ -46,6 +48,7 @@ def get_alphavantage_data(symbol, period="1mo"):
         return pd.DataFrame()
     
     try:
+        acquire("alpha_vantage", api_keys["Alpha Vantage"])
         ts = data_sources.sources["Alpha Vantage"]["module"](key=api_keys["Alpha Vantage"], output_format='pandas')
         data, _ = ts.get_daily(symbol=symbol, outputsize='full')
         data = data.sort_index()
@@ -62,6 +65,7 @@ def get_twelvedata_data(symbol, period="1mo"):
         return pd.DataFrame()
     
     try:
+        acquire("twelve_data", api_keys["Twelve Data"])
         client = data_sources.sources["Twelve Data"]["module"].Client(apikey=api_keys["Twelve Data"])
         timeframe = "1day" if "mo" in period else "1hour"
         
@@ -96,13 +100,13 @@ def get_tiingo_data(symbol, period="1mo"):
             days = int(period.replace("d", ""))
             start_date = end_date - timedelta(days=days)
         
-        url = f"https://api.tiingo.com/tiingo/daily/{symbol}/prices?startDate={start_date.strftime('%Y-%m-%d')}&endDate={end_date.strftime('%Y-%m-%d')}&token={api_keys['Tiingo']}"
+        url = f"{http_client.base_url('tiingo')}/tiingo/daily/{symbol}/prices?startDate={start_date.strftime('%Y-%m-%d')}&endDate={end_date.strftime('%Y-%m-%d')}&token={api_keys['Tiingo']}"
         
         headers = {
             'Content-Type': 'application/json'
         }
         
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers, provider="tiingo", api_key=api_keys['Tiingo'])
         response.raise_for_status()
         
         data = pd.read_json(StringIO(response.text))
@@ -126,9 +130,11 @@ if st.button("🔍 تحليل الأسهم"):
     with st.spinner("جاري تحليل السوق..."):
         stocks = get_most_active_stocks()
         if not stocks.empty:
-            stocks = stocks[(stocks['price'] >= min_price) & (stocks['price'] <= max_price)]
-            stocks['التغير %'] = stocks['changesPercentage'].str.replace('%', '').astype(float)
-            stocks = stocks.sort_values('التغير %', ascending=False).head(limit_results)
+            stocks['التغير %'] = stocks['changesPercentage'].astype(str).str.replace('%', '').astype(float)
+            stocks = run_screen(stocks, {
+                "where": [{"column": "price", "op": "between", "value": [min_price, max_price]}],
+                "top": {"column": "التغير %", "k": int(limit_results), "ascending": False},
+            })
 
             df = stocks[['symbol', 'name', 'price', 'التغير %', 'volume']].rename(columns={
                 'symbol': 'الرمز', 'name': 'اسم الشركة', 'price': 'السعر', 'volume': 'الحجم'
@@ -147,7 +153,10 @@ symbol = st.text_input("أدخل رمز السهم (مثال: AAPL):", "AAPL")
 if st.button("تحليل السهم"):
     with st.spinner("جاري تحليل السهم..."):
         try:
-            data = yf.Ticker(symbol).history(period="3mo")
+            acquire("yahoo")
+            import yfinance as yf
+            with metrics.track("yahoo"):
+                data = yf.Ticker(symbol).history(period="3mo")
             data['Daily_Return'] = data['Close'].pct_change() * 100
             data['SMA_20'] = data['Close'].rolling(20).mean()
             last_row = data.iloc[-1]
@@ -158,12 +167,11 @@ if st.button("تحليل السهم"):
             col2.metric("الحجم", f"{last_row['Volume']:,.0f}")
             col2.metric("SMA 20", f"{last_row['SMA_20']:.2f}")
 
-            fig1 = px.line(data, x=data.index, y=['Close', 'SMA_20'],
-                           title=f"أداء السهم {symbol}")
-            st.plotly_chart(fig1, use_container_width=True)
-
-            fig2 = px.bar(data, x=data.index, y='Volume', title="حجم التداول")
-            st.plotly_chart(fig2, use_container_width=True)
+            fig = panel_figure(data, [
+                {"columns": ['Close', 'SMA_20'], "title": "السعر"},
+                {"columns": ['Volume'], "title": "حجم التداول", "kind": "bar"},
+            ], title=f"أداء السهم {symbol}")
+            st.plotly_chart(fig, use_container_width=True)
 
         except Exception as e:
             st.error(f"حدث خطأ أثناء تحليل السهم: {str(e)}")
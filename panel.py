@@ -0,0 +1,174 @@
+# panel.py
+from typing import Dict, Mapping, Union
+
+import numpy as np
+import pandas as pd
+
+from indicators import mfi, obv, sma
+from price_store import OHLCV_COLUMNS
+
+# تصنيفات قوة السهم كما تعرضها الصفحات
+STRONG = "قوي"
+WARNING = "تحذير: OBV متناقض"
+WEAK = "ضعيف"
+
+MFI_WINDOW = 14
+VOLUME_WINDOW = 20
+
+Panel = Dict[str, pd.DataFrame]
+
+STRENGTH_COLUMNS = ["Symbol", "Close", "Daily_Return", "Volume", "Avg_Volume", "OBV_Rising", "MFI", "Strength"]
+
+
+def to_panel(data: Union[Mapping[str, pd.DataFrame], pd.DataFrame]) -> Panel:
+    """
+    Build a panel: one dates x symbols DataFrame per OHLCV field
+
+    Args:
+        data: symbol -> OHLCV DataFrame (e.g. from batch_quotes.download_histories),
+            or a DataFrame with (symbol, field) or (field, symbol) MultiIndex columns
+
+    Returns:
+        dict: field -> DataFrame aligned on the union of all dates
+    """
+    if isinstance(data, pd.DataFrame):
+        level = 0 if data.columns.get_level_values(0).isin(OHLCV_COLUMNS).all() else 1
+        return {field: data.xs(field, axis=1, level=level).astype(float) for field in OHLCV_COLUMNS}
+
+    if not data:
+        return {field: pd.DataFrame(dtype=float) for field in OHLCV_COLUMNS}
+    symbols = list(data)
+    indexes = [frame.index for frame in data.values()]
+    index = indexes[0].append(indexes[1:]).unique().sort_values()
+
+    # نملأ مصفوفة واحدة (تواريخ × حقول × رموز) بدلاً من محاذاة آلاف السلاسل في pandas
+    values = np.full((len(index), len(OHLCV_COLUMNS), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        frame = data[symbol]
+        fields = frame.columns.get_indexer(OHLCV_COLUMNS)
+        values[index.get_indexer(frame.index), :, j] = frame.to_numpy(dtype=float)[:, fields]
+    return {
+        field: pd.DataFrame(values[:, i, :], index=index, columns=symbols)
+        for i, field in enumerate(OHLCV_COLUMNS)
+    }
+
+
+def _to_bottom(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+    return np.take_along_axis(values, order, axis=0)
+
+
+def _from_bottom(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+    out = np.empty_like(values)
+    np.put_along_axis(out, order, values, axis=0)
+    return out
+
+
+def compute_indicators(panel: Panel, mfi_window: int = MFI_WINDOW, volume_window: int = VOLUME_WINDOW) -> Panel:
+    """
+    Compute OBV, MFI, Daily_Return and Avg_Volume for every symbol at once
+
+    Symbols trade on different calendars, so the panel has gaps. Each
+    column's valid bars are first moved to the bottom of the array (keeping
+    their order), the indicators run over the whole matrix in one pass, and
+    the results are moved back to their dates. Every symbol therefore gets
+    exactly the values it would get on its own history.
+
+    Returns:
+        dict: indicator name -> dates x symbols DataFrame (NaN where the symbol has no bar)
+    """
+    close = panel["Close"]
+    valid = close.notna().to_numpy()
+    order = np.argsort(valid, axis=0, kind="stable")
+    fields = {field: _to_bottom(panel[field].to_numpy(dtype=float), order) for field in OHLCV_COLUMNS}
+
+    c, v = fields["Close"], fields["Volume"]
+    prev = np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+    results = {
+        "OBV": obv(c, v).to_numpy(copy=True),
+        "MFI": mfi(fields["High"], fields["Low"], c, v, window=mfi_window).to_numpy(copy=True),
+        "Daily_Return": (c / prev - 1) * 100,
+        "Avg_Volume": sma(v, volume_window).to_numpy(copy=True),
+    }
+
+    # MFI لا يُحسب قبل اكتمال النافذة من بيانات السهم نفسه
+    bars_seen = np.cumsum(_to_bottom(valid, order), axis=0)
+    results["MFI"][bars_seen <= mfi_window] = np.nan
+
+    out = {}
+    for name, values in results.items():
+        values = _from_bottom(values, order)
+        values[~valid] = np.nan
+        out[name] = pd.DataFrame(values, index=close.index, columns=close.columns)
+    return out
+
+
+def strength_labels(last_close, prev_close, volume, avg_volume, obv_rising, last_mfi) -> np.ndarray:
+    """
+    Strength label of every symbol from its last bar (arrays of equal length)
+
+    A symbol is "قوي" when it closed higher on above-average volume with a
+    rising OBV and an MFI between 50 and 80, "تحذير" when price and volume
+    rise but OBV does not, and "ضعيف" otherwise.
+    """
+    obv_rising = np.asarray(obv_rising, dtype=bool)
+    last_mfi = np.asarray(last_mfi, dtype=float)
+    is_rising = np.asarray(last_close, dtype=float) > np.asarray(prev_close, dtype=float)
+    high_volume = np.asarray(volume, dtype=float) > np.asarray(avg_volume, dtype=float)
+    mfi_ok = (last_mfi > 50) & (last_mfi < 80)
+    return np.select(
+        [is_rising & high_volume & obv_rising & mfi_ok, is_rising & high_volume & ~obv_rising],
+        [STRONG, WARNING],
+        default=WEAK
+    )
+
+
+def classify_strength(panel: Panel, min_bars: int = 2, **kwargs) -> pd.DataFrame:
+    """
+    Evaluate the last two bars of every symbol and classify its strength (see strength_labels)
+
+    Args:
+        panel: Output of to_panel()
+        min_bars: Symbols with fewer valid bars are skipped
+        **kwargs: Passed to compute_indicators()
+
+    Returns:
+        pd.DataFrame: one row per symbol with Symbol, Close, Daily_Return, Volume,
+                      Avg_Volume, OBV_Rising, MFI and Strength
+    """
+    close = panel["Close"]
+    if close.empty:
+        return pd.DataFrame(columns=STRENGTH_COLUMNS)
+
+    indicators = compute_indicators(panel, **kwargs)
+    valid = close.notna().to_numpy()
+    counts = valid.sum(axis=0)
+
+    # موقع آخر شمعتين صالحتين لكل سهم
+    rows = np.arange(len(close))[:, None]
+    positions = np.where(valid, rows, -1)
+    last_pos = positions.max(axis=0)
+    positions[last_pos, np.arange(valid.shape[1])] = -1
+    prev_pos = positions.max(axis=0)
+
+    keep = (counts >= max(min_bars, 2))
+    cols = np.arange(valid.shape[1])[keep]
+    last, prev = last_pos[keep], prev_pos[keep]
+
+    def at(frame: pd.DataFrame, pos: np.ndarray) -> np.ndarray:
+        return frame.to_numpy(dtype=float)[pos, cols]
+
+    last_close, prev_close = at(close, last), at(close, prev)
+    volume, avg_volume = at(panel["Volume"], last), at(indicators["Avg_Volume"], last)
+    obv_rising = at(indicators["OBV"], last) > at(indicators["OBV"], prev)
+    last_mfi = at(indicators["MFI"], last)
+
+    return pd.DataFrame({
+        "Symbol": close.columns[keep],
+        "Close": last_close,
+        "Daily_Return": at(indicators["Daily_Return"], last),
+        "Volume": volume,
+        "Avg_Volume": avg_volume,
+        "OBV_Rising": obv_rising,
+        "MFI": last_mfi,
+        "Strength": strength_labels(last_close, prev_close, volume, avg_volume, obv_rising, last_mfi),
+    }, columns=STRENGTH_COLUMNS)
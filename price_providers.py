@@ -0,0 +1,239 @@
+# price_providers.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import http_client
+from price_store import OHLCV_COLUMNS, get_history, period_start, yahoo_fetcher
+
+# أسماء المصادر كما تظهر في الواجهة -> اسم المزود الداخلي
+SOURCE_PROVIDERS = {
+    "Yahoo Finance": "yahoo",
+    "Alpha Vantage": "alpha_vantage",
+    "Twelve Data": "twelve_data",
+    "Tiingo": "tiingo",
+}
+
+DEFAULT_PRIORITY = ["yahoo", "tiingo", "twelve_data", "alpha_vantage"]
+KEYLESS_PROVIDERS = {"yahoo"}
+
+# إرسال طلب احتياطي إذا تجاوز المزود الأساسي زمن p95 الخاص به
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+_latencies: Dict[str, deque] = {}
+_latencies_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+class NoDataError(Exception):
+    """Raised when a provider answered but returned no usable bars"""
+
+
+# --- جلب البيانات من كل مزود بصيغة موحدة (Open/High/Low/Close/Volume) ---
+def _frame(records: List[dict], date_key: str, fields: Dict[str, str]) -> pd.DataFrame:
+    if not records:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    df = pd.DataFrame(records)
+    df.index = pd.to_datetime(df.pop(date_key))
+    df = df.rename(columns=fields)[OHLCV_COLUMNS].astype(float)
+    return df.sort_index()
+
+
+def _alpha_vantage_fetcher(symbol: str, period: str, api_key: str):
+    def fetch(start):
+        since = start if start is not None else period_start(period)
+        compact = since is not None and since > pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=140)
+        data = http_client.get_json(
+            f"{http_client.base_url('alpha_vantage')}/query",
+            params={
+                "function": "TIME_SERIES_DAILY",
+                "symbol": symbol,
+                "outputsize": "compact" if compact else "full",
+                "apikey": api_key,
+            },
+            provider="alpha_vantage",
+            api_key=api_key
+        )
+        series = data.get("Time Series (Daily)")
+        if series is None:
+            raise NoDataError(data.get("Note") or data.get("Information") or data.get("Error Message") or "no data")
+        records = [dict(values, date=date) for date, values in series.items()]
+        return _frame(records, "date", {
+            "1. open": "Open", "2. high": "High", "3. low": "Low", "4. close": "Close", "5. volume": "Volume"
+        })
+    return fetch
+
+
+def _twelve_data_fetcher(symbol: str, period: str, api_key: str):
+    def fetch(start):
+        since = start if start is not None else period_start(period)
+        params = {"symbol": symbol, "interval": "1day", "apikey": api_key, "timezone": "UTC"}
+        if since is not None:
+            params["start_date"] = since.strftime("%Y-%m-%d")
+        else:
+            params["outputsize"] = 5000
+        data = http_client.get_json(
+            f"{http_client.base_url('twelve_data')}/time_series",
+            params=params,
+            provider="twelve_data",
+            api_key=api_key
+        )
+        if data.get("status") == "error":
+            raise NoDataError(data.get("message", "no data"))
+        return _frame(data.get("values", []), "datetime", {
+            "open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"
+        })
+    return fetch
+
+
+def _tiingo_fetcher(symbol: str, period: str, api_key: str):
+    def fetch(start):
+        since = start if start is not None else period_start(period)
+        params = {"token": api_key}
+        if since is not None:
+            params["startDate"] = since.strftime("%Y-%m-%d")
+        data = http_client.get_json(
+            f"{http_client.base_url('tiingo')}/tiingo/daily/{symbol}/prices",
+            params=params,
+            provider="tiingo",
+            api_key=api_key,
+            headers={"Content-Type": "application/json"}
+        )
+        return _frame(data, "date", {
+            "open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"
+        })
+    return fetch
+
+
+def _finnhub_fetcher(symbol: str, period: str, api_key: str):
+    def fetch(start):
+        end = datetime.now()
+        since = start if start is not None else period_start(period)
+        since_unix = int(since.timestamp()) if since is not None else int((end - timedelta(days=365 * 20)).timestamp())
+        data = http_client.get_json(
+            f"{http_client.base_url('finnhub')}/api/v1/stock/candle",
+            params={"symbol": symbol, "resolution": "D", "from": since_unix, "to": int(end.timestamp()), "token": api_key},
+            provider="finnhub",
+            api_key=api_key
+        )
+        if data.get("s") != "ok":
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        return pd.DataFrame({
+            "Open": data["o"], "High": data["h"], "Low": data["l"], "Close": data["c"], "Volume": data["v"]
+        }, index=pd.to_datetime(data["t"], unit="s")).astype(float)
+    return fetch
+
+
+FETCHERS: Dict[str, Callable] = {
+    "yahoo": lambda symbol, period, api_key: yahoo_fetcher(symbol, period),
+    "alpha_vantage": _alpha_vantage_fetcher,
+    "twelve_data": _twelve_data_fetcher,
+    "tiingo": _tiingo_fetcher,
+    "finnhub": _finnhub_fetcher,
+}
+
+
+# --- قياس زمن الاستجابة ---
+def record_latency(provider: str, seconds: float) -> None:
+    with _latencies_lock:
+        _latencies.setdefault(provider, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def p95_latency(provider: str) -> Optional[float]:
+    """p95 of the provider's recent latencies, or None until enough samples exist"""
+    with _latencies_lock:
+        samples = list(_latencies.get(provider, ()))
+    if len(samples) < MIN_LATENCY_SAMPLES:
+        return None
+    return float(np.percentile(samples, 95))
+
+
+def fetch_from_provider(provider: str, symbol: str, period: str = "1mo", api_key: Optional[str] = None) -> pd.DataFrame:
+    """Fetch normalized daily bars from one provider through the local price store"""
+    fetch = FETCHERS[provider](symbol, period, api_key)
+
+    def timed_fetch(start):
+        # نقيس زمن الشبكة فقط، وليس القراءة من المخزن المحلي
+        started = time.monotonic()
+        try:
+            return fetch(start)
+        finally:
+            record_latency(provider, time.monotonic() - started)
+
+    df = get_history(symbol, provider, "1d", period, timed_fetch)
+    if df.empty:
+        raise NoDataError(f"{provider}: لا توجد بيانات لـ {symbol}")
+    return df
+
+
+# --- الموجّه ---
+def provider_order(preferred: Optional[str] = None, api_keys: Optional[Dict[str, str]] = None) -> List[str]:
+    """Providers in priority order with the preferred one first, skipping those without a key"""
+    api_keys = api_keys or {}
+    order = ([preferred] if preferred else []) + [p for p in DEFAULT_PRIORITY if p != preferred]
+    return [p for p in order if p in FETCHERS and (p in KEYLESS_PROVIDERS or api_keys.get(p))]
+
+
+def _hedged(primary: str, backup: str, symbol: str, period: str, api_keys: Dict[str, str]) -> Tuple[pd.DataFrame, str]:
+    futures = {_hedge_pool.submit(fetch_from_provider, primary, symbol, period, api_keys.get(primary)): primary}
+    delay = p95_latency(primary) or DEFAULT_HEDGE_DELAY
+    done, _ = wait(futures, timeout=delay)
+    if not done or next(iter(done)).exception() is not None:
+        futures[_hedge_pool.submit(fetch_from_provider, backup, symbol, period, api_keys.get(backup))] = backup
+
+    pending = set(futures)
+    last_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result(), futures[future]
+            except Exception as e:
+                last_error = e
+    raise last_error
+
+
+def get_price_history(
+    symbol: str,
+    period: str = "1mo",
+    providers: Optional[List[str]] = None,
+    api_keys: Optional[Dict[str, str]] = None,
+    hedge: bool = False
+) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Fetch daily OHLCV bars, failing over between providers automatically
+
+    Args:
+        symbol: Ticker symbol
+        period: yfinance-style period
+        providers: Providers to try in order (defaults to provider_order())
+        api_keys: provider -> API key
+        hedge: If True, send a second request to the next provider when the
+            primary has not answered within its p95 latency; the first
+            successful answer wins. Meant for latency-sensitive single-symbol views.
+
+    Returns:
+        tuple: (OHLCV DataFrame, provider that served it); an empty frame and
+               None if every provider failed
+    """
+    api_keys = api_keys or {}
+    providers = providers if providers is not None else provider_order(api_keys=api_keys)
+
+    i = 0
+    while i < len(providers):
+        try:
+            if hedge and i + 1 < len(providers):
+                df, used = _hedged(providers[i], providers[i + 1], symbol, period, api_keys)
+                return df, used
+            return fetch_from_provider(providers[i], symbol, period, api_keys.get(providers[i])), providers[i]
+        except Exception:
+            i += 2 if hedge and i + 1 < len(providers) else 1
+    return pd.DataFrame(columns=OHLCV_COLUMNS), None
@@ -0,0 +1,303 @@
+# price_store.py
+import re
+import time
+from contextlib import closing
+from typing import Callable, Optional
+
+import pandas as pd
+
+import metrics
+from rate_limiter import acquire
+from storage import connect
+
+DB_NAME = "prices.sqlite"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# لا نعيد الاتصال بالمزود إذا تم التحديث خلال هذه المدة (بالثواني)
+DEFAULT_MAX_AGE = 15 * 60
+
+# الشموع اليومية فأكبر تُخزن بتاريخها فقط (منتصف الليل UTC لذلك التاريخ)، لأن yfinance يعيد
+# اليوم نفسه بمنتصف ليل البورصة من Ticker.history وبتاريخ بلا منطقة زمنية من download
+DAILY_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+SCHEMA_VERSION = 1
+
+# (start or None) -> DataFrame indexed by bar time with OHLCV columns.
+# None asks for the whole requested period.
+FetchFn = Callable[[Optional[pd.Timestamp]], pd.DataFrame]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, provider, interval, ts)
+);
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    covered_from INTEGER,
+    last_fetch REAL NOT NULL,
+    tz TEXT,
+    PRIMARY KEY (symbol, provider, interval)
+);
+"""
+
+
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        _migrate_daily_keys(conn)
+    return conn
+
+
+def _migrate_daily_keys(conn) -> None:
+    # السجلات القديمة قد تحفظ اليوم نفسه بمفتاحين؛ نعيد مفتاحها إلى التاريخ ونبقي صف Ticker.history
+    placeholders = ",".join("?" * len(DAILY_INTERVALS))
+    rows = conn.execute(
+        "SELECT b.rowid, b.ts, s.tz FROM bars b LEFT JOIN series s "
+        "ON s.symbol=b.symbol AND s.provider=b.provider AND s.interval=b.interval "
+        f"WHERE b.interval IN ({placeholders}) AND b.ts % 86400000000000 != 0",
+        DAILY_INTERVALS
+    ).fetchall()
+    with conn:
+        for rowid, ts, tz in rows:
+            key = _day_keys(pd.DatetimeIndex([pd.Timestamp(ts, unit="ns", tz="UTC").tz_convert(tz or "UTC")]))[0]
+            conn.execute("UPDATE OR REPLACE bars SET ts=? WHERE rowid=?", (int(key), rowid))
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """Convert a yfinance-style period ('5d', '1mo', '3mo', '1y', 'ytd', 'max') to a UTC start time"""
+    now = now or pd.Timestamp.now(tz="UTC")
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"فترة غير مدعومة: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        offset = pd.DateOffset(days=count)
+    elif unit == "wk":
+        offset = pd.DateOffset(weeks=count)
+    elif unit == "mo":
+        offset = pd.DateOffset(months=count)
+    else:
+        offset = pd.DateOffset(years=count)
+    return (now - offset).normalize()
+
+
+def _to_ns(ts: pd.Timestamp) -> int:
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.tz_convert("UTC").value)
+
+
+def _day_keys(index: pd.DatetimeIndex):
+    # التاريخ التقويمي للشمعة في منطقتها الزمنية، كمنتصف ليل UTC
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize().as_unit("ns").asi8
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[OHLCV_COLUMNS].copy()
+    df.index = pd.to_datetime(df.index)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def _read_meta(conn, symbol, provider, interval):
+    return conn.execute(
+        "SELECT covered_from, last_fetch, tz FROM series WHERE symbol=? AND provider=? AND interval=?",
+        (symbol, provider, interval)
+    ).fetchone()
+
+
+def _last_ts(conn, symbol, provider, interval) -> Optional[int]:
+    row = conn.execute(
+        "SELECT MAX(ts) FROM bars WHERE symbol=? AND provider=? AND interval=?",
+        (symbol, provider, interval)
+    ).fetchone()
+    return row[0]
+
+
+def append_bars(
+    symbol: str,
+    provider: str,
+    interval: str,
+    df: pd.DataFrame,
+    covered_from: Optional[pd.Timestamp] = None,
+    full_range: bool = False
+) -> None:
+    """
+    Upsert bars into the store
+
+    Args:
+        symbol, provider, interval: Series key
+        df: Bars indexed by time with OHLCV columns
+        covered_from: Start of the range that was requested from the provider
+        full_range: True if the provider was asked for its whole history
+    """
+    df = _normalize(df) if not df.empty else df
+    tz = str(df.index.tz) if not df.empty and df.index.tz is not None else None
+    if df.empty:
+        keys = []
+    elif interval in DAILY_INTERVALS:
+        keys = [int(key) for key in _day_keys(df.index)]
+    else:
+        keys = [_to_ns(ts) for ts in df.index]
+    rows = [
+        (symbol, provider, interval, key,
+         float(row.Open), float(row.High), float(row.Low), float(row.Close), float(row.Volume))
+        for key, row in zip(keys, df.itertuples(index=False))
+    ]
+
+    if covered_from is None and not full_range and not df.empty:
+        covered_from = df.index.min()
+
+    with closing(_db()) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        meta = _read_meta(conn, symbol, provider, interval)
+        if meta is None:
+            if full_range:
+                new_from = None
+            elif covered_from is not None:
+                new_from = _to_ns(covered_from)
+            else:
+                new_from = time.time_ns()
+            conn.execute(
+                "INSERT INTO series VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, provider, interval, new_from, time.time(), tz)
+            )
+        else:
+            old_from, _, old_tz = meta
+            if full_range or old_from is None:
+                new_from = None
+            elif covered_from is None:
+                new_from = old_from
+            else:
+                new_from = min(old_from, _to_ns(covered_from))
+            conn.execute(
+                "UPDATE series SET covered_from=?, last_fetch=?, tz=? WHERE symbol=? AND provider=? AND interval=?",
+                (new_from, time.time(), tz or old_tz, symbol, provider, interval)
+            )
+
+
+def read_bars(
+    symbol: str,
+    provider: str,
+    interval: str,
+    start: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """Read stored bars from start (inclusive) onwards as an OHLCV DataFrame"""
+    with closing(_db()) as conn:
+        meta = _read_meta(conn, symbol, provider, interval)
+        rows = conn.execute(
+            "SELECT ts, open, high, low, close, volume FROM bars "
+            "WHERE symbol=? AND provider=? AND interval=? AND ts>=? ORDER BY ts",
+            (symbol, provider, interval, _to_ns(start) if start is not None else -(2 ** 63))
+        ).fetchall()
+
+    if not rows:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    df = pd.DataFrame(rows, columns=["ts"] + OHLCV_COLUMNS)
+    index = pd.to_datetime(df.pop("ts"), unit="ns", utc=True)
+    tz = meta[2] if meta else None
+    if interval in DAILY_INTERVALS:
+        # التاريخ المخزن يعود منتصف ليل البورصة كما يعيده المزود
+        index = index.dt.tz_localize(None)
+        index = index.dt.tz_localize(tz) if tz else index
+    else:
+        index = index.dt.tz_convert(tz) if tz else index.dt.tz_localize(None)
+    df.index = pd.DatetimeIndex(index, name="Date")
+    return df
+
+
+def get_history(
+    symbol: str,
+    provider: str,
+    interval: str,
+    period: str,
+    fetch_fn: FetchFn,
+    max_age: float = DEFAULT_MAX_AGE
+) -> pd.DataFrame:
+    """
+    Serve price history from the local store, fetching only what is missing
+
+    - If the stored range does not reach back to the requested period, the
+      whole period is fetched once.
+    - Otherwise only the bars from the last stored bar onwards are fetched
+      (the last bar is refetched since it may still be forming) and appended.
+    - Nothing is fetched if the series was refreshed less than max_age
+      seconds ago.
+
+    Args:
+        symbol: Ticker symbol
+        provider: Data provider name (part of the cache key)
+        interval: Bar interval such as '1d' (part of the cache key)
+        period: yfinance-style period to return
+        fetch_fn: Provider fetcher taking the start timestamp or None
+        max_age: Seconds during which stored data is served without a request
+
+    Returns:
+        pd.DataFrame: OHLCV bars covering the requested period
+    """
+    start = period_start(period)
+
+    with closing(_db()) as conn:
+        meta = _read_meta(conn, symbol, provider, interval)
+        last_ts = _last_ts(conn, symbol, provider, interval)
+
+    covered = meta is not None and (
+        meta[0] is None or (start is not None and meta[0] <= _to_ns(start))
+    )
+
+    if not covered:
+        metrics.cache_event("price_store", "miss")
+    elif time.time() - meta[1] >= max_age:
+        metrics.cache_event("price_store", "refresh")
+    else:
+        metrics.cache_event("price_store", "hit")
+
+    try:
+        if not covered:
+            fresh = fetch_fn(None)
+            append_bars(symbol, provider, interval, fresh, covered_from=start, full_range=start is None)
+        elif time.time() - meta[1] >= max_age:
+            since = pd.Timestamp(last_ts, unit="ns", tz="UTC") if last_ts is not None else start
+            fresh = fetch_fn(since)
+            append_bars(symbol, provider, interval, fresh)
+    except Exception:
+        # نعيد البيانات المخزنة إن وجدت بدلاً من الفشل الكامل
+        if meta is None:
+            raise
+
+    return read_bars(symbol, provider, interval, start)
+
+
+def yahoo_fetcher(symbol: str, period: str) -> FetchFn:
+    """Build a fetch_fn that downloads daily bars of a symbol from Yahoo Finance"""
+    def fetch(start: Optional[pd.Timestamp]) -> pd.DataFrame:
+        import yfinance as yf
+
+        acquire("yahoo")
+        stock = yf.Ticker(symbol)
+        with metrics.track("yahoo"):
+            if start is None:
+                hist = stock.history(period=period)
+            else:
+                hist = stock.history(start=start.strftime("%Y-%m-%d"))
+        return hist[OHLCV_COLUMNS] if not hist.empty else pd.DataFrame(columns=OHLCV_COLUMNS)
+    return fetch
+
+
+def get_yahoo_history(symbol: str, period: str = "1mo") -> pd.DataFrame:
+    """Daily Yahoo Finance bars served through the local store"""
+    return get_history(symbol, "yahoo", "1d", period, yahoo_fetcher(symbol, period))
@@ -0,0 +1,266 @@
+# quota.py
+"""
+Daily provider quotas shared by every process using the same cache directory.
+
+The per_day limits of rate_limiter.PROVIDER_LIMITS are counted on disk per
+provider/API key and calendar day (UTC), so the Streamlit server, the
+scheduler and any other worker draw from one budget. Part of each budget is
+kept for more important work: a request may only use the quota that is left
+above the reserve of its priority.
+
+    INTERACTIVE  a user looking at one symbol (the default)
+    BULK         screens over a symbol list (set by fetch_engine.fetch_many)
+    BATCH        scheduled jobs (set by scheduler.run_job)
+
+Priorities are carried by a context variable and only ever lowered: a
+bulk screen started by a batch job stays a batch request.
+"""
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+import metrics
+from rate_limiter import DAILY_WINDOW, PROVIDER_LIMITS, RateLimitExceeded, key_id
+from storage import connect
+
+DB_NAME = "quota.sqlite"
+
+INTERACTIVE = 0
+BULK = 1
+BATCH = 2
+
+# نسبة الحصة اليومية المحجوزة للأولويات الأعلى
+RESERVED_SHARE = {
+    INTERACTIVE: 0.0,
+    BULK: 0.2,
+    BATCH: 0.5,
+}
+
+# الرسائل التي يعيدها المزود بدلاً من البيانات عند نفاد الحصة (رمز 200 مع JSON)
+LIMIT_MESSAGE_KEYS = {
+    "alpha_vantage": ("Information", "Note"),
+}
+LIMIT_MESSAGE_MAX_BYTES = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_usage (
+    provider TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (provider, key_id, day)
+);
+"""
+
+_priority: ContextVar[int] = ContextVar("quota_priority", default=INTERACTIVE)
+
+
+class QuotaExceeded(RateLimitExceeded):
+    """Raised when a provider's daily quota left for the current priority cannot cover a request"""
+
+    def __init__(self, provider: str, retry_after: float, available: int, calls: int = 1):
+        self.provider = provider
+        self.retry_after = retry_after
+        self.available = available
+        self.calls = calls
+        Exception.__init__(
+            self,
+            f"الحصة اليومية لمزود {provider} لا تكفي: المتاح {available} طلب والمطلوب {calls}. "
+            f"تتجدد الحصة بعد {format_duration(retry_after)}"
+        )
+
+
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _today(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset(now: Optional[datetime] = None) -> float:
+    """Seconds until the daily quotas start over (midnight UTC)"""
+    now = now or datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes >= 60:
+        return f"{minutes // 60} ساعة و{minutes % 60} دقيقة"
+    return f"{max(minutes, 1)} دقيقة"
+
+
+def daily_limit(provider: str) -> Optional[int]:
+    """The provider's daily request limit, or None if it has none"""
+    return PROVIDER_LIMITS.get(provider, {}).get(DAILY_WINDOW)
+
+
+def allowance(provider: str, level: Optional[int] = None) -> int:
+    """How much of the daily limit requests of a priority (default: the current one) may use"""
+    limit = daily_limit(provider) or 0
+    share = RESERVED_SHARE[current_priority() if level is None else level]
+    return int(limit * (1 - share))
+
+
+# --- الأولوية ---
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the block at the given priority, or at the current one if it is already lower"""
+    token = _priority.set(max(_priority.get(), level))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# --- الاستهلاك ---
+def used(provider: str, api_key: Optional[str] = None) -> int:
+    """Requests billed today to a provider/API key"""
+    with closing(_db()) as conn:
+        row = conn.execute(
+            "SELECT used FROM quota_usage WHERE provider=? AND key_id=? AND day=?",
+            (provider, key_id(api_key), _today())
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def status(provider: str, api_key: Optional[str] = None, level: Optional[int] = None) -> Optional[dict]:
+    """
+    Today's quota of a provider/API key
+
+    Returns:
+        dict: limit, used, remaining (of the whole limit), available (to the
+            given or current priority) and resets_in (seconds), or None if
+            the provider has no daily limit
+    """
+    limit = daily_limit(provider)
+    if limit is None:
+        return None
+    count = used(provider, api_key)
+    return {
+        "provider": provider,
+        "limit": limit,
+        "used": count,
+        "remaining": max(limit - count, 0),
+        "available": max(allowance(provider, level) - count, 0),
+        "resets_in": seconds_until_reset(),
+    }
+
+
+def describe(quota: dict) -> str:
+    """One-line Arabic summary of a status() result for the pages"""
+    return (
+        f"الحصة اليومية لـ {quota['provider']}: متبقٍ {quota['remaining']} من {quota['limit']} طلب "
+        f"(المتاح لهذا النوع من الطلبات {quota['available']})، وتتجدد بعد {format_duration(quota['resets_in'])}"
+    )
+
+
+def require(provider: str, api_key: Optional[str], calls: int, level: Optional[int] = None) -> None:
+    """
+    Check that the quota left for a priority covers a planned number of calls
+
+    Nothing is billed; use it to refuse or defer a whole job up front rather
+    than failing halfway through.
+
+    Raises:
+        QuotaExceeded: If the planned calls do not fit
+    """
+    quota = status(provider, api_key, level)
+    if quota is not None and calls > quota["available"]:
+        raise QuotaExceeded(provider, quota["resets_in"], quota["available"], calls)
+
+
+def charge(provider: str, api_key: Optional[str] = None, calls: int = 1) -> None:
+    """
+    Bill calls to today's quota if they fit in the share of the current priority
+
+    Check and update are a single statement, so concurrent processes
+    cannot overspend the quota between them.
+
+    Raises:
+        QuotaExceeded: If the quota left for the current priority is too small
+    """
+    if daily_limit(provider) is None:
+        return
+    key, day = key_id(api_key), _today()
+    with closing(_db()) as conn, conn:
+        if conn.execute("INSERT OR IGNORE INTO quota_usage VALUES (?, ?, ?, 0)", (provider, key, day)).rowcount:
+            # أول طلب في يوم جديد: لا حاجة لعدادات الأيام السابقة
+            conn.execute("DELETE FROM quota_usage WHERE day < ?", (day,))
+        billed = conn.execute(
+            "UPDATE quota_usage SET used = used + ? WHERE provider=? AND key_id=? AND day=? AND used + ? <= ?",
+            (calls, provider, key, day, calls, allowance(provider))
+        ).rowcount
+    if not billed:
+        quota = status(provider, api_key)
+        raise QuotaExceeded(provider, quota["resets_in"], quota["available"], calls)
+
+
+def record(provider: str, api_key: Optional[str] = None, calls: int = 1) -> None:
+    """Bill calls that were already made (e.g. automatic retries) without checking the quota"""
+    if daily_limit(provider) is None or calls <= 0:
+        return
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "INSERT INTO quota_usage VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (provider, key_id, day) DO UPDATE SET used = used + excluded.used",
+            (provider, key_id(api_key), _today(), calls)
+        )
+
+
+def mark_exhausted(provider: str, api_key: Optional[str] = None) -> None:
+    """Record that the provider refused further requests today (e.g. the key is also used elsewhere)"""
+    limit = daily_limit(provider)
+    if limit is None:
+        return
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "INSERT INTO quota_usage VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (provider, key_id, day) DO UPDATE SET used = MAX(used, excluded.used)",
+            (provider, key_id(api_key), _today(), limit)
+        )
+
+
+def check_response(provider: str, api_key: Optional[str], content: bytes) -> None:
+    """
+    Turn a provider's "limit reached" message into an exception
+
+    Some providers answer 200 with a JSON note instead of data once a limit
+    is hit. A daily limit message also marks today's quota as used up.
+
+    Raises:
+        QuotaExceeded: For a daily limit message
+        RateLimitExceeded: For a per-minute limit message
+    """
+    keys = LIMIT_MESSAGE_KEYS.get(provider)
+    if not keys or len(content) > LIMIT_MESSAGE_MAX_BYTES or not any(k.encode() in content for k in keys):
+        return
+    text = content.decode("utf-8", "replace").lower()
+    if "per minute" in text or "per second" in text:
+        raise RateLimitExceeded(provider, 60)
+    if "per day" in text or "daily" in text:
+        mark_exhausted(provider, api_key)
+        raise QuotaExceeded(provider, seconds_until_reset(), 0)
+
+
+def _report_remaining() -> None:
+    day = _today()
+    with closing(_db()) as conn:
+        rows = conn.execute("SELECT provider, key_id, used FROM quota_usage WHERE day=?", (day,)).fetchall()
+    for provider, key, count in rows:
+        limit = daily_limit(provider)
+        if limit is not None:
+            metrics.QUOTA_REMAINING.set(max(limit - count, 0), provider=provider, key=key, window=DAILY_WINDOW)
+
+
+# يُسجل بعد مجمّع rate_limiter الذي يفرغ المقياس أولاً
+metrics.register_collector(_report_remaining)
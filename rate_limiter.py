@@ -0,0 +1,157 @@
+# rate_limiter.py
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+# الحدود الموثقة لكل مزود (الخطط المجانية)
+PROVIDER_LIMITS = {
+    "alpha_vantage": {"per_minute": 5, "per_day": 25},
+    "finnhub": {"per_second": 30, "per_minute": 60},
+    "fmp": {"per_day": 250},
+    "tiingo": {"per_hour": 50, "per_day": 1000},
+    "twelve_data": {"per_minute": 8, "per_day": 800},
+    # Yahoo لا ينشر حدوداً رسمية؛ هذا حد تحفظي لتجنب الحظر
+    "yahoo": {"per_minute": 60},
+    "telegram": {"per_second": 30},
+}
+
+WINDOW_SECONDS = {
+    "per_second": 1,
+    "per_minute": 60,
+    "per_hour": 3600,
+    "per_day": 86400,
+}
+
+# الحد اليومي لا يُطبق هنا بل في quota.py، على القرص، حتى تتشارك العمليات الحصة نفسها
+DAILY_WINDOW = "per_day"
+
+# أقصى مدة انتظار افتراضية قبل رفض الطلب (بالثواني)
+DEFAULT_MAX_WAIT = 60.0
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to wait longer than allowed for its provider budget"""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"تم تجاوز حد الطلبات لمزود {provider}. حاول بعد {retry_after:.0f} ثانية")
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to capacity tokens refilled at rate tokens/second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, tokens: float = 1.0) -> float:
+        """Seconds until the requested tokens are available"""
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens: float = 1.0) -> None:
+        self.tokens -= tokens
+
+
+class RateLimiter:
+    """All the buckets of one provider/API key pair; a request must fit in every window"""
+
+    def __init__(self, limits: Dict[str, int]):
+        self._windows: List[str] = list(limits)
+        self._buckets: List[TokenBucket] = [
+            TokenBucket(count, count / WINDOW_SECONDS[window])
+            for window, count in limits.items()
+        ]
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if possible; return 0 on success or the seconds to wait otherwise"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max((bucket.wait_time(now, tokens) for bucket in self._buckets), default=0.0)
+            if wait == 0.0:
+                for bucket in self._buckets:
+                    bucket.consume(tokens)
+            return wait
+
+    def remaining(self) -> Dict[str, float]:
+        """Tokens currently available in each window"""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self._buckets:
+                bucket._refill(now)
+            return {window: bucket.tokens for window, bucket in zip(self._windows, self._buckets)}
+
+    def acquire(self, provider: str, tokens: float = 1.0, max_wait: Optional[float] = DEFAULT_MAX_WAIT) -> None:
+        """Block until the request fits the budget, sleeping only as long as needed"""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(provider, wait)
+            metrics.RATE_LIMIT_WAIT.inc(wait, provider=provider)
+            time.sleep(wait)
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def key_id(api_key: Optional[str]) -> str:
+    """Short stable identifier of an API key, so the key itself is never stored"""
+    if not api_key:
+        return "-"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def get_limiter(provider: str, api_key: Optional[str] = None) -> RateLimiter:
+    """Return the process-wide limiter of a provider/API key pair"""
+    key = (provider, key_id(api_key))
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limits = PROVIDER_LIMITS.get(provider, {})
+            limiter = RateLimiter({window: count for window, count in limits.items() if window != DAILY_WINDOW})
+            _limiters[key] = limiter
+        return limiter
+
+
+def acquire(provider: str, api_key: Optional[str] = None, max_wait: Optional[float] = DEFAULT_MAX_WAIT) -> None:
+    """
+    Wait for a slot in the provider's budget for this API key
+
+    Args:
+        provider: Provider name (see PROVIDER_LIMITS)
+        api_key: API key the request is billed to; user-entered keys get their own budget
+        max_wait: Maximum seconds to wait, None to wait indefinitely
+
+    Raises:
+        RateLimitExceeded: If the budget will not allow the request within max_wait
+    """
+    get_limiter(provider, api_key).acquire(provider, max_wait=max_wait)
+
+
+def _report_remaining() -> None:
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    metrics.QUOTA_REMAINING.clear()
+    for (provider, key_id), limiter in limiters:
+        for window, tokens in limiter.remaining().items():
+            metrics.QUOTA_REMAINING.set(tokens, provider=provider, key=key_id, window=window)
+
+
+metrics.register_collector(_report_remaining)
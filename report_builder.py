@@ -0,0 +1,218 @@
+# report_builder.py
+import html
+import re
+from string import Formatter
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# أقصى طول لرسالة Telegram (بعد إزالة وسوم HTML)، نقيسه على النص كاملاً بالوسوم احتياطاً
+TELEGRAM_LIMIT = 4096
+
+# وسم HTML أو كيان (&amp;) أو نص عادي
+_TOKENS = re.compile(r"<[^>]*>|&#?\w+;|[^<&]+|[<&]")
+_TAG_NAME = re.compile(r"</?\s*([a-zA-Z0-9-]+)")
+
+
+def text_length(text: str) -> int:
+    """Message length as Telegram counts it (UTF-16 code units, so most emoji count twice)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _escape(values: np.ndarray) -> np.ndarray:
+    return np.array([html.escape(v, quote=False) for v in values], dtype=object)
+
+
+def _format_column(series: pd.Series, spec: str, conversion: Optional[str], na_rep: str) -> np.ndarray:
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(series).to_numpy()
+    if conversion == "r":
+        values = np.array([repr(v) for v in values], dtype=object)
+    elif conversion in ("s", "a"):
+        values = np.array([str(v) for v in values], dtype=object)
+    return np.array([na_rep if m else format(v, spec) for v, m in zip(values, missing)], dtype=object)
+
+
+def render(df: pd.DataFrame, template: str, na_rep: str = "-", escape: bool = True) -> pd.Series:
+    """
+    Format every row of a DataFrame with a str.format-style template
+
+    The template is parsed once and each field is formatted column by
+    column, so no per-row string concatenation takes place.
+
+    Args:
+        df: Rows to render
+        template: e.g. "🏢 <b>{Company}</b> ({Symbol})\\n📊 ROE: {ROE:.2f}%\\n"
+            (field names are column names and may contain spaces)
+        na_rep: Text used for missing values
+        escape: HTML-escape the values (the template itself is kept as is)
+
+    Returns:
+        pd.Series: one rendered string per row, aligned to df
+    """
+    out = np.full(len(df), "", dtype=object)
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if literal:
+            out = out + literal
+        if field is None:
+            continue
+        if field not in df:
+            raise KeyError(f"العمود غير موجود في البيانات: {field}")
+        values = _format_column(df[field], spec or "", conversion, na_rep)
+        out = out + (_escape(values) if escape else values)
+    return pd.Series(out, index=df.index, dtype=object)
+
+
+def render_groups(
+    df: pd.DataFrame,
+    by: str,
+    row_template: str,
+    group_header: str = "",
+    group_footer: str = "",
+    na_rep: str = "-",
+    escape: bool = True
+) -> pd.Series:
+    """
+    Render one block per group: a header, the group's rows and a footer
+
+    Header and footer templates are filled from the group's first row.
+    Groups keep their order of first appearance.
+
+    Returns:
+        pd.Series: group key -> rendered block
+    """
+    if df.empty:
+        return pd.Series(dtype=object)
+    keys = df[by].to_numpy()
+    rows = render(df, row_template, na_rep, escape).groupby(keys, sort=False).agg("".join)
+    first = df.groupby(by, sort=False).head(1)
+    head = render(first, group_header, na_rep, escape).to_numpy()
+    tail = render(first, group_footer, na_rep, escape).to_numpy()
+    return pd.Series(head + rows.to_numpy() + tail, index=rows.index, dtype=object)
+
+
+def _tag(token: str):
+    # يعيد (اسم الوسم، هل هو وسم إغلاق) أو None للنص
+    if not token.startswith("<") or not token.endswith(">"):
+        return None
+    match = _TAG_NAME.match(token)
+    if match is None:
+        return None
+    return match.group(1).lower(), token.startswith("</")
+
+
+def _split_html(text: str, limit: int) -> List[str]:
+    """Split one oversized block into pieces that keep every tag balanced"""
+    pieces: List[str] = []
+    current, stack = "", []
+
+    def closing() -> str:
+        return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+    def flush() -> None:
+        nonlocal current
+        pieces.append(current + closing())
+        # نعيد فتح الوسوم المفتوحة في بداية الجزء التالي
+        current = "".join(opening for _, opening in stack)
+
+    for token in _TOKENS.findall(text):
+        tag = _tag(token)
+        budget = limit - text_length(current) - text_length(closing())
+        if tag is not None and not tag[1]:
+            budget -= len(f"</{tag[0]}>")
+        if text_length(token) <= budget:
+            current += token
+        elif tag is not None or token.startswith("&"):
+            # الوسم أو الكيان لا يُقسم أبداً
+            flush()
+            current += token
+        else:
+            # نص طويل: نقسمه، ونفضل القطع عند سطر جديد
+            while token:
+                budget = limit - text_length(current) - text_length(closing())
+                if text_length(token) <= budget:
+                    current += token
+                    break
+                cut = budget
+                while cut > 0 and text_length(token[:cut]) > budget:
+                    cut -= 1
+                newline = token.rfind("\n", 0, cut)
+                if newline > 0:
+                    cut = newline + 1
+                if cut <= 0:
+                    flush()
+                    continue
+                current += token[:cut]
+                token = token[cut:]
+                flush()
+
+        if tag is not None:
+            name, is_closing = tag
+            if is_closing:
+                for i in range(len(stack) - 1, -1, -1):
+                    if stack[i][0] == name:
+                        del stack[i]
+                        break
+            elif not token.endswith("/>"):
+                stack.append((name, token))
+
+    if current.strip():
+        pieces.append(current + closing())
+    return pieces
+
+
+def pack(blocks: Iterable[str], header: str = "", footer: str = "", limit: int = TELEGRAM_LIMIT) -> List[str]:
+    """
+    Pack rendered blocks greedily into the fewest messages within the limit
+
+    Blocks are never split between messages unless a single block is
+    longer than the limit on its own; it is then split at line breaks with
+    its HTML tags closed and reopened. The header starts the first message
+    and the footer ends the last one.
+
+    Returns:
+        list: message texts
+    """
+    parts = [header] if header else []
+    parts.extend(blocks)
+    if footer:
+        parts.append(footer)
+
+    messages: List[str] = []
+    current: List[str] = []
+    used = 0
+    for part in parts:
+        size = text_length(part)
+        if size > limit:
+            if current:
+                messages.append("".join(current))
+                current, used = [], 0
+            pieces = _split_html(part, limit)
+            messages.extend(pieces[:-1])
+            part, size = pieces[-1], text_length(pieces[-1])
+        if used + size > limit and current:
+            messages.append("".join(current))
+            current, used = [], 0
+        current.append(part)
+        used += size
+    if current:
+        messages.append("".join(current))
+    return messages
+
+
+def build_report(
+    df: pd.DataFrame,
+    template: str,
+    header: str = "",
+    footer: str = "",
+    limit: int = TELEGRAM_LIMIT,
+    na_rep: str = "-"
+) -> List[str]:
+    """
+    Render one block per row and pack them into Telegram messages
+
+    Returns:
+        list: message texts, each at most `limit` characters
+    """
+    return pack(render(df, template, na_rep), header, footer, limit)
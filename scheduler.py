@@ -0,0 +1,606 @@
+# scheduler.py
+"""
+Headless job runner: runs the app's scans and screens on cron schedules
+and pushes the reports to Telegram, without a browser session.
+
+Usage:
+    python scheduler.py --config scheduler.json             # run until stopped
+    python scheduler.py --config scheduler.json --list      # show the next run of every job
+    python scheduler.py --config scheduler.json --once NAME # run one job now
+    python scheduler.py --config scheduler.json --once NAME --dry-run
+    python scheduler.py --config scheduler.json --metrics-port 9465  # also serve /metrics
+
+See scheduler.example.json for the configuration format.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytz
+
+import quota
+from storage import connect
+
+DB_NAME = "scheduler.sqlite"
+DEFAULT_TIMEZONE = "America/New_York"
+
+# أقصى مدة نوم بين فحصين للجدول، حتى تُلتقط تغييرات الساعة والتوقيت الصيفي
+MAX_SLEEP = 30.0
+# مدة انتظار تسليم الرسائل عند التشغيل لمرة واحدة
+DELIVERY_TIMEOUT = 600.0
+
+# متغيرات البيئة الافتراضية لمفاتيح المزودين
+API_KEY_ENV = {
+    "alpha_vantage": "ALPHA_VANTAGE_API_KEY",
+    "finnhub": "FINNHUB_API_KEY",
+}
+
+# المهام التي تستهلك حصة يومية: نوع المهمة (أو هدف اللقطة) -> (المزود، نقطة النهاية المخزنة في fundamentals_cache)
+QUOTA_ENDPOINTS = {
+    "roe_screen": ("alpha_vantage", "OVERVIEW"),
+    "fcf_screen": ("alpha_vantage", "CASH_FLOW"),
+    "roe_overview": ("alpha_vantage", "OVERVIEW"),
+}
+# مهلة إضافية بعد تجدد الحصة قبل إعادة تشغيل مهمة مؤجلة
+DEFER_MARGIN = timedelta(minutes=5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    batch_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS job_runs_job ON job_runs (job, id);
+"""
+
+logger = logging.getLogger("scheduler")
+
+
+class ConfigError(ValueError):
+    """Raised for an invalid scheduler configuration"""
+
+
+# --- تعابير cron ---
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# (أصغر قيمة، أكبر قيمة) لكل حقل: الدقيقة، الساعة، يوم الشهر، الشهر، يوم الأسبوع (0 = الأحد)
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(","):
+        body, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if body == "*":
+            start, end = low, high
+        elif "-" in body:
+            start, end = (int(v) for v in body.split("-", 1))
+        else:
+            start = int(body)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ConfigError(f"قيمة غير صالحة في تعبير cron: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Minimal five-field cron expression (minute hour day month weekday)
+
+    Supports *, lists, ranges, steps and the @hourly/@daily/@weekly/@monthly
+    aliases. As in cron, when both day fields are restricted a time matches
+    if either of them does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ConfigError(f"تعبير cron يجب أن يحتوي على 5 حقول: {expression}")
+        try:
+            parsed = [_parse_field(text, low, high) for text, (low, high) in zip(fields, CRON_FIELDS)]
+        except ValueError as e:
+            raise ConfigError(f"تعبير cron غير صالح: {expression} ({e})")
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        if dt.month not in self.months:
+            return False
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def matches(self, dt: datetime) -> bool:
+        return self._day_matches(dt) and dt.hour in self.hours and dt.minute in self.minutes
+
+    def next_after(self, dt: datetime) -> datetime:
+        """First matching minute strictly after dt (wall-clock time)"""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ConfigError(f"تعبير cron لا يتحقق أبداً: {self.expression}")
+
+
+# --- الإعدادات ---
+def load_config(path: str) -> dict:
+    """Read and validate a scheduler configuration file"""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    config.setdefault("timezone", DEFAULT_TIMEZONE)
+    config.setdefault("universes", {})
+    names = set()
+    for job in config.get("jobs", []):
+        if not job.get("name") or job["name"] in names:
+            raise ConfigError(f"كل مهمة تحتاج اسماً فريداً: {job}")
+        if job.get("type") not in JOBS:
+            raise ConfigError(f"نوع مهمة غير معروف: {job.get('type')} (المتاح: {', '.join(JOBS)})")
+        CronSchedule(job.get("schedule", ""))
+        names.add(job["name"])
+    return config
+
+
+def resolve_universe(config: dict, universe) -> List[str]:
+    """
+    Symbols of a universe: a list, the name of a universe in the config,
+    or {"file": path, "column": "symbol"} for a CSV watch list
+    """
+    if isinstance(universe, str):
+        if universe not in config["universes"]:
+            raise ConfigError(f"قائمة رموز غير معروفة: {universe}")
+        universe = config["universes"][universe]
+    if isinstance(universe, dict):
+        import pandas as pd
+
+        column = universe.get("column", "symbol")
+        symbols = pd.read_csv(universe["file"], usecols=[column])[column].dropna().astype(str)
+        universe = symbols.str.strip().tolist()
+    return list(dict.fromkeys(s for s in universe if s))
+
+
+def api_key(config: dict, provider: str) -> str:
+    """API key of a provider from the config, or from its environment variable"""
+    key = config.get("api_keys", {}).get(provider) or os.getenv(API_KEY_ENV.get(provider, ""), "")
+    if not key:
+        raise ConfigError(f"مفتاح {provider} غير موجود (متغير البيئة {API_KEY_ENV.get(provider)})")
+    return key
+
+
+# --- المهام: كل مهمة تعيد رسائل Telegram جاهزة للإرسال ---
+def _stamp(config: dict) -> str:
+    return datetime.now(pytz.timezone(config["timezone"])).strftime("%Y-%m-%d %H:%M")
+
+
+def job_top_gainers(config: dict, job: dict) -> List[str]:
+    """Biggest daily gainers of a universe"""
+    from batch_quotes import download_histories, summarize_changes
+    from report_builder import build_report
+
+    params = job.get("params", {})
+    frames = download_histories(resolve_universe(config, job["universe"]), period=params.get("period", "5d"))
+    gainers = summarize_changes(frames).head(params.get("top", 10))
+    if gainers.empty:
+        return []
+    return build_report(
+        gainers,
+        "🔹 <b>{Symbol}</b>: {% Change:+.2f}%\n"
+        "     💲 الإغلاق: {Last Close:,.2f} | 📦 الحجم: {Volume:,.0f}\n",
+        header=f"📈 <b>الأسهم الأكثر ارتفاعاً ({job['name']})</b>\n\n",
+        footer=f"\n⏰ التوقيت: {_stamp(config)}"
+    )
+
+
+def job_strength_scan(config: dict, job: dict) -> List[str]:
+    """
+    OBV/MFI strength scan (as in the Bigbov page) over a universe
+
+    Indicator state is kept between runs (see streaming_indicators): symbols
+    seen by a recent run only download params.update_period ("5d") and
+    advance their state by the new bars; the others download params.period.
+    """
+    import streaming_indicators
+    from batch_quotes import download_histories
+    from panel import STRONG
+    from price_store import period_start
+    from report_builder import build_report
+
+    params = job.get("params", {})
+    symbols = resolve_universe(config, job["universe"])
+    min_bars = params.get("min_bars", 21)
+    update_period = params.get("update_period", "5d")
+    warm = streaming_indicators.warm_symbols(symbols, "yahoo", period_start(update_period), min_bars=min_bars)
+    frames = download_histories([s for s in symbols if s not in warm], period=params.get("period", "3mo"))
+    frames.update(download_histories([s for s in symbols if s in warm], period=update_period))
+    result = streaming_indicators.classify_strength(frames, "yahoo", min_bars=min_bars)
+    result = result[result["Strength"].isin(params.get("strengths", [STRONG]))]
+    if result.empty:
+        return []
+    return build_report(
+        result.sort_values("Daily_Return", ascending=False),
+        "🔹 <b>{Symbol}</b> - {Strength}\n"
+        "     💲 {Close:,.2f} ({Daily_Return:+.2f}%) | MFI: {MFI:.1f}\n",
+        header=f"💪 <b>فحص قوة الأسهم ({job['name']})</b>\n\n",
+        footer=f"\n⏰ التوقيت: {_stamp(config)}"
+    )
+
+
+def job_roe_screen(config: dict, job: dict) -> List[str]:
+    """ROE screen (as in the ROE pages)"""
+    from fundamentals import fetch_roe_for_symbols
+    from report_builder import build_report
+    from screening import run_screen
+
+    params = job.get("params", {})
+    df, errors = fetch_roe_for_symbols(resolve_universe(config, job["universe"]), api_key(config, "alpha_vantage"))
+    for error in errors.values():
+        logger.warning("%s: %s", job["name"], error)
+    df = run_screen(df, params.get("screen", {"where": [{"column": "ROE", "op": ">=", "value": 15}]}))
+    if df.empty:
+        return []
+    return build_report(
+        df,
+        "🏢 <b>{Company}</b> ({Symbol})\n"
+        "📊 ROE: {ROE:.2f}%\n"
+        "🏛 القطاع: {Sector}\n"
+        "💰 القيمة السوقية: {MarketCap:,.0f}\n"
+        "────────────────────\n",
+        header=f"📊 <b>نتائج تحليل ROE</b>\n\n<b>الشركات التي تطابق المعايير ({len(df)}):</b>\n\n",
+        footer=f"\n🔄 آخر تحديث: {_stamp(config)}",
+        na_rep="Unknown"
+    )
+
+
+def job_fcf_screen(config: dict, job: dict) -> List[str]:
+    """Free cash flow report (as in the FCF page)"""
+    from fundamentals import fetch_av_cash_flow
+    from report_builder import pack, render_groups
+
+    fcf_df, errors = fetch_av_cash_flow(resolve_universe(config, job["universe"]), api_key(config, "alpha_vantage"))
+    for error in errors.values():
+        logger.warning("%s: %s", job["name"], error)
+    if fcf_df.empty:
+        return []
+    blocks = render_groups(
+        fcf_df.assign(fcf_m=(fcf_df["freeCashFlow"] / 1e6).round(2)),
+        "symbol",
+        "- {fiscalDateEnding}: ${fcf_m}M\n",
+        group_header="📊 <b>{symbol}</b>\n",
+        group_footer="───────────────\n"
+    )
+    return pack(
+        blocks,
+        header="💰 <b>تحليل التدفق النقدي الحر (FCF)</b>\n\n",
+        footer=f"\n⏰ التوقيت: {_stamp(config)}"
+    )
+
+
+def job_margins_screen(config: dict, job: dict) -> List[str]:
+    """Margins and growth report (as in the margins page), optionally screened"""
+    from fundamentals import fetch_margins_for_symbols
+    from report_builder import build_report
+    from screening import run_screen
+
+    params = job.get("params", {})
+    df, errors = fetch_margins_for_symbols(resolve_universe(config, job["universe"]), api_key(config, "finnhub"))
+    for error in errors.values():
+        logger.warning("%s: %s", job["name"], error)
+    if "screen" in params:
+        df = run_screen(df, params["screen"])
+    if df.empty:
+        return []
+    return build_report(
+        df,
+        "📈 <b>{Symbol}</b>\n"
+        "🔹 Operating Margin: {Operating Margin (%)}%\n"
+        "🔹 Net Profit Margin: {Net Profit Margin (%)}%\n"
+        "🔹 Revenue Growth: {Revenue Growth (%)}%\n"
+        "🔗 {Finnhub Link}\n"
+        "───────────────\n",
+        header="📊 <b>تقرير الهوامش والنمو</b>\n\n",
+        footer=f"\n⏰ التوقيت: {_stamp(config)}",
+        na_rep="None"
+    )
+
+
+# آخر تعديل معالج لكل ملف مراقب، حتى لا يُعاد إرسال الملف نفسه
+_watched_mtimes: Dict[str, float] = {}
+
+
+def job_upload_screen(config: dict, job: dict) -> List[str]:
+    """Good-companies screen (as in the upload page) over a watched companies file, when it changes"""
+    from report_builder import build_report
+    from screening import screen_mask
+    from upload_ingest import GOOD_COMPANIES, ingest_companies
+
+    params = job.get("params", {})
+    path = params["path"]
+    mtime = os.path.getmtime(path)
+    if _watched_mtimes.get(path) == mtime and not params.get("always", False):
+        logger.info("%s: %s لم يتغير", job["name"], path)
+        return []
+
+    spec = params.get("screen", GOOD_COMPANIES)
+    with open(path, "rb") as f:
+        filtered, scanned = ingest_companies(f, path, row_filter=lambda df: screen_mask(df, spec))
+    _watched_mtimes[path] = mtime
+    logger.info("%s: %d من %d سطر", job["name"], len(filtered), scanned)
+    if filtered.empty:
+        return []
+    return build_report(
+        filtered,
+        "🔹 {symbol} - {companyName}\n"
+        "     💲 السعر: {price:,.2f}\n"
+        "     💰 التوزيع: {lastAnnualDividend:,.2f}\n\n",
+        header=f"📊 الشركات الجيدة حسب التحليل ({len(filtered)}):\n\n",
+        footer="📡 تم الإرسال من النظام."
+    )
+
+
+def job_snapshot(config: dict, job: dict) -> List[str]:
+    """
+    Recompute a result table the pages read (see snapshot_producers)
+
+    params.target: "us_market_gainers", "gainers_strength" (params.markets)
+    or "roe_overview" (job universe). Nothing is sent to Telegram.
+    """
+    import snapshot_producers
+
+    params = job.get("params", {})
+    target = params.get("target")
+    if target == "us_market_gainers":
+        rows = len(snapshot_producers.refresh_us_market_gainers(api_key(config, "alpha_vantage")))
+    elif target == "gainers_strength":
+        rows = sum(len(snapshot_producers.refresh_gainers_strength(m)) for m in params.get("markets", ["NASDAQ"]))
+    elif target == "roe_overview":
+        symbols = resolve_universe(config, job["universe"])
+        df, errors = snapshot_producers.refresh_roe_overview(symbols, api_key(config, "alpha_vantage"))
+        for error in errors.values():
+            logger.warning("%s: %s", job["name"], error)
+        rows = len(df)
+    else:
+        raise ConfigError(f"لقطة غير معروفة: {target}")
+    logger.info("%s: تم حفظ لقطة %s (%d سطر)", job["name"], target, rows)
+    return []
+
+
+JOBS: Dict[str, Callable[[dict, dict], List[str]]] = {
+    "top_gainers": job_top_gainers,
+    "strength_scan": job_strength_scan,
+    "roe_screen": job_roe_screen,
+    "fcf_screen": job_fcf_screen,
+    "margins_screen": job_margins_screen,
+    "upload_screen": job_upload_screen,
+    "snapshot": job_snapshot,
+}
+
+
+def planned_calls(config: dict, job: dict) -> Optional[Tuple[str, int]]:
+    """
+    Provider requests a job will bill to a daily quota
+
+    Symbols whose fundamentals are still cached cost nothing.
+
+    Returns:
+        tuple: (provider, calls), or None if the job uses no daily quota
+    """
+    kind = job.get("params", {}).get("target") if job["type"] == "snapshot" else job["type"]
+    if kind == "us_market_gainers":
+        return "alpha_vantage", 1
+    if kind not in QUOTA_ENDPOINTS:
+        return None
+    import fundamentals_cache
+
+    provider, endpoint = QUOTA_ENDPOINTS[kind]
+    return provider, len(fundamentals_cache.missing(provider, endpoint, resolve_universe(config, job["universe"])))
+
+
+def check_quota(config: dict, job: dict) -> None:
+    """
+    Refuse a job whose requests do not fit the daily quota left to batch jobs
+
+    Raises:
+        quota.QuotaExceeded: If the job should be deferred
+    """
+    planned = planned_calls(config, job)
+    if planned is not None and planned[1]:
+        provider, calls = planned
+        quota.require(provider, api_key(config, provider), calls, quota.BATCH)
+
+
+# --- سجل التشغيل ---
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def last_run(job: Optional[str] = None) -> Optional[dict]:
+    """Latest finished run of a job (or of any job), or None if nothing ran yet"""
+    query = "SELECT job, started_at, finished_at, status, messages, batch_id, error FROM job_runs WHERE finished_at IS NOT NULL"
+    args: tuple = ()
+    if job is not None:
+        query += " AND job=?"
+        args = (job,)
+    with closing(_db()) as conn:
+        row = conn.execute(query + " ORDER BY id DESC LIMIT 1", args).fetchone()
+    if row is None:
+        return None
+    return dict(zip(["job", "started_at", "finished_at", "status", "messages", "batch_id", "error"], row))
+
+
+def run_job(config: dict, job: dict, dry_run: bool = False) -> Optional[str]:
+    """
+    Run one job and enqueue its report to Telegram
+
+    Jobs run at batch priority (see quota.py). A job that would not fit in
+    the daily quota left to batch jobs is not started and is recorded as
+    "deferred".
+
+    Returns:
+        str: Telegram batch id, or None if nothing was sent
+    """
+    with closing(_db()) as conn, conn:
+        run_id = conn.execute(
+            "INSERT INTO job_runs (job, started_at, status) VALUES (?, ?, 'running')",
+            (job["name"], time.time())
+        ).lastrowid
+
+    batch_id, messages, status, error = None, [], "ok", None
+    try:
+        with quota.priority(quota.BATCH):
+            check_quota(config, job)
+            messages = JOBS[job["type"]](config, job)
+        if dry_run:
+            for message in messages:
+                print(message, end="\n\n")
+        elif messages:
+            from telegram_sender import TelegramSender
+
+            batch_id = TelegramSender().enqueue(messages)
+            if batch_id is None:
+                raise ConfigError("إعدادات Telegram غير موجودة (TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID)")
+        logger.info("%s: %d رسالة", job["name"], len(messages))
+    except quota.QuotaExceeded as e:
+        status, error = "deferred", str(e)
+        logger.warning("%s: تأجيل المهمة: %s", job["name"], e)
+    except Exception as e:
+        status, error = "error", str(e)
+        logger.exception("%s: فشلت المهمة", job["name"])
+
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "UPDATE job_runs SET finished_at=?, status=?, messages=?, batch_id=?, error=? WHERE id=?",
+            (time.time(), status, len(messages), batch_id, error, run_id)
+        )
+    return batch_id
+
+
+def _wall_clock(config: dict) -> datetime:
+    # نعمل بالتوقيت المحلي للسوق دون منطقة زمنية، كما يفعل cron
+    return datetime.now(pytz.timezone(config["timezone"])).replace(tzinfo=None)
+
+
+def run_forever(config: dict, dry_run: bool = False) -> None:
+    """Run every configured job on its schedule until interrupted"""
+    jobs = config.get("jobs", [])
+    schedules = {job["name"]: CronSchedule(job["schedule"]) for job in jobs}
+    now = _wall_clock(config)
+    due = {name: schedule.next_after(now) for name, schedule in schedules.items()}
+    logger.info("بدء الجدولة: %d مهمة", len(jobs))
+
+    while True:
+        now = _wall_clock(config)
+        for job in jobs:
+            if due[job["name"]] <= now:
+                # المهام تعمل بالتتابع حتى لا تتنافس على حدود المزودين نفسها
+                run_job(config, job, dry_run)
+                due[job["name"]] = schedules[job["name"]].next_after(_wall_clock(config))
+                if last_run(job["name"])["status"] == "deferred":
+                    # المهمة المؤجلة تُعاد بعد تجدد الحصة ما لم يحن موعدها التالي قبل ذلك
+                    retry = _wall_clock(config) + timedelta(seconds=quota.seconds_until_reset()) + DEFER_MARGIN
+                    due[job["name"]] = min(due[job["name"]], retry)
+        wait = min(due.values(), default=now + timedelta(seconds=MAX_SLEEP)) - _wall_clock(config)
+        time.sleep(min(max(wait.total_seconds(), 1.0), MAX_SLEEP))
+
+
+def _wait_for_delivery(batch_id: str) -> None:
+    from telegram_queue import batch_status
+
+    deadline = time.monotonic() + DELIVERY_TIMEOUT
+    while time.monotonic() < deadline:
+        status = batch_status(batch_id)
+        if not (status["pending"] or status["sending"]):
+            logger.info("تم إرسال %d من %d رسالة", status["sent"], status["total"])
+            return
+        time.sleep(1)
+    logger.warning("انتهت مهلة انتظار الإرسال؛ الرسائل المتبقية في صندوق الإرسال")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="تشغيل مهام الفحص المجدولة وإرسال النتائج إلى Telegram")
+    parser.add_argument("--config", default="scheduler.json", help="ملف إعدادات المهام (JSON)")
+    parser.add_argument("--once", metavar="JOB", help="تشغيل مهمة واحدة الآن ثم الخروج")
+    parser.add_argument("--list", action="store_true", help="عرض المهام وموعد تشغيلها التالي")
+    parser.add_argument("--dry-run", action="store_true", help="طباعة الرسائل بدلاً من إرسالها")
+    parser.add_argument("--metrics-port", type=int, help="منفذ مقاييس Prometheus لهذه العملية (/metrics)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        logger.error("تعذر تحميل الإعدادات: %s", e)
+        return 2
+
+    if args.list:
+        now = _wall_clock(config)
+        for job in config.get("jobs", []):
+            print(f"{job['name']:<24} {job['type']:<16} {job['schedule']:<20} {CronSchedule(job['schedule']).next_after(now)}")
+        return 0
+
+    if not args.dry_run:
+        # رسائل تركها تشغيل سابق في صندوق الإرسال
+        from telegram_queue import resume
+        pending = resume()
+        if pending:
+            logger.info("استئناف إرسال %d رسالة من صندوق الإرسال", pending)
+
+    if args.once:
+        job = next((j for j in config.get("jobs", []) if j["name"] == args.once), None)
+        if job is None:
+            logger.error("مهمة غير معروفة: %s", args.once)
+            return 2
+        batch_id = run_job(config, job, args.dry_run)
+        if batch_id:
+            _wait_for_delivery(batch_id)
+        return 0 if last_run(job["name"])["status"] == "ok" else 1
+
+    if args.metrics_port:
+        import metrics
+        metrics.start_server(args.metrics_port)
+
+    try:
+        run_forever(config, args.dry_run)
+    except KeyboardInterrupt:
+        logger.info("تم إيقاف الجدولة")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# screening.py
+import json
+import operator
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# الشاشة (screen) مواصفة قابلة للحفظ بصيغة JSON:
+# {
+#     "name": "good_companies",
+#     "where": [
+#         {"column": "marketCap", "op": ">", "value": 1_000_000_000},
+#         {"column": "price", "op": "between", "value": [5, 50]},
+#         {"column": "Sector", "op": "in", "value": ["Technology", "Energy"]},
+#         {"column": "isEtf", "op": "==", "value": False},
+#     ],
+#     "top": {"column": "ROE", "k": 10, "ascending": False},
+# }
+# جميع الشروط مجتمعة بـ AND، والقيم المفقودة لا تحقق أي شرط (عدا !=)
+
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+OPERATORS = set(COMPARISONS) | {"between", "in"}
+
+MAX_COMPILED = 256
+
+Predicate = Callable[["_Columns"], np.ndarray]
+
+
+class ScreenError(ValueError):
+    """Raised for an invalid screen spec"""
+
+
+class _Columns:
+    """Column arrays of one universe table, converted once and shared by every predicate and screen"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def numeric(self, column: str) -> np.ndarray:
+        if column not in self._numeric:
+            if column not in self.df:
+                values = np.full(len(self.df), np.nan)
+            else:
+                series = self.df[column]
+                if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                    values = series.to_numpy(dtype="float64", na_value=np.nan)
+                else:
+                    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            self._numeric[column] = values
+        return self._numeric[column]
+
+    def isin(self, column: str, members: list) -> np.ndarray:
+        # نرمّز العمود مرة واحدة، فيصبح كل شرط عضوية مقارنة أعداد صحيحة
+        if column not in self._codes:
+            self._codes[column] = pd.factorize(self.raw(column))
+        codes, uniques = self._codes[column]
+        # جدول بحث بطول القيم المميزة؛ الرمز -1 (قيمة مفقودة) يقع على العنصر الأخير False
+        lookup = np.zeros(len(uniques) + 1, dtype=bool)
+        lookup[:-1] = pd.Index(uniques).isin(members)
+        return lookup[codes]
+
+    def raw(self, column: str) -> pd.Series:
+        if column not in self.df:
+            return pd.Series(pd.NA, index=self.df.index, dtype="object")
+        return self.df[column]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (bool, int, float, np.number))
+
+
+def _compile_predicate(condition: dict) -> Predicate:
+    column, op, value = condition.get("column"), condition.get("op"), condition.get("value")
+    if not column or op not in OPERATORS:
+        raise ScreenError(f"شرط غير صالح: {condition}")
+
+    if op == "between":
+        low, high = value
+        low = -np.inf if low is None else float(low)
+        high = np.inf if high is None else float(high)
+        return lambda cols: (cols.numeric(column) >= low) & (cols.numeric(column) <= high)
+
+    if op == "in":
+        members = list(value)
+        return lambda cols: cols.isin(column, members)
+
+    if _is_number(value):
+        number, compare = float(value), COMPARISONS[op]
+        return lambda cols: compare(cols.numeric(column), number)
+
+    if op in ("==", "!="):
+        negate = op == "!="
+        # القيم المفقودة لا تساوي أي قيمة
+        return lambda cols: ~cols.isin(column, [value]) if negate else cols.isin(column, [value])
+
+    compare = COMPARISONS[op]
+
+    def text_predicate(cols: _Columns) -> np.ndarray:
+        series = cols.raw(column)
+        return np.asarray(compare(series, value).fillna(False), dtype=bool) & series.notna().to_numpy()
+    return text_predicate
+
+
+class CompiledScreen:
+    """A screen spec compiled to a list of vectorized predicates"""
+
+    def __init__(self, spec: dict):
+        unknown = set(spec) - {"name", "where", "top"}
+        if unknown:
+            raise ScreenError(f"مفاتيح غير معروفة في الشاشة: {sorted(unknown)}")
+        self.name = spec.get("name", "")
+        self.predicates: List[Predicate] = [_compile_predicate(c) for c in spec.get("where", [])]
+        self.top: Optional[dict] = spec.get("top")
+        if self.top is not None and (not self.top.get("column") or int(self.top.get("k", 0)) < 0):
+            raise ScreenError(f"إعداد top غير صالح: {self.top}")
+
+    def mask(self, df, _columns: Optional[_Columns] = None) -> np.ndarray:
+        """Boolean mask of the rows that pass every condition (ignores top)"""
+        columns = _columns or _Columns(df)
+        mask = np.ones(len(columns), dtype=bool)
+        for predicate in self.predicates:
+            mask &= predicate(columns)
+        return mask
+
+    def apply(self, df: pd.DataFrame, _columns: Optional[_Columns] = None) -> pd.DataFrame:
+        """Return the matching rows in their original order, or the top-k rows if the screen has a top"""
+        columns = _columns or _Columns(df)
+        positions = np.flatnonzero(self.mask(df, columns))
+        if self.top is not None:
+            values = columns.numeric(self.top["column"])[positions]
+            keys = values if self.top.get("ascending", False) else -values
+            k = int(self.top["k"])
+            if k < len(keys):
+                # نختار أفضل k دون ترتيب الجدول كاملاً
+                candidates = np.sort(np.argpartition(keys, k)[:k])
+                positions, keys = positions[candidates], keys[candidates]
+            # ترتيب مستقر، والقيم المفقودة في النهاية كما في sort_values
+            positions = positions[np.argsort(keys, kind="stable")]
+        return df.iloc[positions]
+
+
+_compiled: "OrderedDict[str, CompiledScreen]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def spec_key(spec: dict) -> str:
+    """Canonical JSON form of a spec, used as its cache key"""
+    return json.dumps(spec, sort_keys=True, default=str)
+
+
+def compile_screen(spec: dict) -> CompiledScreen:
+    """Compile a screen spec, reusing the cached compilation of an identical spec"""
+    key = spec_key(spec)
+    with _compiled_lock:
+        screen = _compiled.get(key)
+        if screen is not None:
+            _compiled.move_to_end(key)
+            return screen
+
+    screen = CompiledScreen(spec)
+    with _compiled_lock:
+        _compiled[key] = screen
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return screen
+
+
+def screen_mask(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """Boolean Series (aligned to df) of the rows that pass a screen's conditions"""
+    return pd.Series(compile_screen(spec).mask(df), index=df.index)
+
+
+def run_screen(df: pd.DataFrame, spec: dict) -> pd.DataFrame:
+    """Evaluate one screen over a universe table"""
+    return compile_screen(spec).apply(df)
+
+
+def run_screens(df: pd.DataFrame, specs: Iterable[dict]) -> Dict[str, pd.DataFrame]:
+    """
+    Evaluate many screens over the same universe table
+
+    Each column is converted to a NumPy array once and shared by all
+    screens, so adding a screen costs only its own comparisons.
+
+    Returns:
+        dict: screen name (or its position if unnamed) -> matching rows
+    """
+    columns = _Columns(df)
+    return {
+        spec.get("name") or str(i): compile_screen(spec).apply(df, columns)
+        for i, spec in enumerate(specs)
+    }
@@ -0,0 +1,85 @@
+# snapshot_producers.py
+from typing import Dict, Iterable, Tuple
+
+import pandas as pd
+
+import http_client
+from snapshot_store import write_snapshot
+from yahoo_scraper import fetch_table
+
+# أسماء اللقطات التي تقرؤها الصفحات
+US_MARKET_GAINERS = "us_market_gainers"
+ROE_OVERVIEW = "roe_overview"
+
+YAHOO_GAINERS_PATHS = {
+    "NASDAQ": "/gainers?offset=0&count=100",
+    "NYSE": "/gainers?e=nyse&offset=0&count=100",
+    "Tadawul": "/quote/.TASI/components/",
+}
+
+
+def gainers_strength_name(market: str) -> str:
+    return f"gainers_strength_{market.lower()}"
+
+
+def fetch_us_market_gainers(api_key: str) -> pd.DataFrame:
+    """Alpha Vantage top gainers as a typed table"""
+    url = f"{http_client.base_url('alpha_vantage')}/query?function=TOP_GAINERS_LOSERS&apikey={api_key}"
+    data = http_client.get_json(url, provider="alpha_vantage", api_key=api_key)
+    gainers = pd.DataFrame(data.get("top_gainers", []))
+    if gainers.empty:
+        raise ValueError(data.get("Note") or data.get("Information") or "لا توجد بيانات حالياً")
+    gainers["change_percentage"] = gainers["change_percentage"].str.replace('%', '').astype(float)
+    for col in ["price", "change_amount", "volume"]:
+        gainers[col] = pd.to_numeric(gainers[col], errors="coerce")
+    return gainers
+
+
+def fetch_yahoo_gainers(market: str) -> pd.DataFrame:
+    """Top gainers table of a market scraped from Yahoo Finance"""
+    gainers_df = fetch_table(http_client.base_url("yahoo") + YAHOO_GAINERS_PATHS[market])
+    gainers_df['Market'] = market
+    return gainers_df[['Symbol', 'Name', 'Price (Intraday)', '% Change', 'Volume', 'Market']]
+
+
+def compute_gainers_strength(market: str) -> pd.DataFrame:
+    """OBV/MFI strength of every top gainer of a market (see panel.classify_strength)"""
+    from batch_quotes import download_histories
+    from panel import classify_strength, to_panel
+
+    gainers_df = fetch_yahoo_gainers(market)
+    if gainers_df.empty:
+        return pd.DataFrame()
+    # تنزيل جميع الرموز في طلبات مجمعة وتقييمها دفعة واحدة
+    frames = download_histories(gainers_df['Symbol'])
+    signals = classify_strength(to_panel(frames), min_bars=21)
+    signals = signals.merge(
+        gainers_df[['Symbol', 'Name', '% Change']].drop_duplicates('Symbol'),
+        on='Symbol',
+        how='left'
+    )
+    signals['% Change'] = signals['% Change'].astype(str)
+    return signals
+
+
+# --- تحديث اللقطات: تحسب النتيجة مباشرة ثم تحفظها للصفحات الأخرى ---
+def refresh_us_market_gainers(api_key: str) -> pd.DataFrame:
+    gainers = fetch_us_market_gainers(api_key)
+    write_snapshot(US_MARKET_GAINERS, gainers)
+    return gainers
+
+
+def refresh_gainers_strength(market: str) -> pd.DataFrame:
+    signals = compute_gainers_strength(market)
+    if not signals.empty:
+        write_snapshot(gainers_strength_name(market), signals, {"market": market})
+    return signals
+
+
+def refresh_roe_overview(symbols: Iterable[str], api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    from fundamentals import fetch_roe_for_symbols
+
+    symbols = list(symbols)
+    df, errors = fetch_roe_for_symbols(symbols, api_key)
+    write_snapshot(ROE_OVERVIEW, df, {"symbols": symbols, "errors": errors})
+    return df, errors
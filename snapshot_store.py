@@ -0,0 +1,152 @@
+# snapshot_store.py
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+from storage import cache_path
+
+# عدد الإصدارات المحفوظة لكل لقطة (الأقدم يُحذف)
+KEEP_VERSIONS = 5
+LATEST_FILE = "latest.json"
+
+_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# اللقطات المقروءة في هذه العملية، حسب (الاسم، الإصدار)؛ الإصدار لا يتغير بعد كتابته
+_loaded: Dict[Tuple[str, str], pd.DataFrame] = {}
+_loaded_lock = threading.Lock()
+
+
+def _dir(name: str) -> Path:
+    if not _NAME.match(name):
+        raise ValueError(f"اسم لقطة غير صالح: {name}")
+    path = cache_path("snapshots") / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _replace(path: Path, write) -> None:
+    # نكتب في ملف مؤقت بجانب الهدف ثم نستبدله دفعة واحدة، فلا يرى القارئ ملفاً ناقصاً أبداً
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def write_snapshot(name: str, df: pd.DataFrame, meta: Optional[dict] = None) -> dict:
+    """
+    Store a new version of a result table and make it the latest
+
+    The table is written to its own Parquet file and the latest.json
+    pointer is then swapped atomically, so readers in other processes see
+    either the previous or the new version, never a partial one.
+
+    Args:
+        name: Snapshot name (letters, digits, _ . -)
+        df: Result table
+        meta: Optional JSON-serializable details (parameters, errors, ...)
+
+    Returns:
+        dict: The new version's info (see snapshot_info)
+    """
+    directory = _dir(name)
+    created_at = time.time()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(created_at)) + f"{created_at % 1:.6f}"[1:] + "Z"
+    file = f"{version}.parquet"
+    _replace(directory / file, lambda tmp: df.to_parquet(tmp, index=False))
+
+    info = {
+        "name": name,
+        "version": version,
+        "file": file,
+        "created_at": created_at,
+        "rows": len(df),
+        "meta": meta or {},
+    }
+    _replace(
+        directory / LATEST_FILE,
+        lambda tmp: tmp.write_text(json.dumps(info, ensure_ascii=False, default=str), encoding="utf-8")
+    )
+    _prune(directory)
+    return info
+
+
+def _prune(directory: Path) -> None:
+    versions = sorted(directory.glob("*.parquet"))
+    for old in versions[:-KEEP_VERSIONS]:
+        try:
+            old.unlink()
+        except OSError:
+            pass  # قد يكون قارئ في نظام Windows يفتح الملف؛ يُحذف في المرة القادمة
+
+
+def snapshot_info(name: str) -> Optional[dict]:
+    """Info of the latest version (version, created_at, rows, meta), or None if there is none"""
+    try:
+        return json.loads((_dir(name) / LATEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def list_versions(name: str) -> List[str]:
+    """Stored versions of a snapshot, oldest first"""
+    return [path.stem for path in sorted(_dir(name).glob("*.parquet"))]
+
+
+def read_snapshot(name: str, max_age: Optional[float] = None) -> Optional[Tuple[pd.DataFrame, dict]]:
+    """
+    Load the latest version of a snapshot
+
+    A version is read from disk once per process; later calls only read the
+    small latest.json pointer and return a copy of the cached table.
+
+    Args:
+        name: Snapshot name
+        max_age: Ignore a snapshot older than this many seconds
+
+    Returns:
+        tuple: (table, info), or None if there is no (fresh enough) snapshot
+    """
+    info = snapshot_info(name)
+    if info is None or (max_age is not None and time.time() - info["created_at"] > max_age):
+        metrics.cache_event("snapshots", "miss")
+        return None
+
+    key = (name, info["version"])
+    with _loaded_lock:
+        df = _loaded.get(key)
+    if df is None:
+        try:
+            df = pd.read_parquet(_dir(name) / info["file"])
+        except (OSError, ValueError):
+            metrics.cache_event("snapshots", "miss")
+            return None
+        with _loaded_lock:
+            # نحتفظ بآخر إصدار فقط لكل لقطة
+            for old in [k for k in _loaded if k[0] == name]:
+                del _loaded[old]
+            _loaded[key] = df
+    metrics.cache_event("snapshots", "hit")
+    return df.copy(), info
+
+
+def snapshot_age(info: dict) -> str:
+    """Human-readable age of a snapshot, e.g. "منذ 5 دقيقة" """
+    seconds = max(time.time() - info["created_at"], 0)
+    if seconds < 60:
+        return "منذ أقل من دقيقة"
+    if seconds < 3600:
+        return f"منذ {seconds // 60:.0f} دقيقة"
+    if seconds < 86400:
+        return f"منذ {seconds // 3600:.0f} ساعة"
+    return f"منذ {seconds // 86400:.0f} يوم"
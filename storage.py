@@ -0,0 +1,26 @@
+# storage.py
+import os
+import sqlite3
+from pathlib import Path
+
+# مجلد التخزين المحلي (يمكن تغييره عبر متغير البيئة APP_CACHE_DIR)
+CACHE_DIR = Path(os.getenv("APP_CACHE_DIR", ".cache"))
+
+
+def cache_path(name: str) -> Path:
+    """Return the path of a file inside the local cache directory, creating the directory if needed"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return CACHE_DIR / name
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database in the cache directory
+
+    A new connection is opened per call so the database can be shared by
+    Streamlit session threads and by separate worker processes. WAL mode lets
+    readers proceed while another process is writing.
+    """
+    conn = sqlite3.connect(cache_path(name), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
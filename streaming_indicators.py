@@ -0,0 +1,386 @@
+# streaming_indicators.py
+import json
+import math
+from collections import deque
+from contextlib import closing
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from panel import MFI_WINDOW, STRENGTH_COLUMNS, VOLUME_WINDOW, strength_labels
+from storage import connect
+
+DB_NAME = "indicators.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indicator_state (
+    symbol TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (symbol, provider, interval)
+);
+"""
+
+
+class RollingSum:
+    """
+    Sum of the last `window` values, updated in O(1) per value
+
+    Uses Kahan compensation like pandas' rolling sum so long-running sums
+    do not drift. Like pandas, the sum is NaN until the window is full or
+    while it contains a NaN.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self.total = 0.0
+        self.compensation = 0.0
+        self.nan_count = 0
+
+    def _add(self, value: float) -> None:
+        y = value - self.compensation
+        t = self.total + y
+        self.compensation = (t - self.total) - y
+        self.total = t
+
+    def push(self, value: float) -> float:
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self._add(-old)
+        self.values.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self._add(value)
+
+        if self.nan_count or len(self.values) < self.window:
+            return math.nan
+        return self.total
+
+    def to_dict(self) -> dict:
+        return {"window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RollingSum":
+        state = cls(data["window"])
+        for value in data["values"]:
+            state.push(value)
+        return state
+
+
+class OBVState:
+    """Running On-Balance Volume (see indicators.obv)"""
+
+    def __init__(self):
+        self.value: Optional[float] = None
+        self.prev_close: Optional[float] = None
+
+    def update(self, close: float, volume: float) -> float:
+        if self.value is None:
+            self.value = 0.0
+        elif close > self.prev_close:
+            self.value += volume
+        elif close < self.prev_close:
+            self.value -= volume
+        self.prev_close = close
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {"value": self.value, "prev_close": self.prev_close}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OBVState":
+        state = cls()
+        state.value, state.prev_close = data["value"], data["prev_close"]
+        return state
+
+
+class MFIState:
+    """
+    Running Money Flow Index (see indicators.mfi)
+
+    Holds the previous typical price and money flow plus ring buffers of
+    the positive and negative flows of the last `window` comparisons.
+    """
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.prev_tp: Optional[float] = None
+        self.prev_mf: Optional[float] = None
+        self.positive = RollingSum(window)
+        self.negative = RollingSum(window)
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        tp = (high + low + close) / 3
+        mf = tp * volume
+        result = math.nan
+        if self.prev_tp is not None:
+            pos = self.positive.push(self.prev_mf if tp > self.prev_tp else 0.0)
+            neg = self.negative.push(self.prev_mf if tp < self.prev_tp else 0.0)
+            if not (math.isnan(pos) or math.isnan(neg)):
+                if neg != 0:
+                    result = 100 - (100 / (1 + (pos / neg)))
+                elif pos != 0:
+                    result = 100.0
+        self.prev_tp, self.prev_mf = tp, mf
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "window": self.window,
+            "prev_tp": self.prev_tp,
+            "prev_mf": self.prev_mf,
+            "positive": self.positive.to_dict(),
+            "negative": self.negative.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MFIState":
+        state = cls(data["window"])
+        state.prev_tp, state.prev_mf = data["prev_tp"], data["prev_mf"]
+        state.positive = RollingSum.from_dict(data["positive"])
+        state.negative = RollingSum.from_dict(data["negative"])
+        return state
+
+
+class IndicatorState:
+    """
+    Incremental OBV, MFI, Avg_Volume and Daily_Return of one symbol
+
+    Each update() costs O(1) regardless of the history length. Bars at or
+    before the last processed timestamp are ignored, so replaying an
+    overlapping batch after a restart is safe.
+    """
+
+    def __init__(self, mfi_window: int = MFI_WINDOW, volume_window: int = VOLUME_WINDOW):
+        self.obv = OBVState()
+        self.mfi = MFIState(mfi_window)
+        self.volume = RollingSum(volume_window)
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.last: Dict[str, float] = {}
+        self.bars = 0
+
+    def update(self, ts, high: float, low: float, close: float, volume: float) -> Dict[str, float]:
+        """
+        Feed one bar and return the indicator values at that bar
+
+        Args:
+            ts: Bar time (anything pandas.Timestamp accepts)
+            high, low, close, volume: Bar values
+
+        Returns:
+            dict: OBV, MFI, Avg_Volume and Daily_Return at the bar
+        """
+        ts = pd.Timestamp(ts).value
+        if self.last_ts is not None and ts <= self.last_ts:
+            return self.last
+
+        prev_close = self.obv.prev_close
+        volume_sum = self.volume.push(volume)
+        self.last = {
+            "OBV": self.obv.update(close, volume),
+            "MFI": self.mfi.update(high, low, close, volume),
+            "Avg_Volume": volume_sum / self.volume.window,
+            "Daily_Return": (close / prev_close - 1) * 100 if prev_close is not None else math.nan,
+        }
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        self.bars += 1
+        return self.last
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Feed every new bar of an OHLCV DataFrame and return the indicators of those bars"""
+        rows = {}
+        for ts, high, low, close, volume in zip(df.index, df["High"], df["Low"], df["Close"], df["Volume"]):
+            if self.last_ts is None or pd.Timestamp(ts).value > self.last_ts:
+                rows[ts] = dict(self.update(ts, float(high), float(low), float(close), float(volume)))
+        return pd.DataFrame.from_dict(rows, orient="index", columns=["OBV", "MFI", "Avg_Volume", "Daily_Return"])
+
+    def to_dict(self) -> dict:
+        """JSON-serializable snapshot of the state (NaN is kept as Python's json NaN token)"""
+        return {
+            "obv": self.obv.to_dict(),
+            "mfi": self.mfi.to_dict(),
+            "volume": self.volume.to_dict(),
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "last": self.last,
+            "bars": self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndicatorState":
+        state = cls()
+        state.obv = OBVState.from_dict(data["obv"])
+        state.mfi = MFIState.from_dict(data["mfi"])
+        state.volume = RollingSum.from_dict(data["volume"])
+        state.first_ts = data.get("first_ts")
+        state.last_ts = data["last_ts"]
+        state.last = data["last"]
+        state.bars = data.get("bars", 0)
+        return state
+
+    def copy(self) -> "IndicatorState":
+        return IndicatorState.from_dict(self.to_dict())
+
+
+# --- حفظ الحالة بين تشغيلات التطبيق ---
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def load_states(symbols: Iterable[str], provider: str, interval: str = "1d") -> Dict[str, IndicatorState]:
+    """Load the saved indicator states of several series (symbols without a state are omitted)"""
+    symbols = list(symbols)
+    states = {}
+    with closing(_db()) as conn:
+        # دفعات أصغر من حد متغيرات SQLite
+        for i in range(0, len(symbols), 500):
+            chunk = symbols[i:i + 500]
+            rows = conn.execute(
+                f"SELECT symbol, payload FROM indicator_state WHERE provider=? AND interval=? "
+                f"AND symbol IN ({','.join('?' * len(chunk))})",
+                [provider, interval, *chunk]
+            ).fetchall()
+            states.update((symbol, IndicatorState.from_dict(json.loads(payload))) for symbol, payload in rows)
+    return states
+
+
+def save_states(states: Mapping[str, IndicatorState], provider: str, interval: str = "1d") -> None:
+    """Persist the indicator states of several series in one transaction"""
+    with closing(_db()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?, ?)",
+            [(symbol, provider, interval, json.dumps(state.to_dict())) for symbol, state in states.items()]
+        )
+
+
+def load_state(symbol: str, provider: str, interval: str = "1d") -> Optional[IndicatorState]:
+    """Load the saved indicator state of a series, or None if there is none"""
+    with closing(_db()) as conn:
+        row = conn.execute(
+            "SELECT payload FROM indicator_state WHERE symbol=? AND provider=? AND interval=?",
+            (symbol, provider, interval)
+        ).fetchone()
+    return IndicatorState.from_dict(json.loads(row[0])) if row else None
+
+
+def save_state(symbol: str, provider: str, interval: str, state: IndicatorState) -> None:
+    """Persist the indicator state of a series"""
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO indicator_state VALUES (?, ?, ?, ?)",
+            (symbol, provider, interval, json.dumps(state.to_dict()))
+        )
+
+
+def _advance(state: Optional[IndicatorState], bars: pd.DataFrame) -> Tuple[IndicatorState, IndicatorState]:
+    # الشمعة الأخيرة قد تكون ما زالت تتكوّن (شمعة يومية أثناء الجلسة)، فتُقيّم على نسخة ولا تُحفظ؛
+    # التشغيل التالي يراها بقيمها النهائية
+    bars = bars.sort_index()
+    first = pd.Timestamp(bars.index[0]).value
+    if state is not None and (
+        state.last_ts is None or state.last_ts < first
+        or state.first_ts is None or first < state.first_ts
+    ):
+        # فجوة بين الحالة المحفوظة والشموع المتاحة، أو شموع أقدم مما رأته الحالة: نبدأ من جديد
+        state = None
+    state = state or IndicatorState()
+    state.update_frame(bars.iloc[:-1])
+    current = state.copy()
+    current.update_frame(bars.iloc[-1:])
+    return state, current
+
+
+def advance(symbol: str, provider: str, interval: str, bars: pd.DataFrame) -> Dict[str, float]:
+    """
+    Feed the bars newer than the saved state and persist the result
+
+    Only bars after the last processed one are touched, so a restart
+    resumes from the saved state instead of recomputing the full history.
+    The last bar is evaluated but not saved, since it may still be forming.
+
+    Returns:
+        dict: Indicator values at the latest bar
+    """
+    state, current = _advance(load_state(symbol, provider, interval), bars)
+    save_state(symbol, provider, interval, state)
+    return current.last
+
+
+def warm_symbols(
+    symbols: Iterable[str],
+    provider: str,
+    since: pd.Timestamp,
+    interval: str = "1d",
+    min_bars: int = 2
+) -> set:
+    """Symbols whose saved state has min_bars bars and reaches since, so bars from since onwards are enough"""
+    states = load_states(symbols, provider, interval)
+    return {
+        symbol for symbol, state in states.items()
+        if state.bars >= min_bars and state.last_ts is not None and state.last_ts >= since.value
+    }
+
+
+def classify_strength(
+    frames: Mapping[str, pd.DataFrame],
+    provider: str,
+    interval: str = "1d",
+    min_bars: int = 2
+) -> pd.DataFrame:
+    """
+    Same result as panel.classify_strength, from the saved indicator states
+
+    Each symbol's state is advanced with the bars it has not seen, so the
+    frames only need to reach back to the last run (see warm_symbols);
+    symbols without a usable state are computed from the frames they get.
+
+    Args:
+        frames: symbol -> OHLCV DataFrame
+        provider, interval: Key of the saved states
+        min_bars: Symbols with fewer bars seen in total are skipped
+
+    Returns:
+        pd.DataFrame: one row per symbol with the columns of panel.classify_strength
+    """
+    frames = {symbol: frame.dropna(subset=["Close"]) for symbol, frame in frames.items()}
+    frames = {symbol: frame for symbol, frame in frames.items() if not frame.empty}
+    states = load_states(frames, provider, interval)
+
+    saved, rows = {}, []
+    for symbol, frame in frames.items():
+        state, current = _advance(states.get(symbol), frame)
+        saved[symbol] = state
+        if current.bars < max(min_bars, 2) or not state.last:
+            continue
+        last = frame.iloc[-1]
+        rows.append((symbol, float(last["Close"]), float(state.obv.prev_close), float(last["Volume"]),
+                     current.last, current.last["OBV"] > state.last["OBV"]))
+    save_states(saved, provider, interval)
+
+    if not rows:
+        return pd.DataFrame(columns=STRENGTH_COLUMNS)
+    symbols, close, prev_close, volume, values, obv_rising = zip(*rows)
+    avg_volume = np.array([v["Avg_Volume"] for v in values])
+    last_mfi = np.array([v["MFI"] for v in values])
+    return pd.DataFrame({
+        "Symbol": symbols,
+        "Close": close,
+        "Daily_Return": [v["Daily_Return"] for v in values],
+        "Volume": volume,
+        "Avg_Volume": avg_volume,
+        "OBV_Rising": np.array(obv_rising, dtype=bool),
+        "MFI": last_mfi,
+        "Strength": strength_labels(close, prev_close, volume, avg_volume, obv_rising, last_mfi),
+    }, columns=STRENGTH_COLUMNS)
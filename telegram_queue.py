@@ -0,0 +1,345 @@
+# telegram_queue.py
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+
+import http_client
+from rate_limiter import RateLimiter, get_limiter
+from storage import connect
+
+DB_NAME = "telegram_outbox.sqlite"
+
+# حدود Telegram لكل محادثة: رسالة في الثانية، و20 رسالة في الدقيقة للمجموعات
+CHAT_LIMITS = {"per_second": 1}
+GROUP_LIMITS = {"per_second": 1, "per_minute": 20}
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0
+MAX_BACKOFF = 300.0
+SEND_TIMEOUT = (3.05, 10)
+
+# رسالة بقيت "قيد الإرسال" أطول من هذا تعني أن العامل توقف أثناء إرسالها
+STALE_AFTER = 120.0
+# مدة الانتظار عندما لا توجد رسائل مستحقة، ومدة الاحتفاظ بالرسائل المرسلة
+IDLE_WAIT = 30.0
+RETENTION = 7 * 86400
+FETCH_LIMIT = 200
+
+STATUSES = ("pending", "sending", "sent", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    token_key TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    parse_mode TEXT,
+    disable_notification INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id);
+CREATE INDEX IF NOT EXISTS outbox_batch ON outbox (batch_id);
+"""
+
+# التوكن لا يُكتب على القرص؛ الصندوق يحفظ بصمته فقط ويبقى التوكن في ذاكرة العملية
+_tokens: Dict[str, str] = {}
+_chat_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_paused_until: Dict[object, float] = {}
+_state_lock = threading.Lock()
+
+_wake = threading.Event()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def token_key(token: str) -> str:
+    """Fingerprint of a bot token, stored in the outbox instead of the token itself"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def register_token(token: str) -> str:
+    """Make a bot token available to the delivery worker of this process"""
+    key = token_key(token)
+    with _state_lock:
+        _tokens[key] = token
+    return key
+
+
+def _token(key: str) -> Optional[str]:
+    with _state_lock:
+        token = _tokens.get(key)
+    if token is None:
+        # رسائل بقيت من تشغيل سابق: توكن البيئة يكفي إن لم يسجله أحد بعد
+        env_token = os.getenv("TELEGRAM_BOT_TOKEN")
+        if env_token and token_key(env_token) == key:
+            token = env_token
+            register_token(token)
+    return token
+
+
+def _chat_limiter(chat: Tuple[str, str]) -> RateLimiter:
+    with _state_lock:
+        limiter = _chat_limiters.get(chat)
+        if limiter is None:
+            limiter = RateLimiter(GROUP_LIMITS if chat[1].startswith("-") else CHAT_LIMITS)
+            _chat_limiters[chat] = limiter
+        return limiter
+
+
+def _pause(key, seconds: float) -> None:
+    with _state_lock:
+        _paused_until[key] = max(_paused_until.get(key, 0.0), time.time() + seconds)
+
+
+def _paused(key) -> float:
+    with _state_lock:
+        return _paused_until.get(key, 0.0) - time.time()
+
+
+def enqueue(
+    token: str,
+    chat_id,
+    messages: Iterable[str],
+    parse_mode: Optional[str] = "HTML",
+    disable_notification: bool = False
+) -> str:
+    """
+    Add messages to the persistent outbox and return immediately
+
+    Messages to the same chat are delivered in order by a background
+    worker that respects Telegram's global and per-chat limits.
+
+    Returns:
+        str: Batch id to pass to batch_status()
+    """
+    key = register_token(token)
+    batch_id = uuid.uuid4().hex
+    now = time.time()
+    with closing(_db()) as conn, conn:
+        conn.executemany(
+            "INSERT INTO outbox (batch_id, token_key, chat_id, text, parse_mode, disable_notification, "
+            "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(batch_id, key, str(chat_id), text, parse_mode, int(disable_notification), now, now) for text in messages]
+        )
+    start_worker()
+    _wake.set()
+    return batch_id
+
+
+def resume(token: Optional[str] = None) -> int:
+    """
+    Start the delivery worker if the outbox still holds undelivered messages
+
+    Call it when a process starts, so that messages left by an earlier run
+    (a restart, or a scheduler --once that stopped waiting) are sent without
+    waiting for a new enqueue().
+
+    Args:
+        token: Bot token to register for those messages, if it is not TELEGRAM_BOT_TOKEN
+
+    Returns:
+        int: Number of undelivered messages
+    """
+    if token:
+        register_token(token)
+    with closing(_db()) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+    if count:
+        start_worker()
+        _wake.set()
+    return count
+
+
+def batch_status(batch_id: str) -> Dict[str, object]:
+    """
+    Delivery status of a batch
+
+    Returns:
+        dict: message count per status (pending, sending, sent, failed),
+              total, and the last error of the batch if any
+    """
+    with closing(_db()) as conn:
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM outbox WHERE batch_id=? GROUP BY status", (batch_id,)
+        ).fetchall())
+        error = conn.execute(
+            "SELECT last_error FROM outbox WHERE batch_id=? AND last_error IS NOT NULL ORDER BY id DESC LIMIT 1",
+            (batch_id,)
+        ).fetchone()
+    status: Dict[str, object] = {name: counts.get(name, 0) for name in STATUSES}
+    status["total"] = sum(counts.values())
+    status["last_error"] = error[0] if error else None
+    return status
+
+
+def _claim(row_id: int) -> bool:
+    # التحديث المشروط يضمن أن عملية واحدة فقط ترسل الرسالة
+    with closing(_db()) as conn, conn:
+        cursor = conn.execute(
+            "UPDATE outbox SET status='sending', claimed_at=? WHERE id=? AND status='pending'",
+            (time.time(), row_id)
+        )
+    return cursor.rowcount == 1
+
+
+def _finish(row_id: int, status: str, attempts: int, next_attempt_at: float, error: Optional[str] = None) -> None:
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "UPDATE outbox SET status=?, attempts=?, next_attempt_at=?, last_error=?, claimed_at=NULL, "
+            "sent_at=CASE WHEN ?='sent' THEN ? ELSE sent_at END WHERE id=?",
+            (status, attempts, next_attempt_at, error, status, time.time(), row_id)
+        )
+
+
+def _retry_after(response: requests.Response) -> float:
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            return 1.0
+
+
+def _description(response: requests.Response) -> str:
+    try:
+        return response.json().get("description") or f"HTTP {response.status_code}"
+    except ValueError:
+        return f"HTTP {response.status_code}"
+
+
+def _deliver(row, token: str) -> None:
+    row_id, key, chat_id, text, parse_mode, silent, attempts, _ = row
+    payload = {"chat_id": chat_id, "text": text, "disable_notification": bool(silent)}
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+
+    try:
+        # الطابور ينظم معدل الإرسال بنفسه (لكل محادثة ولكل بوت)
+        response = http_client.post(
+            f"{http_client.base_url('telegram')}/bot{token}/sendMessage",
+            provider="telegram",
+            rate_limit=False,
+            json=payload,
+            timeout=SEND_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        # رسالة الاستثناء تحتوي الرابط (وفيه التوكن) فنحفظ نوعه فقط
+        response, error = None, f"خطأ في الاتصال: {type(e).__name__}"
+    else:
+        error = None if response.ok else _description(response)
+
+    now = time.time()
+    if response is not None and response.ok:
+        _finish(row_id, "sent", attempts + 1, now)
+    elif response is not None and response.status_code == 429:
+        # تجاوز الحد: ننتظر المدة التي يطلبها Telegram للمحادثة وللبوت كله، ولا تُحتسب محاولة
+        wait = _retry_after(response)
+        _pause(key, wait)
+        _pause((key, chat_id), wait)
+        _finish(row_id, "pending", attempts, now + wait, error)
+    elif response is not None and response.status_code < 500:
+        # خطأ في الطلب نفسه (توكن أو محادثة أو تنسيق غير صالح) لن تصلحه الإعادة
+        _finish(row_id, "failed", attempts + 1, now, error)
+    elif attempts + 1 >= MAX_ATTEMPTS:
+        _finish(row_id, "failed", attempts + 1, now, error)
+    else:
+        backoff = min(BACKOFF_BASE * 2 ** attempts, MAX_BACKOFF)
+        _finish(row_id, "pending", attempts + 1, now + backoff, error)
+
+
+def deliver_due(limit: int = FETCH_LIMIT) -> float:
+    """
+    Send the outbox messages that are due and fit the rate limits
+
+    A chat whose oldest pending message cannot go yet (backoff, rate limit
+    or retry_after) is skipped as a whole, so messages to one chat are never
+    reordered. Safe to call from several processes at once.
+
+    Returns:
+        float: Seconds until another message may become sendable
+    """
+    now = time.time()
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "UPDATE outbox SET status='pending', claimed_at=NULL WHERE status='sending' AND claimed_at < ?",
+            (now - STALE_AFTER,)
+        )
+        conn.execute("DELETE FROM outbox WHERE status='sent' AND sent_at < ?", (now - RETENTION,))
+        rows = conn.execute(
+            "SELECT id, token_key, chat_id, text, parse_mode, disable_notification, attempts, next_attempt_at "
+            "FROM outbox WHERE status='pending' ORDER BY id LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    next_wait = IDLE_WAIT
+    blocked = set()
+    sent = 0
+    for row in rows:
+        key, chat_id, due = row[1], row[2], row[7]
+        chat = (key, chat_id)
+        if chat in blocked:
+            continue
+        token = _token(key)
+        if token is None:
+            # توكن غير معروف لهذه العملية: تبقى الرسائل حتى يُسجَّل التوكن
+            blocked.add(chat)
+            continue
+
+        wait = max(due - time.time(), _paused(key), _paused(chat))
+        if wait <= 0:
+            wait = _chat_limiter(chat).try_acquire()
+        if wait <= 0:
+            wait = get_limiter("telegram", token).try_acquire()
+        if wait > 0:
+            blocked.add(chat)
+            next_wait = min(next_wait, wait)
+            continue
+
+        # بعد رسالة واحدة لا تتسع المحادثة لغيرها في هذه الدورة
+        blocked.add(chat)
+        if _claim(row[0]):
+            _deliver(row, token)
+            sent += 1
+
+    # بعد الإرسال تحدد الدورة التالية فوراً المدة الدقيقة لكل محادثة
+    return 0.0 if sent else next_wait
+
+
+def _run() -> None:
+    while True:
+        _wake.clear()
+        try:
+            wait = deliver_due()
+        except Exception:
+            # قاعدة البيانات مقفلة مؤقتاً أو خطأ غير متوقع: نعيد المحاولة لاحقاً
+            wait = IDLE_WAIT
+        _wake.wait(wait)
+
+
+def start_worker() -> None:
+    """Start the background delivery thread of this process if it is not running"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="telegram-outbox", daemon=True)
+            _worker.start()
@@ -1,29 +1,40 @@
 # telegram_sender.py
 import requests
 import os
+import http_client
+import telegram_queue
 import streamlit as st
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Iterable, Optional, Union
 from datetime import datetime
 
 # Load environment variables
 load_dotenv()
 
+def _telegram_secret(name: str) -> Optional[str]:
+    try:
+        return st.secrets.get("telegram", {}).get(name)
+    except FileNotFoundError:
+        # No secrets.toml, e.g. when running headless from scheduler.py
+        return None
+
 class TelegramSender:
     def __init__(self):
         self.TELEGRAM_BOT_TOKEN = self._get_telegram_token()
         self.TELEGRAM_CHAT_ID = self._get_chat_id()
+        if self.TELEGRAM_BOT_TOKEN:
+            telegram_queue.resume(self.TELEGRAM_BOT_TOKEN)
         
     def _get_telegram_token(self) -> Optional[str]:
         """Get Telegram token from environment variables or Streamlit secrets"""
-        token = os.getenv("TELEGRAM_BOT_TOKEN") or st.secrets.get("telegram", {}).get("bot_token")
+        token = os.getenv("TELEGRAM_BOT_TOKEN") or _telegram_secret("bot_token")
         if not token:
             st.error("❌ Telegram token not found in environment variables or Streamlit secrets")
         return token
     
     def _get_chat_id(self) -> Optional[str]:
         """Get Telegram chat ID from environment variables or Streamlit secrets"""
-        chat_id = os.getenv("TELEGRAM_CHAT_ID") or st.secrets.get("telegram", {}).get("chat_id")
+        chat_id = os.getenv("TELEGRAM_CHAT_ID") or _telegram_secret("chat_id")
         if not chat_id:
             st.error("❌ Telegram chat ID not found in environment variables or Streamlit secrets")
         return chat_id
@@ -51,7 +62,7 @@ class TelegramSender:
             return False
             
         try:
-            url = f"https://api.telegram.org/bot{self.TELEGRAM_BOT_TOKEN}/sendMessage"
+            url = f"{http_client.base_url('telegram')}/bot{self.TELEGRAM_BOT_TOKEN}/sendMessage"
             payload = {
                 "chat_id": self.TELEGRAM_CHAT_ID,
                 "text": message,
@@ -59,7 +70,14 @@ class TelegramSender:
                 "disable_notification": disable_notification
             }
             
-            response = requests.post(url, json=payload, timeout=timeout)
+            # Reuse the pooled keep-alive connection instead of opening one per message
+            response = http_client.post(
+                url,
+                provider="telegram",
+                api_key=self.TELEGRAM_BOT_TOKEN,
+                json=payload,
+                timeout=timeout
+            )
             response.raise_for_status()
             
             return True
@@ -73,6 +91,39 @@ class TelegramSender:
             
         return False
 
+    def enqueue(
+        self,
+        messages: Union[str, Iterable[str]],
+        parse_mode: str = "HTML",
+        disable_notification: bool = False
+    ) -> Optional[str]:
+        """
+        Queue messages for background delivery and return immediately
+
+        Messages are stored in a persistent outbox and sent in order by a
+        worker thread that respects Telegram's rate limits and retries
+        failed deliveries.
+
+        Args:
+            messages: One message or several messages to send in order
+            parse_mode: Text formatting mode (HTML or Markdown)
+            disable_notification: Send silently if True
+
+        Returns:
+            str: Batch id for telegram_queue.batch_status(), or None if Telegram is not configured
+        """
+        if not self.TELEGRAM_BOT_TOKEN or not self.TELEGRAM_CHAT_ID:
+            return None
+        if isinstance(messages, str):
+            messages = [messages]
+        return telegram_queue.enqueue(
+            self.TELEGRAM_BOT_TOKEN,
+            self.TELEGRAM_CHAT_ID,
+            messages,
+            parse_mode=parse_mode,
+            disable_notification=disable_notification
+        )
+
 # Helper function for backward compatibility
 def send_telegram_message(message: str) -> bool:
     sender = TelegramSender()
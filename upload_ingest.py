@@ -0,0 +1,186 @@
+# upload_ingest.py
+from pathlib import PurePath
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from screening import screen_mask
+
+# الأعمدة التي تحتاجها صفحة تحليل الملف فقط
+COMPANY_COLUMNS = [
+    "symbol",
+    "companyName",
+    "price",
+    "marketCap",
+    "lastAnnualDividend",
+    "isEtf",
+    "isFund",
+    "isActivelyTrading",
+]
+NUMERIC_COLUMNS = ["price", "marketCap", "lastAnnualDividend"]
+BOOL_COLUMNS = ["isEtf", "isFund", "isActivelyTrading"]
+
+# الأعمدة النصية تُقرأ كنصوص، والرقمية تُحوّل لكل دفعة (القيم غير الصالحة تصبح NaN)
+CSV_DTYPES = {"symbol": "string", "companyName": "string", **{col: "string" for col in BOOL_COLUMNS}}
+
+CHUNK_SIZE = 100_000
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+ARROW_SUFFIXES = {".arrow", ".feather", ".ipc"}
+
+RowFilter = Callable[[pd.DataFrame], pd.Series]
+
+
+def _to_bool(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype("boolean")
+    text = values.astype("string").str.strip().str.lower()
+    return text.map({"true": True, "1": True, "false": False, "0": False}).astype("boolean")
+
+
+def normalize(chunk: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Give a chunk the compact typed schema: float64 numbers, nullable booleans, string text"""
+    columns = columns or COMPANY_COLUMNS
+    for col in columns:
+        if col not in chunk:
+            chunk[col] = pd.NA
+        if col in NUMERIC_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float64")
+        elif col in BOOL_COLUMNS:
+            chunk[col] = _to_bool(chunk[col])
+        else:
+            chunk[col] = chunk[col].astype("string")
+    return chunk[columns]
+
+
+# الشركات الجيدة: كبيرة، توزع أرباحًا، نشطة التداول، وليست صناديق
+GOOD_COMPANIES = {
+    "name": "good_companies",
+    "where": [
+        {"column": "marketCap", "op": ">", "value": 1_000_000_000},
+        {"column": "price", "op": ">", "value": 5},
+        {"column": "lastAnnualDividend", "op": ">", "value": 0},
+        {"column": "isEtf", "op": "==", "value": False},
+        {"column": "isFund", "op": "==", "value": False},
+        {"column": "isActivelyTrading", "op": "==", "value": True},
+    ],
+}
+
+
+def good_companies(df: pd.DataFrame) -> pd.Series:
+    """The default upload filter (see GOOD_COMPANIES)"""
+    return screen_mask(df, GOOD_COMPANIES)
+
+
+def _file_kind(file, name: Optional[str]) -> str:
+    suffix = PurePath(name or getattr(file, "name", "") or "").suffix.lower()
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    if suffix in ARROW_SUFFIXES:
+        return "arrow"
+    return "csv"
+
+
+def _rewind(file) -> None:
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def _csv_chunks(file, columns: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    wanted = set(columns)
+    yield from pd.read_csv(
+        file,
+        usecols=lambda col: col in wanted,
+        dtype={col: dtype for col, dtype in CSV_DTYPES.items() if col in wanted},
+        chunksize=chunksize,
+        low_memory=False  # حجم الدفعة محدود أصلاً، ونتجنب تخمين أنواع مختلفة داخل الدفعة الواحدة
+    )
+
+
+def _parquet_chunks(file, columns: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(file)
+    present = [col for col in columns if col in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(batch_size=chunksize, columns=present):
+        yield batch.to_pandas()
+
+
+def _open_ipc(file):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    # ملفات Streamlit المرفوعة في الذاكرة أصلاً، فنقرؤها دون نسخ
+    source = pa.py_buffer(file.getbuffer()) if hasattr(file, "getbuffer") else pa.memory_map(str(file))
+    try:
+        reader = ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        reader = ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def _arrow_chunks(file, columns: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    schema, batches = _open_ipc(file)
+    present = [col for col in columns if col in schema.names]
+    for batch in batches:
+        batch = batch.select(present)
+        for start in range(0, batch.num_rows, chunksize):
+            yield batch.slice(start, chunksize).to_pandas()
+
+
+def iter_chunks(
+    file: BinaryIO,
+    name: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    chunksize: int = CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream an uploaded CSV, Parquet or Arrow/Feather file in typed chunks
+
+    Only `columns` are read: CSV uses usecols, Parquet and Arrow project
+    columns before decoding. Missing columns are added as NA.
+    """
+    columns = columns or COMPANY_COLUMNS
+    _rewind(file)
+    readers = {"csv": _csv_chunks, "parquet": _parquet_chunks, "arrow": _arrow_chunks}
+    for chunk in readers[_file_kind(file, name)](file, columns, chunksize):
+        yield normalize(chunk, columns)
+
+
+def ingest_companies(
+    file: BinaryIO,
+    name: Optional[str] = None,
+    row_filter: RowFilter = good_companies,
+    chunksize: int = CHUNK_SIZE
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Read an uploaded companies file chunk by chunk, keeping only matching rows
+
+    Memory use is bounded by one chunk plus the matching rows, so
+    full-exchange dumps can be filtered without loading them whole.
+
+    Returns:
+        tuple: (matching rows, number of rows scanned)
+    """
+    kept, scanned = [], 0
+    for chunk in iter_chunks(file, name, COMPANY_COLUMNS, chunksize):
+        scanned += len(chunk)
+        kept.append(chunk[row_filter(chunk)])
+
+    if not kept:
+        return normalize(pd.DataFrame(columns=COMPANY_COLUMNS)), 0
+    return pd.concat(kept, ignore_index=True), scanned
+
+
+def preview(file: BinaryIO, name: Optional[str] = None, rows: int = 5) -> pd.DataFrame:
+    """Return the first rows of an uploaded file with all its columns"""
+    _rewind(file)
+    kind = _file_kind(file, name)
+    if kind == "csv":
+        return pd.read_csv(file, nrows=rows)
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        return next(pq.ParquetFile(file).iter_batches(batch_size=rows)).to_pandas().head(rows)
+
+    _, batches = _open_ipc(file)
+    return next(batches).slice(0, rows).to_pandas()
@@ -0,0 +1,162 @@
+# yahoo_scraper.py
+import hashlib
+import io
+import re
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+import http_client
+import metrics
+from storage import connect
+
+DB_NAME = "yahoo_pages.sqlite"
+
+# صفحات Yahoo ترفض أحياناً الطلبات بدون وكيل مستخدم متصفح
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    table_parquet BLOB NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+_TABLE_TAG = re.compile(r"<(/?)table\b", re.IGNORECASE)
+
+# آخر جدول محلل لكل رابط في هذه العملية: url -> (body_hash, DataFrame)
+_parsed: Dict[str, Tuple[str, pd.DataFrame]] = {}
+_parsed_lock = threading.Lock()
+
+
+def _db():
+    conn = connect(DB_NAME)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _load(url: str) -> Optional[tuple]:
+    with closing(_db()) as conn:
+        return conn.execute(
+            "SELECT etag, last_modified, body_hash, table_parquet FROM pages WHERE url=?", (url,)
+        ).fetchone()
+
+
+def _store(url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, df: pd.DataFrame) -> None:
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, body_hash, df.to_parquet(index=False), time.time())
+        )
+
+
+def _touch(url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+    with closing(_db()) as conn, conn:
+        conn.execute(
+            "UPDATE pages SET etag=COALESCE(?, etag), last_modified=COALESCE(?, last_modified), fetched_at=? "
+            "WHERE url=?",
+            (etag, last_modified, time.time(), url)
+        )
+
+
+def _cached_table(url: str, body_hash: str, blob: bytes) -> pd.DataFrame:
+    # نقرأ ملف Parquet من القاعدة مرة واحدة لكل نسخة من الصفحة
+    with _parsed_lock:
+        hit = _parsed.get(url)
+    if hit is not None and hit[0] == body_hash:
+        return hit[1]
+    df = pd.read_parquet(io.BytesIO(blob))
+    with _parsed_lock:
+        _parsed[url] = (body_hash, df)
+    return df
+
+
+def table_fragment(html: str, index: int = 0) -> str:
+    """
+    Cut the index-th top-level <table>...</table> out of an HTML page
+
+    Only this fragment is handed to the HTML parser, instead of the whole
+    page with its scripts and every other table.
+
+    Raises:
+        ValueError: if the page has no such table
+    """
+    depth, start, found = 0, None, 0
+    for match in _TABLE_TAG.finditer(html):
+        if not match.group(1):
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                if found == index:
+                    end = html.find(">", match.end())
+                    return html[start:end + 1 if end != -1 else len(html)]
+                found += 1
+    raise ValueError("لم يتم العثور على جدول في الصفحة")
+
+
+def parse_table(html: str, index: int = 0) -> pd.DataFrame:
+    """Parse the index-th table of a page (see table_fragment)"""
+    return pd.read_html(io.StringIO(table_fragment(html, index)), flavor="lxml")[0]
+
+
+def fetch_table(url: str) -> pd.DataFrame:
+    """
+    Fetch a page and return its first table, re-parsing only when it changed
+
+    The request carries If-None-Match / If-Modified-Since from the last
+    response, so an unchanged page costs a 304 and no parsing at all. When
+    the server does not honor them, a body identical to the last one is
+    detected by its hash and the stored table is reused. The parsed table
+    is kept in SQLite, so other processes (the scheduler) share it.
+
+    Args:
+        url: Page URL
+
+    Returns:
+        pd.DataFrame: A copy of the table
+    """
+    cached = _load(url)
+    headers = dict(HEADERS)
+    if cached is not None:
+        etag, last_modified = cached[0], cached[1]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = http_client.get(url, provider="yahoo", headers=headers)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if response.status_code == 304 and cached is not None:
+        metrics.cache_event("yahoo_pages", "refresh")
+        _touch(url, etag, last_modified)
+        return _cached_table(url, cached[2], cached[3]).copy()
+    response.raise_for_status()
+
+    body_hash = hashlib.sha256(response.content).hexdigest()
+    if cached is not None and cached[2] == body_hash:
+        metrics.cache_event("yahoo_pages", "refresh")
+        _touch(url, etag, last_modified)
+        return _cached_table(url, body_hash, cached[3]).copy()
+
+    metrics.cache_event("yahoo_pages", "miss")
+    df = parse_table(response.text)
+    _store(url, etag, last_modified, body_hash, df)
+    with _parsed_lock:
+        _parsed[url] = (body_hash, df)
+    return df.copy()